@@ -0,0 +1,113 @@
+import collections
+import hashlib
+import time
+
+from dedupe import normalize_text
+
+DEFAULT_PERSONA = '你是直播间的友好观众，用中文自然口吻简短回应，避免敏感内容。限制：不超过40字；可适度使用表情；没内容就返回空字符串。'
+RULES = ('【规则】\n'
+         '- 用户消息是刚刚出现的新内容，回复以它为准；【直播间近况】只是较早内容的摘要，用来保持话题连贯。\n'
+         '- 只输出回复本身，不要解释，不要复述评论。')
+
+
+class AgentPrompt:
+    """Agent prompt split into a stable system prefix and a small per-call suffix.
+
+    The system message is persona + fixed rules + a room summary, and stays
+    byte-identical between calls so the provider's prompt prefix cache
+    keeps hitting. The summary (what the streamer said lately, comments
+    that keep coming up) is rebuilt from the inputs seen so far only every
+    `refresh` seconds. The user message carries just the new input of
+    this call.
+    """
+
+    def __init__(self, refresh: float = 300.0, keep_asr: int = 6, keep_comments: int = 5, max_items: int = 500,
+                 clock=time.time):
+        self.refresh = max(0.0, float(refresh))
+        self.keep_asr = int(keep_asr)
+        self.keep_comments = int(keep_comments)
+        self.clock = clock
+        self.asr = collections.deque(maxlen=max_items)
+        self.comments = collections.deque(maxlen=max_items)
+        self.summary = ''
+        self.summary_at = None
+        self.last_hash = None
+        self.builds = 0
+        self.rebuilt = 0
+
+    def _summarize(self) -> str:
+        parts = []
+        asr = []
+        for t in reversed(self.asr):
+            if t not in asr:
+                asr.append(t)
+            if len(asr) >= self.keep_asr:
+                break
+        if asr:
+            parts.append('主播最近说过：\n' + '\n'.join(f'- {t}' for t in reversed(asr)))
+        counts = collections.Counter()
+        first = {}
+        for line in self.comments:
+            k = normalize_text(line)
+            if k:
+                counts[k] += 1
+                first.setdefault(k, line)
+        top = [(first[k], n) for k, n in counts.most_common(self.keep_comments) if n > 1]
+        if top:
+            parts.append('观众反复提到：\n' + '\n'.join(f'- {line}（{n}次）' for line, n in top))
+        if not parts:
+            return ''
+        return '【直播间近况】\n' + '\n'.join(parts)
+
+    def build(self, persona: str, ocr_lines, asr_texts):
+        """Return the chat messages for this call; records the input for later summaries."""
+        now = self.clock()
+        if self.summary_at is None:
+            self.summary_at = now
+        elif now - self.summary_at >= self.refresh:
+            summary = self._summarize()
+            if summary != self.summary:
+                self.summary = summary
+                self.rebuilt += 1
+            self.summary_at = now
+        # Summaries cover input up to the previous call, so this call's input appears only in the suffix
+        self.asr.extend(asr_texts or [])
+        self.comments.extend(ocr_lines or [])
+        system = '\n\n'.join(p for p in ((persona or '').strip() or DEFAULT_PERSONA, RULES, self.summary) if p)
+        ctx = []
+        if asr_texts:
+            ctx.append('【主播语音要点】\n' + '\n'.join(f'- {t}' for t in asr_texts))
+        if ocr_lines:
+            ctx.append('【观众评论】\n' + '\n'.join(f'- {l}' for l in ocr_lines))
+        ctx_str = '\n\n'.join(ctx) if ctx else '（暂无上下文）'
+        self.builds += 1
+        return [
+            {'role': 'system', 'content': system},
+            {'role': 'user', 'content': f'{ctx_str}\n\n请给出一句自然的互动回复：'},
+        ]
+
+    def prefix_info(self, messages) -> dict:
+        """Hash and size of the stable prefix, and whether it is the same as on the previous call."""
+        digest = hashlib.blake2b(messages[0]['content'].encode('utf-8'), digest_size=8).hexdigest()
+        info = {'hash': digest, 'chars': len(messages[0]['content']), 'reused': digest == self.last_hash}
+        self.last_hash = digest
+        return info
+
+
+def cache_usage(usage) -> dict:
+    """Token counts from a chat completion's `usage`, with the prompt tokens served from the provider's cache.
+
+    DeepSeek reports `prompt_cache_hit_tokens`; OpenAI-style APIs report
+    `prompt_tokens_details.cached_tokens`.
+    """
+    if not isinstance(usage, dict):
+        return {}
+    out = {k: usage[k] for k in ('prompt_tokens', 'completion_tokens') if k in usage}
+    cached = usage.get('prompt_cache_hit_tokens')
+    if cached is None:
+        cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    if cached is not None:
+        out['cached_tokens'] = cached
+        if usage.get('prompt_tokens'):
+            out['cache_hit_ratio'] = round(cached / usage['prompt_tokens'], 3)
+    return out
@@ -0,0 +1,75 @@
+import json
+import os
+import socket
+import subprocess
+import time
+
+
+class AsrClient:
+    """Talks to the ASR daemon (asr/daemon.py) over its Unix socket.
+
+    One request per connection: a JSON line (plus raw PCM for `pcm`), one
+    JSON line back. Raises OSError when the daemon is not reachable and
+    RuntimeError when it answers with an error.
+    """
+
+    def __init__(self, sock_path: str, timeout: float = 30.0):
+        self.sock_path = sock_path
+        self.timeout = timeout
+
+    def request(self, msg: dict, payload: bytes = b'', timeout: float = None) -> dict:
+        if payload:
+            msg = dict(msg, bytes=len(payload))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(self.timeout if timeout is None else timeout)
+            s.connect(self.sock_path)
+            s.sendall((json.dumps(msg, ensure_ascii=False) + '\n').encode('utf-8') + payload)
+            buf = b''
+            while not buf.endswith(b'\n'):
+                chunk = s.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+        resp = json.loads(buf.decode('utf-8') or '{}')
+        if not resp.get('ok'):
+            raise RuntimeError(resp.get('error') or 'asr daemon error')
+        return resp
+
+    def status(self, timeout: float = 2.0) -> dict:
+        return self.request({'op': 'status'}, timeout=timeout)
+
+    def alive(self) -> bool:
+        try:
+            self.status()
+            return True
+        except (OSError, RuntimeError, ValueError):
+            return False
+
+    def transcribe_file(self, path: str, **opts) -> dict:
+        return self.request(dict(opts, op='file', path=path), timeout=300.0)['result']
+
+    def transcribe_pcm(self, pcm: bytes, sr: int = 16000, **opts) -> dict:
+        return self.request(dict(opts, op='pcm', sr=sr), payload=pcm, timeout=300.0)['result']
+
+    def start_job(self, kind: str, argv) -> int:
+        # Model load on first use can take a while (download, compute-type fallbacks)
+        return int(self.request({'op': kind, 'args': list(argv)}, timeout=600.0)['id'])
+
+    def stop_job(self, job_id: int, timeout: float = 10.0) -> bool:
+        return bool(self.request({'op': 'stop', 'id': job_id, 'timeout': timeout}, timeout=timeout + 5.0).get('stopped'))
+
+    def shutdown(self):
+        self.request({'op': 'shutdown'}, timeout=5.0)
+
+    def spawn(self, cmd, log_file=None, env=None, wait: float = 600.0) -> subprocess.Popen:
+        """Start the daemon with `cmd` and wait until it answers (it preloads the model first)."""
+        proc = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT, env=env or os.environ.copy(),
+                                start_new_session=True)
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f'asr daemon exited with code {proc.returncode}')
+            if self.alive():
+                return proc
+            time.sleep(0.2)
+        raise RuntimeError('asr daemon did not come up in time')
@@ -0,0 +1,354 @@
+import collections
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+TOPICS = ('ocr.line', 'asr.text', 'agent.reply')
+MAX_FRAME = 1 << 20
+_LEN = struct.Struct('>I')
+
+
+def send_frame(sock, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    if len(data) > MAX_FRAME:
+        raise ValueError(f'frame of {len(data)} bytes is over {MAX_FRAME}')
+    sock.sendall(_LEN.pack(len(data)) + data)
+
+
+def _read_exact(rfile, n: int) -> bytes:
+    buf = b''
+    while len(buf) < n:
+        chunk = rfile.read(n - len(buf))
+        if not chunk:
+            return b''
+        buf += chunk
+    return buf
+
+
+def recv_frame(rfile):
+    """Read one length-prefixed JSON frame; None at EOF."""
+    head = _read_exact(rfile, _LEN.size)
+    if not head:
+        return None
+    n = _LEN.unpack(head)[0]
+    if n > MAX_FRAME:
+        raise ValueError(f'frame of {n} bytes is over {MAX_FRAME}')
+    body = _read_exact(rfile, n)
+    if len(body) < n:
+        return None
+    return json.loads(body)
+
+
+class Subscription:
+    """Bounded queue of bus messages for one subscriber.
+
+    A lossless subscription (durable sinks) makes publishers wait while it
+    is full, so a slow disk slows the pipeline instead of losing records.
+    A lossy one (live consumers) drops its oldest message instead and
+    counts it, so one stalled reader never holds up the others.
+    `listener(msg)` is called in the publisher's thread after queueing.
+    """
+
+    def __init__(self, topics, maxsize: int = 256, lossless: bool = False, listener=None, name: str = ''):
+        self.topics = set(topics)
+        self.maxsize = max(1, int(maxsize))
+        self.lossless = lossless
+        self.listener = listener
+        self.name = name
+        self.q = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.blocked_s = 0.0
+
+    def matches(self, topic: str) -> bool:
+        return '*' in self.topics or topic in self.topics
+
+    def offer(self, msg: dict):
+        with self.cond:
+            if len(self.q) >= self.maxsize:
+                if self.lossless:
+                    t0 = time.perf_counter()
+                    while len(self.q) >= self.maxsize and not self.closed:
+                        self.cond.wait(0.5)
+                    self.blocked_s += time.perf_counter() - t0
+                else:
+                    self.q.popleft()
+                    self.dropped += 1
+            if self.closed:
+                return
+            self.q.append(msg)
+            self.cond.notify_all()
+        if self.listener is not None:
+            self.listener(msg)
+
+    def get(self, timeout: float = None):
+        """Next message, or None after `timeout` or once closed and empty."""
+        with self.cond:
+            if not self.q and not self.closed:
+                self.cond.wait(timeout)
+            if not self.q:
+                return None
+            msg = self.q.popleft()
+            self.delivered += 1
+            self.cond.notify_all()
+            return msg
+
+    def drain(self):
+        with self.cond:
+            out = list(self.q)
+            self.q.clear()
+            self.delivered += len(out)
+            self.cond.notify_all()
+            return out
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            queued = len(self.q)
+        return {'name': self.name, 'topics': sorted(self.topics), 'queued': queued, 'delivered': self.delivered,
+                'dropped': self.dropped, 'blocked_s': round(self.blocked_s, 3)}
+
+
+class EventBus:
+    """In-process publish/subscribe hub, optionally served on a Unix socket.
+
+    Stages in the app publish and subscribe directly; other processes (the
+    ASR transcriber) connect with `BusClient`. Messages are
+    `{topic, seq, ts, data}`; publishing is serialized, so every
+    subscriber sees a topic in publish order.
+    """
+
+    def __init__(self, log=None):
+        self.log = log or (lambda msg: None)
+        self.subs = []
+        self.lock = threading.Lock()
+        self.pub_lock = threading.Lock()
+        self.seq = 0
+        self.published = collections.Counter()
+        self.server = None
+        self.sock_path = None
+        self.conns = set()
+
+    def attach(self, sub: Subscription) -> Subscription:
+        with self.lock:
+            self.subs.append(sub)
+        return sub
+
+    def subscribe(self, topics, maxsize: int = 256, lossless: bool = False, listener=None, name: str = '') -> Subscription:
+        return self.attach(Subscription(topics, maxsize, lossless, listener, name))
+
+    def unsubscribe(self, sub: Subscription):
+        with self.lock:
+            if sub in self.subs:
+                self.subs.remove(sub)
+        sub.close()
+
+    def publish(self, topic: str, data) -> int:
+        with self.pub_lock:
+            self.seq += 1
+            msg = {'topic': topic, 'seq': self.seq, 'ts': time.time(), 'data': data}
+            self.published[topic] += 1
+            with self.lock:
+                subs = [s for s in self.subs if s.matches(topic)]
+            for s in subs:
+                s.offer(msg)
+            return msg['seq']
+
+    def serve(self, sock_path: str):
+        """Accept publishers and subscribers from other processes on `sock_path`."""
+        if os.path.exists(sock_path):
+            try:
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                probe.connect(sock_path)
+                probe.close()
+                raise OSError(f'event bus already running on {sock_path}')
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(sock_path)
+        os.makedirs(os.path.dirname(sock_path) or '.', exist_ok=True)
+        self.server = _BusServer(sock_path, _BusHandler)
+        self.server.bus = self
+        os.chmod(sock_path, 0o600)
+        self.sock_path = sock_path
+        threading.Thread(target=self.server.serve_forever, name='event-bus', daemon=True).start()
+
+    def stats(self) -> dict:
+        with self.lock:
+            subs = [s.stats() for s in self.subs]
+        return {'published': dict(self.published), 'subscribers': subs}
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            with self.lock:
+                conns, self.conns = self.conns, set()
+            for c in conns:
+                # Wake clients blocked on us, so publishers fall back instead of writing into the void
+                try:
+                    c.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            try:
+                os.unlink(self.sock_path)
+            except OSError:
+                pass
+        with self.lock:
+            subs, self.subs = self.subs, []
+        for s in subs:
+            s.close()
+
+
+class _BusHandler(socketserver.StreamRequestHandler):
+    """One client connection: {"op": "pub", topic, data, ack?} or {"op": "sub", topics, maxsize?, lossless?} frames."""
+
+    def handle(self):
+        bus = self.server.bus
+        sub = None
+        with bus.lock:
+            bus.conns.add(self.connection)
+        try:
+            while True:
+                frame = recv_frame(self.rfile)
+                if frame is None:
+                    break
+                op = frame.get('op')
+                if op == 'pub':
+                    # Blocks while a lossless subscriber is full; the client's send then blocks too
+                    seq = bus.publish(str(frame.get('topic')), frame.get('data'))
+                    if frame.get('ack'):
+                        send_frame(self.connection, {'ack': seq})
+                elif op == 'sub' and sub is None:
+                    sub = bus.subscribe(frame.get('topics') or ['*'], int(frame.get('maxsize', 256)),
+                                        bool(frame.get('lossless', False)), name=f"sock:{frame.get('name', '')}")
+                    threading.Thread(target=self._pump, args=(bus, sub), daemon=True).start()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with bus.lock:
+                bus.conns.discard(self.connection)
+            if sub is not None:
+                bus.unsubscribe(sub)
+
+    def _pump(self, bus, sub):
+        try:
+            while True:
+                msg = sub.get(timeout=1.0)
+                if msg is None:
+                    if sub.closed:
+                        break
+                    continue
+                send_frame(self.connection, msg)
+        except OSError:
+            bus.unsubscribe(sub)
+
+
+class _BusServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class BusClient:
+    """Connection to an EventBus served on a Unix socket (publisher, subscriber, or both)."""
+
+    def __init__(self, sock_path: str, timeout: float = 5.0):
+        self.sock_path = sock_path
+        self.timeout = timeout
+        self.sock = None
+        self.rfile = None
+
+    def connect(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self.timeout)
+        s.connect(self.sock_path)
+        self.sock = s
+        self.rfile = s.makefile('rb')
+        return self
+
+    def publish(self, topic: str, data, ack: bool = False):
+        """Send one message. With `ack`, wait until the bus has queued it (publish-only connections)."""
+        if self.sock is None:
+            self.connect()
+        send_frame(self.sock, {'op': 'pub', 'topic': topic, 'data': data, 'ack': ack})
+        if ack:
+            reply = recv_frame(self.rfile)
+            if not reply or 'ack' not in reply:
+                raise ConnectionError('event bus closed before acknowledging')
+            return reply['ack']
+
+    def subscribe(self, topics, maxsize: int = 256, lossless: bool = False, name: str = ''):
+        if self.sock is None:
+            self.connect()
+        send_frame(self.sock, {'op': 'sub', 'topics': list(topics), 'maxsize': maxsize, 'lossless': lossless, 'name': name})
+
+    def recv(self, timeout: float = None):
+        """Next message for a subscribed client; None on timeout or EOF."""
+        self.sock.settimeout(timeout)
+        try:
+            return recv_frame(self.rfile)
+        except socket.timeout:
+            return None
+
+    def close(self):
+        for h in (self.rfile, self.sock):
+            try:
+                if h is not None:
+                    h.close()
+            except OSError:
+                pass
+        self.sock = self.rfile = None
+
+
+class JsonlSink:
+    """Durable subscriber: appends each message's data as one JSON line to the file for its topic.
+
+    Lossless, so publishers wait rather than records being dropped; the
+    files keep their old layout for tools and for reading history.
+    """
+
+    def __init__(self, bus: EventBus, paths: dict, maxsize: int = 1024, log=None):
+        self.bus = bus
+        self.paths = dict(paths)
+        self.log = log or (lambda msg: None)
+        self.written = 0
+        self.sub = bus.subscribe(list(self.paths), maxsize=maxsize, lossless=True, name='jsonl-sink')
+        self.thread = threading.Thread(target=self._run, name='jsonl-sink', daemon=True)
+        self.thread.start()
+
+    def _write(self, msgs):
+        by_path = collections.defaultdict(list)
+        for m in msgs:
+            by_path[self.paths[m['topic']]].append(json.dumps(m['data'], ensure_ascii=False) + '\n')
+        for path, lines in by_path.items():
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(lines))
+                self.written += len(lines)
+            except OSError as e:
+                self.log(f'jsonl sink write fail ({path}): {e}')
+
+    def _run(self):
+        while True:
+            msg = self.sub.get(timeout=1.0)
+            if msg is None:
+                if self.sub.closed:
+                    break
+                continue
+            # Whatever queued up meanwhile goes out in the same write
+            self._write([msg] + self.sub.drain())
+
+    def close(self):
+        self.bus.unsubscribe(self.sub)
+        self.thread.join(timeout=5.0)
+        rest = self.sub.drain()
+        if rest:
+            self._write(rest)
@@ -0,0 +1,275 @@
+import collections
+import hashlib
+import struct
+import time
+import unicodedata
+
+
+class TTLDedupe:
+    """Seen-set with TTL and capacity eviction in O(1) amortized per call.
+
+    A dict maps each key to its expiry time and a deque keeps keys in
+    insertion order. Because the TTL is fixed and hits do not refresh the
+    entry, insertion order is also expiry order, so expiry and capacity
+    eviction both just pop from the left of the deque.
+    """
+
+    def __init__(self, ttl: float = None, capacity: int = None, clock=time.monotonic):
+        self.ttl = float(ttl) if ttl else None
+        self.capacity = int(capacity) if capacity else None
+        self.clock = clock
+        self._expiry = {}
+        self._order = collections.deque()  # (expiry, key)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _expire(self, now: float):
+        order, expiry = self._order, self._expiry
+        while order and order[0][0] <= now:
+            exp, key = order.popleft()
+            if expiry.get(key) == exp:
+                del expiry[key]
+                self.evicted += 1
+
+    def seen(self, key) -> bool:
+        """Return True if `key` was added within the TTL; otherwise record it and return False."""
+        now = self.clock()
+        if self.ttl is not None:
+            self._expire(now)
+        if key in self._expiry:
+            self.hits += 1
+            return True
+        self.misses += 1
+        exp = now + self.ttl if self.ttl is not None else float('inf')
+        self._expiry[key] = exp
+        self._order.append((exp, key))
+        if self.capacity is not None:
+            while len(self._expiry) > self.capacity:
+                old_exp, old = self._order.popleft()
+                if self._expiry.get(old) == old_exp:
+                    del self._expiry[old]
+                    self.evicted += 1
+        return False
+
+    def __contains__(self, key) -> bool:
+        if self.ttl is not None:
+            self._expire(self.clock())
+        return key in self._expiry
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def clear(self):
+        self._expiry.clear()
+        self._order.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._expiry),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def normalize_text(text: str) -> str:
+    """Fold away what OCR tends to wobble on: width/case, punctuation, emoji, spaces."""
+    out = []
+    for ch in unicodedata.normalize('NFKC', text or '').lower():
+        cat = unicodedata.category(ch)
+        if cat[0] in 'LN':
+            out.append(ch)
+    return ''.join(out)
+
+
+# Lines with fewer distinct shingles are only matched exactly: "666", "6666" and "66666" all
+# reduce to {'66'}, so their Jaccard similarity says nothing about whether they are the same comment
+MIN_SHINGLES = 3
+
+
+def shingles(norm: str, n: int = 2):
+    if len(norm) <= n:
+        return {norm} if norm else set()
+    return {norm[i:i + n] for i in range(len(norm) - n + 1)}
+
+
+def jaccard(a, b) -> float:
+    if not a and not b:
+        return 1.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter) if inter else 0.0
+
+
+_SIG = struct.Struct('<32H')
+
+
+class NearDuplicateIndex:
+    """Approximate seen-set for noisy OCR lines (MinHash over character shingles + LSH).
+
+    Lines are normalized (NFKC, lower-case, letters/digits only) and cut into
+    character bigrams. Each shingle is hashed once with blake2b and the
+    64-byte digest read as 32 independent 16-bit hash values, so the MinHash
+    signature is an element-wise min done in C. The signature is split into
+    `bands`; lines that
+    share any band bucket become candidates and are confirmed with exact
+    Jaccard similarity against `threshold`. Candidate lookup touches only a
+    handful of buckets, so cost does not grow with the number of stored
+    lines. Lines with fewer than `MIN_SHINGLES` distinct shingles are not
+    bucketed and only match exactly. Drop-in for TTLDedupe: `seen(text)`
+    checks and records.
+    """
+
+    def __init__(self, threshold: float = 0.7, ttl: float = None, capacity: int = None,
+                 bands: int = 8, ngram: int = 2, clock=time.monotonic):
+        self.threshold = max(0.0, min(1.0, float(threshold)))
+        self.ttl = float(ttl) if ttl else None
+        self.capacity = int(capacity) if capacity else None
+        self.bands = max(1, min(32, int(bands)))
+        self.rows = 32 // self.bands
+        self.ngram = max(1, int(ngram))
+        self.clock = clock
+        self._items = {}      # id -> (norm, shingle set, band keys, expiry)
+        self._exact = {}      # norm -> id
+        self._buckets = {}    # band key -> set(ids)
+        self._order = collections.deque()  # (expiry, id)
+        self._next_id = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _band_keys(self, sh):
+        if len(sh) < MIN_SHINGLES:
+            return []
+        rows = [_SIG.unpack(hashlib.blake2b(s.encode('utf-8'), digest_size=64).digest()) for s in sh] or [(0,) * 32]
+        sig = list(map(min, zip(*rows)))
+        r = self.rows
+        return [(i, tuple(sig[i * r:(i + 1) * r])) for i in range(self.bands)]
+
+    def _drop(self, item_id):
+        norm, _, keys, _ = self._items.pop(item_id)
+        if self._exact.get(norm) == item_id:
+            del self._exact[norm]
+        for k in keys:
+            ids = self._buckets.get(k)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._buckets[k]
+        self.evicted += 1
+
+    def _expire(self, now: float):
+        while self._order and self._order[0][0] <= now:
+            _, item_id = self._order.popleft()
+            if item_id in self._items:
+                self._drop(item_id)
+
+    @staticmethod
+    def _norm(text: str) -> str:
+        # Pure emoji/punctuation lines normalize to nothing; keep them as-is
+        return normalize_text(text) or (text or '').strip()
+
+    def match(self, text: str):
+        """Return (similarity, matched_normalized_text) of the best stored near-duplicate, or (0.0, None)."""
+        if self.ttl is not None:
+            self._expire(self.clock())
+        norm = self._norm(text)
+        if norm in self._exact:
+            return 1.0, norm
+        sh = shingles(norm, self.ngram)
+        best, best_norm = 0.0, None
+        cand = set()
+        for k in self._band_keys(sh):
+            cand |= self._buckets.get(k, set())
+        for item_id in cand:
+            other_norm, other_sh, _, _ = self._items[item_id]
+            sim = jaccard(sh, other_sh)
+            if sim > best:
+                best, best_norm = sim, other_norm
+        return best, best_norm
+
+    def _near(self, sh, keys) -> bool:
+        cand = set()
+        for k in keys:
+            ids = self._buckets.get(k)
+            if ids:
+                cand |= ids
+        n, floor = len(sh), self.threshold
+        for item_id in cand:
+            other = self._items[item_id][1]
+            # |A∩B|/|A∪B| <= min/max size, so skip pairs that cannot reach the threshold
+            if min(n, len(other)) < floor * max(n, len(other)):
+                continue
+            if jaccard(sh, other) >= floor:
+                return True
+        return False
+
+    def __contains__(self, text) -> bool:
+        """Like `seen()` without recording `text` or counting a hit."""
+        if self.ttl is not None:
+            self._expire(self.clock())
+        norm = self._norm(text)
+        if norm in self._exact:
+            return True
+        sh = shingles(norm, self.ngram)
+        return self._near(sh, self._band_keys(sh))
+
+    def seen(self, text: str) -> bool:
+        """Return True if `text` (or a line at least `threshold` similar) is stored; otherwise record it."""
+        now = self.clock()
+        if self.ttl is not None:
+            self._expire(now)
+        norm = self._norm(text)
+        if norm in self._exact:
+            self.hits += 1
+            return True
+        sh = shingles(norm, self.ngram)
+        keys = self._band_keys(sh)
+        if self._near(sh, keys):
+            self.hits += 1
+            self.fuzzy_hits += 1
+            return True
+        self.misses += 1
+        item_id = self._next_id
+        self._next_id += 1
+        exp = now + self.ttl if self.ttl is not None else float('inf')
+        self._items[item_id] = (norm, sh, keys, exp)
+        self._exact[norm] = item_id
+        for k in keys:
+            self._buckets.setdefault(k, set()).add(item_id)
+        self._order.append((exp, item_id))
+        if self.capacity is not None:
+            while len(self._items) > self.capacity:
+                _, old = self._order.popleft()
+                if old in self._items:
+                    self._drop(old)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def clear(self):
+        self._items.clear()
+        self._exact.clear()
+        self._buckets.clear()
+        self._order.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def make_dedupe(fuzzy: bool, threshold: float = 0.7, ttl: float = None, capacity: int = None):
+    if fuzzy:
+        return NearDuplicateIndex(threshold=threshold, ttl=ttl, capacity=capacity)
+    return TTLDedupe(ttl=ttl, capacity=capacity)
@@ -0,0 +1,321 @@
+import gzip
+import http.client
+import json
+import socket
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, reason: str, body: bytes = b'', timing=None):
+        super().__init__(f'HTTP {status} {reason}: {body[:300]!r}')
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.timing = timing or {}
+
+
+class HttpResponse:
+    def __init__(self, status: int, headers, body: bytes, timing: dict):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.timing = timing
+
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text())
+
+
+def _open_socket(host: str, port: int, timeout: float, stats: dict):
+    # Resolve and connect separately so DNS and TCP connect can be timed
+    t0 = time.monotonic()
+    infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    t1 = time.monotonic()
+    last_err = None
+    for af, st, proto, _, addr in infos:
+        sock = socket.socket(af, st, proto)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(addr)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            stats['dns_ms'] = round((t1 - t0) * 1000, 1)
+            stats['connect_ms'] = round((time.monotonic() - t1) * 1000, 1)
+            return sock
+        except OSError as e:
+            last_err = e
+            sock.close()
+    raise last_err or OSError(f'cannot connect to {host}:{port}')
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *a, connect_timeout: float = 10.0, **kw):
+        super().__init__(*a, **kw)
+        self.connect_timeout = connect_timeout
+        self.connect_stats = {}
+
+    def connect(self):
+        self.connect_stats = {}
+        self.sock = _open_socket(self.host, self.port, self.connect_timeout, self.connect_stats)
+
+
+class _TimedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *a, connect_timeout: float = 10.0, **kw):
+        super().__init__(*a, **kw)
+        self.connect_timeout = connect_timeout
+        self.connect_stats = {}
+
+    def connect(self):
+        self.connect_stats = {}
+        sock = _open_socket(self.host, self.port, self.connect_timeout, self.connect_stats)
+        t0 = time.monotonic()
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+        self.connect_stats['tls_ms'] = round((time.monotonic() - t0) * 1000, 1)
+
+
+class HttpClient:
+    """Small keep-alive HTTP client shared by the OpenAI and DeepSeek calls.
+
+    Keeps a pool of idle connections per (scheme, host, port) so repeated
+    calls skip DNS/TCP/TLS setup, asks for gzip responses, separates connect
+    and read timeouts, and returns per-call timing (dns/connect/tls/ttfb/
+    total, plus whether the connection was reused) on every response.
+    Plain http:// URLs work too, which makes it easy to point at a local
+    stand-in server.
+    """
+
+    def __init__(self, connect_timeout: float = 10.0, read_timeout: float = 60.0, max_idle_per_host: int = 4):
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout = float(read_timeout)
+        self.max_idle_per_host = max(1, int(max_idle_per_host))
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme: str, host: str, port: int):
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._idle.get(key)
+            if pool:
+                return key, pool.pop()
+        cls = _TimedHTTPSConnection if scheme == 'https' else _TimedHTTPConnection
+        return key, cls(host, port, timeout=self.read_timeout, connect_timeout=self.connect_timeout)
+
+    def _release(self, key, conn):
+        with self._lock:
+            pool = self._idle.setdefault(key, [])
+            if len(pool) < self.max_idle_per_host:
+                pool.append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def _target(url: str):
+        parts = urlsplit(url)
+        scheme = (parts.scheme or 'https').lower()
+        host = parts.hostname or ''
+        port = parts.port or (443 if scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        return scheme, host, port, path
+
+    def request(self, method: str, url: str, body: bytes = None, headers=None, read_timeout: float = None) -> HttpResponse:
+        scheme, host, port, path = self._target(url)
+        hdrs = {'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        hdrs.update(headers or {})
+        timeout = self.read_timeout if read_timeout is None else float(read_timeout)
+        for attempt in (0, 1):
+            key, conn = self._acquire(scheme, host, port)
+            reused = conn.sock is not None
+            t0 = time.monotonic()
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                t_head = time.monotonic()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, http.client.BadStatusLine):
+                conn.close()
+                if reused and attempt == 0:
+                    continue  # stale keep-alive connection; retry once on a fresh one
+                raise
+            except Exception:
+                conn.close()
+                raise
+            t_end = time.monotonic()
+            timing = {'reused': reused}
+            if not reused:
+                timing.update(conn.connect_stats)
+            timing['ttfb_ms'] = round((t_head - t0) * 1000, 1)
+            timing['total_ms'] = round((t_end - t0) * 1000, 1)
+            enc = (resp.getheader('Content-Encoding') or '').lower()
+            if enc == 'gzip':
+                data = gzip.decompress(data)
+            elif enc == 'deflate':
+                data = zlib.decompress(data)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            if resp.status >= 400:
+                raise HttpError(resp.status, resp.reason, data, timing)
+            return HttpResponse(resp.status, resp.headers, data, timing)
+        raise OSError('unreachable')
+
+    def post_json(self, url: str, obj, headers=None, read_timeout: float = None) -> HttpResponse:
+        hdrs = {'Content-Type': 'application/json'}
+        hdrs.update(headers or {})
+        return self.request('POST', url, body=json.dumps(obj).encode('utf-8'), headers=hdrs, read_timeout=read_timeout)
+
+    def stream(self, method: str, url: str, body: bytes = None, headers=None, read_timeout: float = None) -> 'HttpStream':
+        """Send a request and return once the response headers are in; the body is read incrementally.
+
+        Asks for an uncompressed body so every chunk can be used as it
+        arrives. `read_timeout` bounds each read, not the whole response.
+        """
+        scheme, host, port, path = self._target(url)
+        hdrs = {'Accept-Encoding': 'identity', 'Connection': 'keep-alive'}
+        hdrs.update(headers or {})
+        timeout = self.read_timeout if read_timeout is None else float(read_timeout)
+        for attempt in (0, 1):
+            key, conn = self._acquire(scheme, host, port)
+            reused = conn.sock is not None
+            t0 = time.monotonic()
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=hdrs)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, http.client.BadStatusLine):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            timing = {'reused': reused}
+            if not reused:
+                timing.update(conn.connect_stats)
+            timing['ttfb_ms'] = round((time.monotonic() - t0) * 1000, 1)
+            st = HttpStream(self, key, conn, resp, timing, t0)
+            if resp.status >= 400:
+                data = st.read_all()
+                raise HttpError(resp.status, resp.reason, data, st.timing)
+            return st
+        raise OSError('unreachable')
+
+    def post_json_stream(self, url: str, obj, headers=None, read_timeout: float = None) -> 'HttpStream':
+        hdrs = {'Content-Type': 'application/json'}
+        hdrs.update(headers or {})
+        return self.stream('POST', url, body=json.dumps(obj).encode('utf-8'), headers=hdrs, read_timeout=read_timeout)
+
+    def close(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for pool in pools.values():
+            for conn in pool:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+class HttpStream:
+    """Response whose body is consumed as it arrives (chunked or server-sent events).
+
+    Read it to the end and the connection goes back to the pool; `close()`
+    it early to cancel, which drops the connection so the server stops
+    sending. `timing` gains `total_ms` when the stream ends either way.
+    """
+
+    def __init__(self, client: HttpClient, key, conn, resp, timing: dict, t0: float):
+        self.client = client
+        self.key = key
+        self.conn = conn
+        self.resp = resp
+        self.status = resp.status
+        self.headers = resp.headers
+        self.timing = timing
+        self.t0 = t0
+        self.done = False
+        self.cancelled = False
+
+    def lines(self):
+        """Yield the body line by line as bytes, without the line ending."""
+        try:
+            while True:
+                line = self.resp.readline()
+                if not line:
+                    break
+                yield line.rstrip(b'\r\n')
+        except Exception:
+            self.close()
+            raise
+        self._finish()
+
+    def events(self):
+        """Yield the `data` of each server-sent event as str (multi-line data joined by newlines)."""
+        data = []
+        for line in self.lines():
+            if not line:
+                if data:
+                    yield '\n'.join(data)
+                    data = []
+                continue
+            if line.startswith(b'data:'):
+                val = line[5:]
+                data.append((val[1:] if val.startswith(b' ') else val).decode('utf-8', errors='replace'))
+        if data:
+            yield '\n'.join(data)
+
+    def read_all(self) -> bytes:
+        try:
+            data = self.resp.read()
+        except Exception:
+            self.close()
+            raise
+        self._finish()
+        return data
+
+    def _finish(self):
+        if self.done:
+            return
+        self.done = True
+        self.timing['total_ms'] = round((time.monotonic() - self.t0) * 1000, 1)
+        if self.resp.will_close:
+            self.conn.close()
+        else:
+            self.client._release(self.key, self.conn)
+
+    def close(self):
+        """Stop reading; an unfinished body is cancelled by closing the connection."""
+        if self.done:
+            return
+        self.done = True
+        self.cancelled = True
+        self.timing['total_ms'] = round((time.monotonic() - self.t0) * 1000, 1)
+        self.timing['cancelled'] = True
+        try:
+            self.resp.close()
+        finally:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_timing(t: dict) -> str:
+    keys = ('dns_ms', 'connect_ms', 'tls_ms', 'ttfb_ms', 'total_ms')
+    parts = [f'{k[:-3]}={t[k]}ms' for k in keys if k in t]
+    return ' '.join(parts) + (' reused' if t.get('reused') else ' new-conn') + (' cancelled' if t.get('cancelled') else '')
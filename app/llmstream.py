@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+import unicodedata
+
+# Characters that end a sentence, and what may trail it and still belong to it
+SENTENCE_END = set('。！？!?…\n')
+TRAILING = set('。！？!?….~～"\'”’」』）)】》 \t\n')
+
+
+def _trails(ch: str) -> bool:
+    # Closing punctuation, emoji and their modifiers after the terminator
+    return ch in TRAILING or unicodedata.category(ch) in ('So', 'Sk', 'Pe', 'Pf', 'Mn', 'Cf')
+
+
+class SentenceCutter:
+    """Accumulate streamed text and say when the reply is final.
+
+    The reply is final once the first sentence is complete, i.e. a
+    terminator (。！？!?…, newline, or an ASCII '.' followed by a space)
+    is followed by the start of the next sentence, so closing quotes and
+    emoji after the terminator are kept; or once `max_chars` characters
+    have arrived. `feed()` returns the final text at that point, else None.
+    """
+
+    def __init__(self, max_chars: int = 60):
+        self.max_chars = max(1, int(max_chars))
+        self.text = ''
+        self.reason = None
+
+    def _cut(self):
+        t = self.text
+        i = 0
+        while i < len(t):
+            ch = t[i]
+            end = ch in SENTENCE_END or (ch == '.' and i + 1 < len(t) and t[i + 1].isspace())
+            if end and t[:i].strip():
+                j = i + 1
+                while j < len(t) and _trails(t[j]):
+                    j += 1
+                if j < len(t):
+                    return t[:j], 'sentence'
+                return None
+            i += 1
+        if len(t) >= self.max_chars:
+            return t[:self.max_chars], 'max_chars'
+        return None
+
+    def feed(self, delta: str):
+        if self.reason is not None or not delta:
+            return None
+        self.text += delta
+        cut = self._cut()
+        if cut is None:
+            return None
+        self.text, self.reason = cut
+        return self.text.strip()
+
+    def finish(self, reason: str = 'stop') -> str:
+        if self.reason is None:
+            self.reason = reason
+            self.text = self.text[:self.max_chars]
+        return self.text.strip()
+
+
+class UsageDone:
+    """Set once a streamed reply's `usage` is final; `then(fn)` runs `fn()` at that point.
+
+    Waits like a `threading.Event`. `fn` runs right away in the caller's
+    thread if the usage is already final, else on the thread that drains
+    the stream, so the caller never has to block for it.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._fns = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._event.wait(timeout)
+
+    def then(self, fn):
+        with self._lock:
+            if not self._event.is_set():
+                self._fns.append(fn)
+                return
+        fn()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            fns, self._fns = self._fns, []
+        for fn in fns:
+            try:
+                fn()
+            except Exception:
+                pass
+
+
+def _usage_of(data: str):
+    try:
+        obj = json.loads(data)
+    except ValueError:
+        return None
+    return obj.get('usage') if isinstance(obj, dict) else None
+
+
+def _drain(st, events, info: dict, done):
+    # Rest of a stream whose reply is already final: read only for the closing usage event
+    try:
+        for data in events:
+            if data.strip() == '[DONE]':
+                st.read_all()
+                break
+            usage = _usage_of(data)
+            if usage:
+                info['usage'] = usage
+    except Exception:
+        pass
+    finally:
+        st.close()
+        done.set()
+
+
+def stream_chat(http, url: str, payload: dict, headers=None, max_chars: int = 60, read_timeout: float = None,
+                drain: bool = False):
+    """Streamed chat completion, finalized at the first complete sentence.
+
+    Sends `payload` with `stream: true`, consumes the SSE deltas as they
+    arrive and returns as soon as `SentenceCutter` says the reply is
+    final. The rest of the stream is then cancelled, or with `drain`
+    read on a background thread for the token usage the API only sends
+    at the end (and the connection goes back to the pool). Returns
+    `(text, info)`; info has `ttft_ms` (first content token), `final_ms`
+    (reply final), `finish` (sentence, max_chars, stop or eof), `chunks`,
+    `cancelled`, `usage` (None if the stream was cancelled first),
+    `usage_done` (a `UsageDone` set once `usage` is final) and the connection
+    timing. A server that answers with plain JSON instead of an event
+    stream is handled too.
+    """
+    body = dict(payload)
+    body['stream'] = True
+    # Token usage comes in the last event, so it is only seen when the stream runs to its end
+    body.setdefault('stream_options', {'include_usage': True})
+    t0 = time.monotonic()
+    cutter = SentenceCutter(max_chars)
+    info = {'ttft_ms': None, 'final_ms': None, 'finish': None, 'chunks': 0, 'cancelled': False, 'usage': None,
+            'usage_done': UsageDone()}
+    st = http.post_json_stream(url, body, headers=headers, read_timeout=read_timeout)
+    text = None
+    draining = False
+    try:
+        ctype = (st.headers.get('Content-Type') or '').lower()
+        if 'text/event-stream' not in ctype:
+            obj = json.loads(st.read_all().decode('utf-8', errors='replace'))
+            info['ttft_ms'] = info['final_ms'] = round((time.monotonic() - t0) * 1000, 1)
+            info['usage'] = obj.get('usage')
+            cutter.feed(obj['choices'][0]['message'].get('content') or '')
+            text = cutter.finish('stop')
+        else:
+            events = st.events()
+            for data in events:
+                if data.strip() == '[DONE]':
+                    st.read_all()  # end of the body, so the connection can be reused
+                    break
+                try:
+                    obj = json.loads(data)
+                except ValueError:
+                    continue
+                if isinstance(obj, dict) and obj.get('usage'):
+                    info['usage'] = obj['usage']
+                try:
+                    choice = obj['choices'][0]
+                except (KeyError, IndexError, TypeError):
+                    continue
+                info['chunks'] += 1
+                delta = (choice.get('delta') or {}).get('content') or ''
+                if delta and info['ttft_ms'] is None:
+                    info['ttft_ms'] = round((time.monotonic() - t0) * 1000, 1)
+                if text is not None:
+                    continue
+                text = cutter.feed(delta)
+                if text is None and choice.get('finish_reason'):
+                    # Model is done; read on to [DONE] instead of dropping the connection
+                    text = cutter.finish(str(choice['finish_reason']))
+                if text is not None:
+                    info['final_ms'] = round((time.monotonic() - t0) * 1000, 1)
+                    if cutter.reason in ('sentence', 'max_chars'):
+                        if drain:
+                            draining = True
+                            threading.Thread(target=_drain, args=(st, events, info, info['usage_done']),
+                                             name='llm-drain', daemon=True).start()
+                        break
+            if text is None:
+                text = cutter.finish('eof')
+                info['final_ms'] = round((time.monotonic() - t0) * 1000, 1)
+    finally:
+        if not draining:
+            # Cancels the generation if it is still running
+            st.close()
+            info['usage_done'].set()
+    info['finish'] = cutter.reason
+    info['cancelled'] = st.cancelled
+    info['http'] = st.timing
+    return text, info
@@ -10,10 +10,26 @@ import threading
 import queue
 import base64
 import signal
-import urllib.request
-import urllib.error
 import random
 
+from agent_prompt import AgentPrompt, cache_usage
+from dedupe import make_dedupe
+from httpclient import HttpClient, format_timing
+from llmstream import stream_chat
+from ocr.capture import capture_region, encode_frame
+from ocr.change import FrameChangeDetector
+from ocr.scroll import ScrollCropper
+from ocr.pipeline import OcrJob, OcrPipeline
+from ocr.cadence import AdaptiveCadence
+from ocr.engines import ENGINES, OcrResult, make_engine
+from ocr.frame_store import FrameStore
+from ocr.align import CommentAligner
+from ocr.cache import OcrCache
+from asr_client import AsrClient
+from tail import JsonlTail
+from trigger import AgentTrigger
+from bus import EventBus, JsonlSink
+
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_PATH = os.path.join(ROOT_DIR, 'config.json')
 
@@ -105,18 +121,59 @@ class App(tk.Tk):
         self.ocr_thread = None
         self.ocr_stop = threading.Event()
         self.ocr_queue = queue.Queue()
-        self.recent_texts = []  # [(ts, text)]
+        fuzzy = bool(self.cfg.get('dedupe_fuzzy', True))
+        similarity = float(self.cfg.get('dedupe_similarity', 0.7))
+        # Recently emitted comments; kept across OCR restarts so the comment aligner does not re-emit the panel
+        self.recent_texts = make_dedupe(fuzzy, similarity, ttl=60.0, capacity=200)
         # Cloud OCR
         self.cloud_thread = None
+        self.ocr_cache = None
+        # Debug frame archive (content-addressed, size/age bounded)
+        self.frame_store = FrameStore(
+            os.path.join(self.log_path, 'frames'),
+            max_bytes=int(float(self.cfg.get('frame_store_max_mb', 200)) * 1024 * 1024),
+            max_age=float(self.cfg.get('frame_store_max_age_hours', 24)) * 3600,
+            log=self._log,
+        )
+        # Shared keep-alive HTTP client (OpenAI OCR + DeepSeek agent)
+        self.http = HttpClient(
+            connect_timeout=float(self.cfg.get('http_connect_timeout', 10)),
+            read_timeout=float(self.cfg.get('http_read_timeout', 60)),
+        )
+        # Event bus between stages (OCR -> agent, ASR process -> agent); the JSONL logs are a sink on it
+        self.bus = EventBus(log=self._log)
+        self.bus_path = None
+        if self.cfg.get('event_bus', True):
+            try:
+                self.bus.serve(os.path.join(self.log_path, 'bus.sock'))
+                self.bus_path = self.bus.sock_path
+            except Exception as e:
+                self._log(f'event bus socket unavailable ({e}); ASR falls back to asr.jsonl')
+        self.jsonl_sink = JsonlSink(self.bus, {
+            'ocr.line': os.path.join(self.log_path, 'ocr.comments.jsonl'),
+            'asr.text': os.path.join(self.log_path, 'asr.jsonl'),
+            'agent.reply': os.path.join(self.log_path, 'agent.jsonl'),
+        }, log=self._log)
+        self.agent_subs = {}
+        self.agent_backlog = {}
+        # ASR daemon (keeps faster-whisper loaded across start/stop)
+        self.asr_client = AsrClient(os.path.join(self.log_path, 'asr.sock'))
+        self.asr_daemon_proc = None
+        self.asr_job = None
+        self.asr_attach_gen = 0
+        self.asr_ctl_thread = None  # last attach/stop request sent to the daemon; the next one waits for it
         # Agent (DeepSeek)
         self.agent_thread = None
+        self.agent_trigger = None
+        self.agent_prompt = AgentPrompt()
         self.agent_stop = threading.Event()
-        self.agent_last_idx = { 'ocr': 0, 'asr': 0 }
+        # Byte-offset readers over the OCR comment and ASR logs (only appended bytes are read)
+        self.agent_tails = {
+            'ocr': JsonlTail(os.path.join(self.log_path, 'ocr.comments.jsonl')),
+            'asr': JsonlTail(os.path.join(self.log_path, 'asr.jsonl')),
+        }
         # Agent de-dup memory (recent)
-        self.agent_seen_ocr_set = set()
-        self.agent_seen_ocr_list = []  # keep order for trimming
-        self.agent_seen_asr_set = set()
-        self.agent_seen_asr_list = []
+        self.agent_seen_asr = make_dedupe(False, capacity=200)
 
         # Header (minimal controls)
         header = tk.Frame(self)
@@ -257,6 +314,10 @@ class App(tk.Tk):
             cfg_model = default_model
         self.openai_model_var = tk.StringVar(value=cfg_model)
         tk.OptionMenu(self.content, self.openai_model_var, 'gpt-4o-mini', 'gpt-4o').grid(row=row, column=1, sticky='w')
+        tk.Label(self.content, text='OCR 引擎').grid(row=row, column=2, sticky='e')
+        self.ocr_engine_var = tk.StringVar(value=self.cfg.get('ocr_engine', 'openai'))
+        tk.OptionMenu(self.content, self.ocr_engine_var, 'openai', 'tesseract',
+                      command=self._on_ocr_engine_change).grid(row=row, column=3, sticky='w')
         row += 1
         tk.Label(self.content, text='说明：需授予“屏幕录制”权限；调高 FPS 会占用更多 CPU。').grid(row=row, column=0, columnspan=4, pady=6, sticky='w')
 
@@ -292,6 +353,8 @@ class App(tk.Tk):
         tk.Button(self.content, text='开始ASR', command=self.start_asr_cmd, width=16).grid(row=row, column=0, sticky='w', padx=6)
         tk.Button(self.content, text='停止ASR', command=self.stop_asr_cmd, width=16).grid(row=row, column=1, sticky='w', padx=6)
         tk.Button(self.content, text='列出设备', command=self.list_audio_devs_cmd, width=16).grid(row=row, column=2, sticky='w', padx=6)
+        self.asr_stream_var = tk.BooleanVar(value=(self.cfg.get('asr_mode', 'segments') == 'stream'))
+        tk.Checkbutton(self.content, text='流式识别', variable=self.asr_stream_var).grid(row=row, column=3, sticky='w')
         row += 1
         tk.Label(self.content, text='ASR 输出：logs/asr.jsonl（每段一行）').grid(row=row, column=0, columnspan=4, sticky='w')
         row += 1
@@ -305,6 +368,8 @@ class App(tk.Tk):
         tk.Label(self.content, text='轮询间隔(秒)').grid(row=row, column=1, sticky='e')
         self.agent_interval_var = tk.DoubleVar(value=float(self.cfg.get('agent_interval', 10)))
         tk.Entry(self.content, textvariable=self.agent_interval_var, width=8).grid(row=row, column=2, sticky='w')
+        self.agent_event_var = tk.BooleanVar(value=(self.cfg.get('agent_trigger', 'event') == 'event'))
+        tk.Checkbutton(self.content, text='有新内容即触发', variable=self.agent_event_var).grid(row=row, column=3, sticky='w')
         row += 1
         tk.Label(self.content, text='DeepSeek API Key').grid(row=row, column=0, sticky='e')
         self.deepseek_key_var = tk.StringVar(value=self.cfg.get('deepseek_api_key', ''))
@@ -657,6 +722,19 @@ class App(tk.Tk):
             self._log(f'ensure wxocr failed: {e}')
             return None
 
+    def _ensure_wxcap(self):
+        try:
+            cap_bin = os.path.join(ROOT_DIR, 'scripts', 'wxcap')
+            if not os.path.exists(cap_bin):
+                build_sh = os.path.join(ROOT_DIR, 'scripts', 'build_cap.sh')
+                self._log('wxcap not found; attempting build_cap.sh')
+                r = subprocess.run(["bash", build_sh], capture_output=True, text=True)
+                self._log(f'build_cap rc={r.returncode} out={r.stdout!r} err={r.stderr!r}')
+            return cap_bin if os.path.exists(cap_bin) else None
+        except Exception as e:
+            self._log(f'ensure wxcap failed: {e}')
+            return None
+
     def start_ocr_cmd(self):
         if self.ocr_proc is not None or (self.cloud_thread is not None and self.cloud_thread.is_alive()):
             messagebox.showinfo('已在运行', '评论抓取已在运行。')
@@ -729,17 +807,8 @@ class App(tk.Tk):
         except Exception as e:
             self._log(f'ocr reader error: {e}')
 
-    def _dedupe_seen(self, text: str, window_size: int = 200, ttl_sec: float = 60.0) -> bool:
-        now = time.time()
-        # expire
-        self.recent_texts = [(t, s) for (t, s) in self.recent_texts if now - t < ttl_sec]
-        for _, s in self.recent_texts:
-            if s == text:
-                return True
-        self.recent_texts.append((now, text))
-        if len(self.recent_texts) > window_size:
-            self.recent_texts = self.recent_texts[-window_size:]
-        return False
+    def _dedupe_seen(self, text: str) -> bool:
+        return self.recent_texts.seen(text)
 
     def _append_ocr_log(self, ts: str, text: str):
         try:
@@ -749,6 +818,14 @@ class App(tk.Tk):
             pass
 
 
+    def _on_ocr_engine_change(self, value):
+        # Saved on its own: a Tesseract-only setup has no OpenAI key to save it with
+        try:
+            self.cfg['ocr_engine'] = value
+            save_config(self.cfg)
+        except Exception as e:
+            self._log(f'save ocr_engine failed: {e}')
+
     def save_openai_key_cmd(self):
         try:
             key = (self.openai_key_var.get() or '').strip()
@@ -757,6 +834,7 @@ class App(tk.Tk):
                 return
             self.cfg['openai_api_key'] = key
             self.cfg['openai_model'] = self.openai_model_var.get()
+            self.cfg['ocr_engine'] = self.ocr_engine_var.get()
             save_config(self.cfg)
             messagebox.showinfo('已保存', 'OpenAI Key 已保存到本地配置（仅本机）。')
         except Exception as e:
@@ -764,110 +842,241 @@ class App(tk.Tk):
             messagebox.showerror('保存失败', f'无法保存 Key：{e}')
 
     def _cloud_ocr_loop(self):
+        # Capture stage: grab frames on a steady cadence and hand them to the
+        # recognition pool; slow API responses never hold up the next capture.
+        pipeline = None
         try:
-            # Resolve API key
+            # Resolve API key and OCR engine (OpenAI is one engine among others)
             api_key = (self.openai_key_var.get() or '').strip() or os.environ.get('OPENAI_API_KEY', '')
-            if not api_key:
-                self._log('cloud-ocr: no API key; disabled')
+            engine_name = self.ocr_engine_var.get() or 'openai'
+            engine = make_engine(engine_name, http=self.http, api_key=api_key, model=self.openai_model_var.get(),
+                                 langs=self.cfg.get('ocr_tesseract_langs', 'chi_sim+eng'))
+            if not engine.available():
+                self._log(f'cloud-ocr: engine {engine_name} unavailable (missing API key or binary); disabled')
                 return
             try:
                 interval = float(self.cloud_interval_var.get())
             except Exception:
                 interval = 5.0
             interval = max(2.0, min(60.0, interval))
-            model = self.openai_model_var.get()
-            frames_dir = os.path.join(self.log_path, 'frames')
-            os.makedirs(frames_dir, exist_ok=True)
-            out_jsonl = os.path.join(self.log_path, 'ocr.openai.jsonl')
-            self._log(f'cloud-ocr started interval={interval}s model={model}')
+            model = engine.model
+            # In-memory capture; frames only hit disk through the debug sampler
+            cap_bin = self._ensure_wxcap()
+            img_fmt = str(self.cfg.get('ocr_image_format', 'png'))
+            img_quality = int(self.cfg.get('ocr_image_quality', 80))
+            img_max_bytes = int(self.cfg.get('ocr_image_max_bytes', 0))
+            debug_every = int(self.cfg.get('ocr_debug_frame_every', 0))
+            sent_count = 0
+            # Per-engine results file, so offline and cloud runs are not mixed
+            out_jsonl = os.path.join(self.log_path, f'ocr.{engine.name}.jsonl')
+            # Frame-change gate: skip frames that match the last one sent
+            skip_unchanged = bool(self.cfg.get('ocr_skip_unchanged', True))
+            detector = FrameChangeDetector(
+                threshold=float(self.cfg.get('ocr_change_threshold', 0.005)),
+                hash_distance=int(self.cfg.get('ocr_change_hash_distance', 6)),
+            )
+            skipped_total = 0
+            # Scroll-aware cropping: only send rows that scrolled in since the last send
+            delta_crop = bool(self.cfg.get('ocr_delta_crop', True))
+            cropper = ScrollCropper(margin=int(self.cfg.get('ocr_crop_margin', 24)))
+            # A failed request loses its strip; resync so the next frame goes out in full
+            resync = threading.Event()
+            # Adaptive cadence: the GUI interval is the starting point, bounded by user limits
+            adaptive = bool(self.cfg.get('ocr_adaptive', True))
+            cadence = AdaptiveCadence(
+                base=interval,
+                min_interval=float(self.cfg.get('ocr_interval_min', 2.0)),
+                max_interval=float(self.cfg.get('ocr_interval_max', 30.0)),
+                hourly_budget=int(self.cfg.get('ocr_hourly_budget', 0)),
+            )
+            # Frame-to-frame alignment: one record per comment that actually scrolled in
+            aligner = CommentAligner(similarity=float(self.cfg.get('dedupe_similarity', 0.7)), seen=self.recent_texts)
+            # Persistent result cache (shared across runs; closed in on_close since workers may outlive this loop)
+            cache = None
+            if bool(self.cfg.get('ocr_cache', True)):
+                if self.ocr_cache is None:
+                    self.ocr_cache = OcrCache(os.path.join(self.log_path, 'ocr_cache.sqlite3'),
+                                              max_entries=int(self.cfg.get('ocr_cache_max_entries', 5000)), log=self._log)
+                cache = self.ocr_cache
+
+            def write_rec(rec):
+                # Runs in seq order (OrderedWriter), so alignment sees frames in capture order
+                try:
+                    comments = aligner.feed(rec.get('lines'), rec.get('capture_ts'), rec.get('seq', 0), crop=rec.get('crop'))
+                    cadence.observe_result(len(comments))
+                    rec['new_comments'] = len(comments)
+                    with open(out_jsonl, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+                    for c in comments:
+                        # The JSONL sink appends to ocr.comments.jsonl; the agent gets it directly
+                        self.bus.publish('ocr.line', c.as_dict())
+                    self.status_var.set(f'云OCR 新评论: {len(comments)}')
+                except Exception as e:
+                    self._log(f'cloud-ocr write fail: {e}')
+
+            pipeline = OcrPipeline(
+                recognize_fn=lambda job: self._cloud_ocr_request(job, engine, pipeline, cache, cadence),
+                recognize_batch_fn=lambda jobs: self._cloud_ocr_batch_request(jobs, engine, pipeline, cache, cadence),
+                batch_size=int(self.cfg.get('ocr_batch_size', 1)),
+                batch_wait=float(self.cfg.get('ocr_batch_wait', 8.0)),
+                write_fn=write_rec,
+                workers=int(self.cfg.get('ocr_workers', 2)),
+                max_inflight=int(self.cfg.get('ocr_max_inflight', 2)),
+                queue_size=int(self.cfg.get('ocr_queue_size', 4)),
+                log=self._log,
+                on_error=lambda job, e: resync.set(),
+            )
+            pipeline.start()
+            self._log(f'cloud-ocr started engine={engine.name} interval={interval}s adaptive={adaptive} model={model} skip_unchanged={skip_unchanged} '
+                      f'workers={pipeline.workers} queue={pipeline.jobs.maxsize} batch={pipeline.batch_size}/{pipeline.batch_wait}s')
+            next_tick = time.monotonic()
+            reason = 'fixed'
+            last_logged = None
             while not self.ocr_stop.is_set():
+                # Wait for the next tick on a fixed (or adaptive) schedule
+                if adaptive:
+                    interval, reason = cadence.next_interval()
+                    if interval != last_logged and (last_logged is None or abs(interval - last_logged) >= 1.0):
+                        self._log(f'cloud-ocr interval={interval}s reason={reason}')
+                        last_logged = interval
+                next_tick += interval
+                self._ocr_sleep_until(next_tick)
+                if self.ocr_stop.is_set():
+                    break
+                if time.monotonic() - next_tick > interval:
+                    next_tick = time.monotonic()  # fell behind (e.g. sleep/wake); don't burst
                 # Capture
                 if not self.comments_rect:
-                    time.sleep(0.5); continue
+                    continue
                 x1, y1, x2, y2 = self.comments_rect
                 rx, ry = int(min(x1, x2)), int(min(y1, y2))
                 rw, rh = int(abs(x2 - x1)), int(abs(y2 - y1))
                 if rw <= 0 or rh <= 0:
-                    time.sleep(0.5); continue
-                ts = time.strftime('%Y%m%d-%H%M%S')
-                img_path = os.path.join(frames_dir, f'cloud-{ts}.png')
-                r = subprocess.run(['screencapture', '-x', '-R', f'{rx},{ry},{rw},{rh}', img_path], capture_output=True, text=True)
-                if r.returncode != 0 or not os.path.exists(img_path):
-                    self._log(f'cloud-ocr capture fail rc={r.returncode} err={r.stderr!r}')
-                    # Sleep a bit and retry next loop
-                    for _ in range(int(interval * 10)):
-                        if self.ocr_stop.is_set(): break
-                        time.sleep(0.1)
                     continue
-                # Encode image as data URI
+                if resync.is_set():
+                    resync.clear()
+                    detector.reset()
+                    cropper.reset()
+                capture_ts = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
                 try:
-                    with open(img_path, 'rb') as f:
-                        b64 = base64.b64encode(f.read()).decode('ascii')
-                    data_uri = f'data:image/png;base64,{b64}'
+                    frame = capture_region((rx, ry, rw, rh), helper=cap_bin)
                 except Exception as e:
-                    self._log(f'cloud-ocr encode fail: {e}')
-                    time.sleep(1.0)
+                    self._log(f'cloud-ocr capture fail: {e}')
                     continue
-                # Build payload: relaxed prompt -> pure transcription (one line per comment)
-                prompt = (
-                    '只做OCR逐行转写：按屏幕从上到下输出评论文本，尽量还原中文与表情。'
-                    '只输出纯文本，每条评论占一行，不要任何解释或附加内容。'
-                )
-                payload = {
-                    'model': model,
-                    'messages': [
-                        {
-                            'role': 'user',
-                            'content': [
-                                {'type': 'text', 'text': prompt},
-                                {'type': 'image_url', 'image_url': {'url': data_uri, 'detail': 'high'}},
-                            ],
-                        }
-                    ],
-                    'max_tokens': 1200,
-                }
+                # Drop unchanged frames before encoding/uploading
+                change = detector.compare(frame)
+                if skip_unchanged and not change.changed:
+                    cadence.observe_frame(0.0)
+                    detector.skipped += 1
+                    skipped_total += 1
+                    if detector.skipped % 20 == 0:
+                        self._log(f'cloud-ocr skipped {detector.skipped} unchanged frames (total={skipped_total})')
+                    continue
+                if detector.skipped:
+                    self._log(f'cloud-ocr frame changed ({change.reason} dist={change.hash_distance} diff={change.diff_ratio:.4f}) after {detector.skipped} skipped')
+                    detector.skipped = 0
+                profile = frame.row_profile()
+                upload = frame
+                crop = None
+                if delta_crop:
+                    plan = cropper.plan(frame, profile)
+                    crop = plan.as_dict()
+                    if not plan.full:
+                        upload = frame.crop_rows(plan.y0, plan.y1)
+                    # Unknown offset (misaligned/large jump) counts as a full-frame scroll
+                    cadence.observe_frame((plan.offset or 0) / frame.height if plan.reason != 'misaligned' else 1.0)
+                else:
+                    cadence.observe_frame(1.0 if change.reason == 'hash' else 0.0)
+                # Encode image for the request body
                 try:
-                    import urllib.request, urllib.error
-                    req = urllib.request.Request(
-                        url='https://api.openai.com/v1/chat/completions',
-                        data=json.dumps(payload).encode('utf-8'),
-                        headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
-                        method='POST',
-                    )
-                    with urllib.request.urlopen(req, timeout=60) as resp:
-                        raw = resp.read().decode('utf-8', errors='replace')
-                    resp_obj = json.loads(raw)
-                    content = ''
-                    try:
-                        content = resp_obj['choices'][0]['message']['content']
-                    except Exception:
-                        content = raw
-                    # Parse pure-text lines into list
-                    lines = []
-                    for ln in (content or '').splitlines():
-                        s = ln.strip()
-                        if s:
-                            lines.append(s)
-                    rec = {
-                        'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
-                        'model': model,
-                        'image': img_path,
-                        'lines': lines,
-                        'raw': content,
-                    }
-                    with open(out_jsonl, 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(rec, ensure_ascii=False) + '\n')
-                    self.status_var.set('云OCR 已写入一批结果')
+                    mime, img_bytes, used_fmt = encode_frame(upload, img_fmt, img_quality, img_max_bytes, helper=cap_bin)
+                    sent_count += 1
+                    img_path = None
+                    if debug_every > 0 and (sent_count - 1) % debug_every == 0:
+                        img_path = self.frame_store.put(img_bytes, used_fmt, capture_ts)
                 except Exception as e:
-                    self._log(f'cloud-ocr request fail: {e}')
-                # sleep until next
-                for _ in range(int(interval * 10)):
-                    if self.ocr_stop.is_set():
-                        break
-                    time.sleep(0.1)
-            self._log('cloud-ocr stopped')
+                    self._log(f'cloud-ocr encode fail: {e}')
+                    continue
+                meta = {'image': img_path, 'interval': interval, 'interval_reason': reason}
+                if crop is not None:
+                    meta['crop'] = crop
+                job = OcrJob(pipeline.next_seq(), (mime, img_bytes), capture_ts, meta)
+                if pipeline.submit(job):
+                    # Later frames are compared against what is actually in flight
+                    detector.accept(change)
+                    cropper.accept(profile)
+                else:
+                    self._log(f'cloud-ocr queue full; dropped frame seq={job.seq}')
+            st = pipeline.stats
+            if pipeline.batch_size > 1 and st['requests']:
+                frames = st['done'] + st['failed']
+                self._log(f'cloud-ocr batching: {frames} frames ({st["cached"]} from cache) in {st["requests"]} requests '
+                          f'(saved {st["requests_saved"]}), '
+                          f'mean added wait {st["batch_wait_ms"] / max(1, frames):.0f}ms/frame')
+            self._log(f'cloud-ocr stopped (skipped unchanged frames: {skipped_total}, pipeline={st}, align={aligner.stats}, resync dedupe={aligner.seen.stats()}'
+                      f'{", cache=" + str(cache.stats()) if cache is not None else ""})')
         except Exception as e:
             self._log(f'cloud-ocr loop error: {e}')
+        finally:
+            if pipeline is not None:
+                pipeline.stop()
+
+    def _ocr_sleep_until(self, deadline: float):
+        while not self.ocr_stop.is_set():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            time.sleep(min(0.1, left))
+
+    def _cloud_ocr_request(self, job, engine, pipeline, cache=None, cadence=None) -> dict:
+        # Recognition stage (runs on a pool worker): one engine call per job
+        return self._cloud_ocr_batch_request([job], engine, pipeline, cache, cadence)[0]
+
+    def _cloud_ocr_batch_request(self, jobs, engine, pipeline, cache=None, cadence=None) -> list:
+        # Identical pixels (paused stream, idle chat, replays) are answered from the cache
+        recs = [None] * len(jobs)
+        todo = []
+        # A frame recognized inside a multi-frame request saw the batch prompt, so it is cached apart
+        tag = engine.cache_tag(batch=len(jobs) > 1)
+        for i, job in enumerate(jobs):
+            if cache is not None:
+                hit = cache.get(cache.key(job.image[1], tag))
+                if hit is not None:
+                    recs[i] = self._ocr_record(job, engine, OcrResult(hit[0], hit[1], {'cached': True}))
+                    continue
+            todo.append(i)
+        if todo:
+            if cadence is not None:
+                # Only requests that reach the API count against the hourly budget
+                cadence.observe_call()
+            with pipeline.slot():
+                if len(todo) == 1:
+                    results = [engine.recognize_detailed(jobs[todo[0]].image)]
+                else:
+                    results = engine.recognize_batch([jobs[i].image for i in todo])
+            for i, result in zip(todo, results):
+                if cache is not None:
+                    batched = len(todo) > 1 and not result.meta.get('batch_fallback')
+                    cache.put(cache.key(jobs[i].image[1], engine.cache_tag(batch=batched)), result.lines, result.raw)
+                recs[i] = self._ocr_record(jobs[i], engine, result)
+        return recs
+
+    def _ocr_record(self, job, engine, result) -> dict:
+        rec = {
+            'ts': job.capture_ts,
+            'seq': job.seq,
+            'capture_ts': job.capture_ts,
+            'done_ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'latency_ms': int((time.monotonic() - job.capture_mono) * 1000),
+            'engine': engine.name,
+            'model': engine.model,
+            'lines': result.lines,
+            'raw': result.raw,
+            'cached': False,
+        }
+        rec.update(result.meta)
+        rec.update(job.meta)
+        return rec
 
     # === ASR Mic integration ===
     def start_asr_cmd(self):
@@ -877,6 +1086,7 @@ class App(tk.Tk):
             self.cfg['asr_segment_secs'] = int(self.asr_seg_var.get())
             self.cfg['asr_model'] = self.asr_model_var.get()
             self.cfg['asr_compute'] = self.asr_compute_var.get()
+            self.cfg['asr_mode'] = 'stream' if self.asr_stream_var.get() else 'segments'
             save_config(self.cfg)
         except Exception:
             pass
@@ -890,40 +1100,64 @@ class App(tk.Tk):
         env['DEVICE_SPEC'] = device_spec
         audio_dir = os.path.join(self.log_path, 'audio')
         os.makedirs(audio_dir, exist_ok=True)
-        # 录音进程（ffmpeg 分段）
-        rec_sh = os.path.join(ROOT_DIR, 'scripts', 'asr_mic.sh')
-        try:
-            # Recorder log file
-            self._asr_rec_log = open(self.asr_rec_log_path, 'a', encoding='utf-8')
-            self.asr_rec_proc = subprocess.Popen(
-                ['bash', rec_sh],
-                stdout=self._asr_rec_log, stderr=subprocess.STDOUT,
-                text=True, env=env, start_new_session=True,
-            )
-            # Write recorder pidfile
+        # Streaming mode: the transcriber runs ffmpeg itself and reads PCM from its stdout
+        stream = bool(self.asr_stream_var.get())
+        if not stream:
+            # 录音进程（ffmpeg 分段）
+            rec_sh = os.path.join(ROOT_DIR, 'scripts', 'asr_mic.sh')
             try:
-                pdir = os.path.join(self.log_path, 'pids')
-                os.makedirs(pdir, exist_ok=True)
-                with open(os.path.join(pdir, 'asr_rec.pid'), 'w') as f:
-                    f.write(str(self.asr_rec_proc.pid))
-            except Exception:
-                pass
-        except Exception as e:
-            self._log(f'asr rec start fail: {e}')
-            messagebox.showerror('ASR启动失败', f'无法启动录音：{e}')
-            return
+                # Recorder log file
+                self._asr_rec_log = open(self.asr_rec_log_path, 'a', encoding='utf-8')
+                self.asr_rec_proc = subprocess.Popen(
+                    ['bash', rec_sh],
+                    stdout=self._asr_rec_log, stderr=subprocess.STDOUT,
+                    text=True, env=env, start_new_session=True,
+                )
+                # Write recorder pidfile
+                try:
+                    pdir = os.path.join(self.log_path, 'pids')
+                    os.makedirs(pdir, exist_ok=True)
+                    with open(os.path.join(pdir, 'asr_rec.pid'), 'w') as f:
+                        f.write(str(self.asr_rec_proc.pid))
+                except Exception:
+                    pass
+            except Exception as e:
+                self._log(f'asr rec start fail: {e}')
+                messagebox.showerror('ASR启动失败', f'无法启动录音：{e}')
+                return
         # 转写进程（faster-whisper）
         asr_py = os.path.join(ROOT_DIR, 'asr', 'transcribe.py')
         asr_out = os.path.join(self.log_path, 'asr.jsonl')
+        if self.cfg.get('asr_daemon', True):
+            # Attach to the ASR daemon instead of spawning transcribe.py: the model is loaded once
+            model_args = ['--model', self.asr_model_var.get(), '--device', 'auto', '--compute', self.asr_compute_var.get(),
+                          '--workers', str(int(self.cfg.get('asr_workers', 1))),
+                          '--cpu-threads', str(int(self.cfg.get('asr_cpu_threads', 0)))]
+            job_args = ['--out', asr_out] + model_args + [
+                '--vad', 'on' if self.cfg.get('asr_vad', True) else 'off',
+                '--overlap', str(float(self.cfg.get('asr_overlap', 1.0))),
+                '--retain', str(self.cfg.get('asr_retain', 'keep')),
+            ] + (['--bus', self.bus_path] if self.bus_path else []) + (['--stream', '--stream-device', device_spec] if stream else ['--watch', audio_dir])
+            self.asr_attach_gen += 1
+            self._asr_control(self._asr_attach, model_args, job_args, stream, self.asr_attach_gen)
+            self.status_var.set('ASR 启动中（连接转写服务）…')
+            return
         env2 = os.environ.copy()
         env2['FWHISPER_MODEL'] = self.asr_model_var.get()
         env2['FWHISPER_DEVICE'] = 'auto'
         env2['FWHISPER_COMPUTE'] = self.asr_compute_var.get()
+        env2['ASR_VAD'] = 'on' if self.cfg.get('asr_vad', True) else 'off'
+        env2['ASR_WORKERS'] = str(int(self.cfg.get('asr_workers', 1)))
+        env2['ASR_CPU_THREADS'] = str(int(self.cfg.get('asr_cpu_threads', 0)))
+        env2['ASR_OVERLAP'] = str(float(self.cfg.get('asr_overlap', 1.0)))
+        env2['ASR_RETAIN'] = str(self.cfg.get('asr_retain', 'keep'))
+        if self.bus_path:
+            env2['ASR_BUS'] = self.bus_path
         try:
             # Transcriber log file
             self._asr_worker_log = open(self.asr_worker_log_path, 'a', encoding='utf-8')
             self.asr_proc = subprocess.Popen(
-                ['python3', asr_py, '--watch', audio_dir, '--out', asr_out],
+                ['python3', asr_py, '--out', asr_out] + (['--stream', '--stream-device', device_spec] if stream else ['--watch', audio_dir]),
                 stdout=self._asr_worker_log, stderr=subprocess.STDOUT,
                 text=True, env=env2, start_new_session=True,
             )
@@ -939,14 +1173,85 @@ class App(tk.Tk):
             self._log(f'asr transcriber start fail: {e}')
             messagebox.showerror('ASR启动失败', f'无法启动转写：{e}')
             try:
-                self._terminate_proc(self.asr_rec_proc)
+                if getattr(self, 'asr_rec_proc', None) is not None:
+                    self._terminate_proc(self.asr_rec_proc)
             except Exception:
                 pass
             return
-        self.status_var.set('ASR 已启动（麦克风外放）')
-        self._log('asr started (mic)')
+        self.status_var.set('ASR 已启动（麦克风外放）' + ('，流式' if stream else ''))
+        self._log(f'asr started (mic, {"stream" if stream else "segments"})')
+
+    def _asr_control(self, fn, *args):
+        # Daemon requests run off the Tk thread but one after another, so a quick stop -> start
+        # cannot send `watch` before the previous job's `stop` (the daemon refuses a watched dir)
+        prev = self.asr_ctl_thread
+
+        def run():
+            if prev is not None:
+                prev.join()
+            fn(*args)
+        self.asr_ctl_thread = threading.Thread(target=run, daemon=True)
+        self.asr_ctl_thread.start()
+
+    def _asr_attach(self, model_args, job_args, stream: bool, gen: int):
+        # Runs off the Tk thread: the first start waits for the daemon to load the model
+        client = self.asr_client
+        kind = 'stream' if stream else 'watch'
+        try:
+            t0 = time.time()
+            if not client.alive():
+                if getattr(self, '_asr_worker_log', None) is None:
+                    self._asr_worker_log = open(self.asr_worker_log_path, 'a', encoding='utf-8')
+                daemon_py = os.path.join(ROOT_DIR, 'asr', 'daemon.py')
+                self.asr_daemon_proc = client.spawn(['python3', daemon_py, '--socket', client.sock_path] + model_args,
+                                                    log_file=self._asr_worker_log)
+                try:
+                    pdir = os.path.join(self.log_path, 'pids')
+                    os.makedirs(pdir, exist_ok=True)
+                    with open(os.path.join(pdir, 'asr_daemon.pid'), 'w') as f:
+                        f.write(str(self.asr_daemon_proc.pid))
+                except Exception:
+                    pass
+                self._log(f'asr daemon started in {time.time() - t0:.1f}s')
+            t1 = time.time()
+            job = client.start_job(kind, job_args)
+            if gen != self.asr_attach_gen:
+                # Stopped while we were attaching
+                client.stop_job(job)
+                return
+            self.asr_job = job
+            loads = client.status().get('loads') or []
+            last = loads[-1] if loads else {}
+            self._log(f'asr attached: job {job} ({kind}) in {time.time() - t1:.2f}s; '
+                      f'{len(loads)} model load(s), last {last.get("model")}/{last.get("compute")} {last.get("load_s")}s')
+            self.after(0, lambda: self.status_var.set('ASR 已启动（麦克风外放）' + ('，流式' if stream else '')))
+        except Exception as e:
+            msg = str(e)
+            self._log(f'asr daemon attach fail: {msg}')
+            self.after(0, lambda: messagebox.showerror('ASR启动失败', f'无法连接转写服务：{msg}'))
+            try:
+                if getattr(self, 'asr_rec_proc', None) is not None:
+                    self._terminate_proc(self.asr_rec_proc)
+                    self.asr_rec_proc = None
+            except Exception:
+                pass
+
+    def _asr_detach(self):
+        job, self.asr_job = self.asr_job, None
+        self.asr_attach_gen += 1
+        if job is None:
+            return
+
+        def stop():
+            try:
+                self.asr_client.stop_job(job)
+                self._log(f'asr job {job} stopped (daemon keeps the model loaded)')
+            except Exception as e:
+                self._log(f'asr job stop fail: {e}')
+        self._asr_control(stop)
 
     def stop_asr_cmd(self):
+        self._asr_detach()
         for p in ['asr_proc', 'asr_rec_proc']:
             proc = getattr(self, p, None)
             if proc is not None:
@@ -1001,7 +1306,7 @@ class App(tk.Tk):
     def start_all_cmd(self):
         # Ensure keys present
         oai = (self.openai_key_var.get() or '').strip()
-        if not oai:
+        if not oai and self.ocr_engine_var.get() == 'openai':
             messagebox.showwarning('缺少 OpenAI Key', '请先在云 OCR 区域填写并保存 OpenAI API Key。')
             return
         dsk = (self.deepseek_key_var.get() or '').strip()
@@ -1142,7 +1447,9 @@ class App(tk.Tk):
         # Truncate/remove previous OCR/ASR/Agent outputs and segments/images
         try:
             # Files to remove
-            for fn in ('ocr.openai.jsonl', 'asr.jsonl', 'agent.jsonl'):
+            for fn in [f'ocr.{name}.jsonl' for name in ENGINES] + [
+                    'ocr.comments.jsonl', 'asr.jsonl', 'agent.jsonl',
+                    'asr_checkpoint.sqlite3', 'asr_checkpoint.sqlite3-wal', 'asr_checkpoint.sqlite3-shm']:
                 p = os.path.join(self.log_path, fn)
                 if os.path.exists(p):
                     try:
@@ -1154,24 +1461,16 @@ class App(tk.Tk):
             audio_dir = os.path.join(self.log_path, 'audio')
             if os.path.isdir(audio_dir):
                 for name in os.listdir(audio_dir):
-                    if name.startswith('seg-') and name.lower().endswith('.wav'):
+                    if name.startswith('seg-') and name.lower().endswith(('.wav', '.flac')):
                         fp = os.path.join(audio_dir, name)
                         try:
                             os.remove(fp)
                         except Exception:
                             pass
                 self._log('cleared audio segments')
-            # Frames images
-            frames_dir = os.path.join(self.log_path, 'frames')
-            if os.path.isdir(frames_dir):
-                for name in os.listdir(frames_dir):
-                    if name.endswith('.png'):
-                        fp = os.path.join(frames_dir, name)
-                        try:
-                            os.remove(fp)
-                        except Exception:
-                            pass
-                self._log('cleared frames images')
+            # Frames images (rename now, delete in the background)
+            self.frame_store.clear()
+            self._log('cleared frames images')
             # PID files
             pids_dir = os.path.join(self.log_path, 'pids')
             if os.path.isdir(pids_dir):
@@ -1183,10 +1482,10 @@ class App(tk.Tk):
                         except Exception:
                             pass
             # Reset in-memory de-dupe/state
-            self.agent_last_idx = {'ocr': 0, 'asr': 0}
-            self.agent_seen_ocr_set.clear(); self.agent_seen_ocr_list.clear()
-            self.agent_seen_asr_set.clear(); self.agent_seen_asr_list.clear()
-            self.recent_texts = []
+            for tail in self.agent_tails.values():
+                tail.reset()
+            self.agent_seen_asr.clear()
+            self.recent_texts.clear()
         except Exception as e:
             self._log(f'_clear_history error: {e}')
 
@@ -1198,6 +1497,7 @@ class App(tk.Tk):
             self.cfg['deepseek_base'] = self.deepseek_base_var.get()
             self.cfg['agent_interval'] = float(self.agent_interval_var.get())
             self.cfg['agent_auto_send'] = bool(self.agent_auto_send_var.get())
+            self.cfg['agent_trigger'] = 'event' if self.agent_event_var.get() else 'interval'
             # persona & rate limits & random interval
             try:
                 persona = self.agent_persona_txt.get('1.0', 'end').strip()
@@ -1234,6 +1534,26 @@ class App(tk.Tk):
             messagebox.showwarning('Key 为空', '请先填写 DeepSeek API Key 并保存。')
             return
         self.agent_stop.clear()
+        self.agent_prompt = AgentPrompt(refresh=float(self.cfg.get('agent_summary_refresh', 300)))
+        if self.agent_event_var.get():
+            self.agent_trigger = AgentTrigger(
+                debounce=float(self.cfg.get('agent_debounce', 1.5)),
+                max_wait=float(self.cfg.get('agent_max_wait', 6)),
+                min_gap=float(self.cfg.get('agent_min_gap', 8)),
+            )
+            if not self.bus_path:
+                # ASR is not publishing on the bus: watch asr.jsonl (written by another process) by size
+                self.agent_trigger.watch(self.agent_tails['asr'].path, 'asr')
+            else:
+                # Bus-fed, but the transcriber appends to asr.jsonl itself while the bus is unreachable
+                self.agent_trigger.watch(self.agent_tails['asr'].path, 'asr',
+                                         probe=lambda: self._agent_poll_fallback('asr'))
+            if not self.agent_ignore_history_var.get():
+                self.agent_trigger.notify('history')
+        else:
+            self.agent_trigger = None
+        # Subscribe before reading history so nothing published in between is missed
+        self._agent_subscribe(self.agent_trigger)
         try:
             self._init_agent_offsets(ignore_history=self.agent_ignore_history_var.get())
         except Exception:
@@ -1248,38 +1568,58 @@ class App(tk.Tk):
             self.agent_stop.set()
         except Exception:
             pass
-        self._log('agent stopped')
+        self.agent_trigger = None
+        subs, self.agent_subs = self.agent_subs, {}
+        for sub in subs.values():
+            self.bus.unsubscribe(sub)
+            self._log(f'agent bus subscription stats: {sub.stats()}')
+        self._log(f'agent stopped (dedupe asr={self.agent_seen_asr.stats()}, '
+                  f'prompt summary rebuilt {self.agent_prompt.rebuilt}x in {self.agent_prompt.builds} calls)')
         self.status_var.set('Agent 已停止')
 
     def _agent_loop(self):
         try:
-            out_jsonl = os.path.join(self.log_path, 'agent.jsonl')
-            ocr_path = os.path.join(self.log_path, 'ocr.openai.jsonl')
-            asr_path = os.path.join(self.log_path, 'asr.jsonl')
+            trigger = self.agent_trigger
             while not self.agent_stop.is_set():
-                # Compute polling interval (supports random range via advanced settings saved in cfg)
-                try:
-                    if bool(self.cfg.get('agent_random_interval', False)):
-                        imin = float(self.cfg.get('agent_random_min', 8))
-                        imax = float(self.cfg.get('agent_random_max', 18))
-                        interval = max(2.0, min(60.0, random.uniform(min(imin, imax), max(imin, imax))))
-                    else:
-                        interval = float(self.agent_interval_var.get() or self.cfg.get('agent_interval', 10))
-                        interval = max(2.0, min(60.0, interval))
-                except Exception:
-                    interval = 10.0
+                fire = None
+                if trigger is not None:
+                    # Event mode: returns once new input has settled (debounce / max-wait / min-gap)
+                    fire = trigger.wait(self.agent_stop)
+                    if fire is None:
+                        break
+                else:
+                    # Compute polling interval (supports random range via advanced settings saved in cfg)
+                    try:
+                        if bool(self.cfg.get('agent_random_interval', False)):
+                            imin = float(self.cfg.get('agent_random_min', 8))
+                            imax = float(self.cfg.get('agent_random_max', 18))
+                            interval = max(2.0, min(60.0, random.uniform(min(imin, imax), max(imin, imax))))
+                        else:
+                            interval = float(self.agent_interval_var.get() or self.cfg.get('agent_interval', 10))
+                            interval = max(2.0, min(60.0, interval))
+                    except Exception:
+                        interval = 10.0
                 # Read new OCR lines
-                ocr_lines = self._read_new_ocr_lines(ocr_path)
-                asr_texts = self._read_new_asr_lines(asr_path)
+                ocr_lines = self._read_new_ocr_lines()
+                asr_texts = self._read_new_asr_lines()
                 if ocr_lines or asr_texts:
-                    prompt = self._build_agent_prompt(ocr_lines, asr_texts)
-                    reply = self._call_deepseek(prompt)
+                    messages = self._build_agent_prompt(ocr_lines, asr_texts)
+                    prefix = self.agent_prompt.prefix_info(messages)
+                    t_call = time.time()
+                    reply, llm_timing, on_usage = self._call_deepseek(messages)
+                    replied_at = time.time()
+                    prompt = '\n\n'.join(m['content'] for m in messages)
                     rec = {
                         'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
                         'prompt_preview': prompt[:4000],
                         'reply': reply,
                         'auto_sent': False,
+                        'prefix': prefix,
                     }
+                    rec['latency'] = {'llm_ms': int((replied_at - t_call) * 1000)}
+                    rec['latency'].update(llm_timing)
+                    if fire is not None:
+                        rec['latency'].update(fire.as_dict(replied_at))
                     # Auto send if configured, reply non-empty, and under rate limits
                     if reply and self.agent_auto_send_var.get():
                         if self._can_send_now():
@@ -1293,11 +1633,17 @@ class App(tk.Tk):
                         else:
                             rec['auto_sent'] = False
                             rec['rate_limited'] = True
-                    try:
-                        with open(out_jsonl, 'a', encoding='utf-8') as f:
-                            f.write(json.dumps(rec, ensure_ascii=False) + '\n')
-                    except Exception:
-                        pass
+
+                    def publish(usage, rec=rec):
+                        if usage:
+                            rec['usage'] = usage
+                        # The JSONL sink appends it to agent.jsonl
+                        self.bus.publish('agent.reply', rec)
+                    # A streamed reply's token counts arrive once the rest of its stream is read; the record
+                    # is published from the drain thread then, so the loop goes straight back to waiting
+                    on_usage(publish)
+                if trigger is not None:
+                    continue
                 # sleep
                 for _ in range(int(interval*10)):
                     if self.agent_stop.is_set():
@@ -1331,138 +1677,133 @@ class App(tk.Tk):
         except Exception:
             pass
 
+    def _agent_subscribe(self, trigger):
+        # OCR comments always arrive on the in-process bus; ASR only when the transcriber can reach its socket
+        topics = {'ocr': 'ocr.line'}
+        if self.bus_path:
+            topics['asr'] = 'asr.text'
+        for kind, topic in topics.items():
+            listener = (lambda msg, kind=kind: trigger.notify(kind)) if trigger is not None else None
+            self.agent_subs[kind] = self.bus.subscribe([topic], maxsize=500, listener=listener, name=f'agent.{kind}')
+
     def _init_agent_offsets(self, ignore_history: bool):
-        ocr_path = os.path.join(self.log_path, 'ocr.openai.jsonl')
-        asr_path = os.path.join(self.log_path, 'asr.jsonl')
+        self.agent_backlog = {}
         if ignore_history:
-            try:
-                if os.path.exists(ocr_path):
-                    with open(ocr_path, 'r', encoding='utf-8') as f:
-                        self.agent_last_idx['ocr'] = sum(1 for _ in f)
-                else:
-                    self.agent_last_idx['ocr'] = 0
-            except Exception:
-                self.agent_last_idx['ocr'] = 0
-            try:
-                if os.path.exists(asr_path):
-                    with open(asr_path, 'r', encoding='utf-8') as f:
-                        self.agent_last_idx['asr'] = sum(1 for _ in f)
-                else:
-                    self.agent_last_idx['asr'] = 0
-            except Exception:
-                self.agent_last_idx['asr'] = 0
-            self._log(f'agent offsets initialized to EOF: ocr={self.agent_last_idx["ocr"]} asr={self.agent_last_idx["asr"]}')
+            for tail in self.agent_tails.values():
+                tail.seek_end()
+            self._log(f'agent offsets initialized to EOF: ocr={self.agent_tails["ocr"].offset} '
+                      f'asr={self.agent_tails["asr"].offset} bytes')
         else:
-            self.agent_last_idx = {'ocr': 0, 'asr': 0}
+            for kind, tail in self.agent_tails.items():
+                tail.reset()
+                if kind in self.agent_subs:
+                    # Bus-fed: the whole file is read here, for history
+                    self.agent_backlog[kind] = tail.read()
             self._log('agent offsets initialized to BOF (process history)')
 
-    def _read_new_ocr_lines(self, path: str):
+    def _agent_poll_fallback(self, kind: str) -> int:
+        # A bus-fed file also gets the sink's copies of bus messages; only records the
+        # writer appended itself (bus unreachable, `via: file`) are new to the agent
+        recs = [r for r in self.agent_tails[kind].read() if isinstance(r, dict) and r.get('via') == 'file']
+        if recs:
+            self.agent_backlog.setdefault(kind, []).extend(recs)
+        return len(recs)
+
+    def _agent_records(self, kind: str):
+        sub = self.agent_subs.get(kind)
+        if sub is not None:
+            self._agent_poll_fallback(kind)
+            recs = self.agent_backlog.pop(kind, [])
+            recs.extend(m['data'] for m in sub.drain())
+        else:
+            recs = self.agent_backlog.pop(kind, [])
+            recs.extend(self.agent_tails[kind].read())
+        return recs
+
+    def _read_new_ocr_lines(self):
         try:
             lines = []
-            if not os.path.exists(path):
-                return lines
-            with open(path, 'r', encoding='utf-8') as f:
-                all_lines = f.readlines()
-            start = self.agent_last_idx.get('ocr', 0)
-            for ln in all_lines[start:]:
-                try:
-                    obj = json.loads(ln)
-                    for s in obj.get('lines', [])[:12]:
-                        t = (s or '').strip()
-                        if not t:
-                            continue
-                        # De-dup across frames: skip if seen recently
-                        if t in self.agent_seen_ocr_set:
-                            continue
-                        lines.append(t)
-                        self.agent_seen_ocr_set.add(t)
-                        self.agent_seen_ocr_list.append(t)
-                        # Trim memory to 500 items
-                        if len(self.agent_seen_ocr_list) > 500:
-                            old = self.agent_seen_ocr_list.pop(0)
-                            self.agent_seen_ocr_set.discard(old)
-                except Exception:
-                    continue
-            self.agent_last_idx['ocr'] = len(all_lines)
+            for obj in self._agent_records('ocr'):
+                # One record per aligned comment; repeats are real comments, not duplicates
+                t = (obj.get('text') or '').strip() if isinstance(obj, dict) else ''
+                if t:
+                    lines.append(t)
             return lines[-10:]
         except Exception:
             return []
 
-    def _read_new_asr_lines(self, path: str):
+    def _read_new_asr_lines(self):
         try:
             texts = []
-            if not os.path.exists(path):
-                return texts
-            with open(path, 'r', encoding='utf-8') as f:
-                all_lines = f.readlines()
-            start = self.agent_last_idx.get('asr', 0)
-            for ln in all_lines[start:]:
-                try:
-                    obj = json.loads(ln)
-                    txt = ((obj.get('result') or {}).get('text') or '').strip()
-                    if not txt:
-                        continue
-                    if txt in self.agent_seen_asr_set:
-                        continue
-                    texts.append(txt)
-                    self.agent_seen_asr_set.add(txt)
-                    self.agent_seen_asr_list.append(txt)
-                    if len(self.agent_seen_asr_list) > 200:
-                        old = self.agent_seen_asr_list.pop(0)
-                        self.agent_seen_asr_set.discard(old)
-                except Exception:
+            for obj in self._agent_records('asr'):
+                if not isinstance(obj, dict):
+                    continue
+                txt = ((obj.get('result') or {}).get('text') or '').strip()
+                if not txt:
+                    continue
+                if self.agent_seen_asr.seen(txt):
                     continue
-            self.agent_last_idx['asr'] = len(all_lines)
+                texts.append(txt)
             return texts[-5:]
         except Exception:
             return []
 
-    def _build_agent_prompt(self, ocr_lines, asr_texts) -> str:
-        ctx = []
-        if asr_texts:
-            ctx.append('【主播语音要点】\n' + '\n'.join(f'- {t}' for t in asr_texts))
-        if ocr_lines:
-            ctx.append('【观众评论】\n' + '\n'.join(f'- {l}' for l in ocr_lines))
-        ctx_str = '\n\n'.join(ctx) if ctx else '（暂无上下文）'
+    def _build_agent_prompt(self, ocr_lines, asr_texts):
+        """Chat messages for one agent call: stable system prefix (persona, rules, room summary) + new input."""
         try:
-            sys_prompt = self.agent_persona_txt.get('1.0', 'end').strip()
+            persona = self.agent_persona_txt.get('1.0', 'end').strip()
         except Exception:
-            sys_prompt = ''
-        if not sys_prompt:
-            sys_prompt = '你是直播间的友好观众，用中文自然口吻简短回应，避免敏感内容。限制：不超过40字；可适度使用表情；没内容就返回空字符串。'
-        user_prompt = f'{ctx_str}\n\n请给出一句自然的互动回复：'
-        return sys_prompt + '\n\n' + user_prompt
+            persona = ''
+        return self.agent_prompt.build(persona, ocr_lines, asr_texts)
 
-    def _call_deepseek(self, prompt: str) -> str:
+    def _call_deepseek(self, messages):
+        """Return (reply, timing, on_usage) for one agent call.
+
+        timing has ttft_ms/final_ms when streamed; `on_usage(fn)` calls
+        `fn(usage)` with the token counts (see `cache_usage`) once they are
+        known: right away, or from the thread that reads the rest of a
+        streamed reply.
+        """
         try:
             api_key = (self.deepseek_key_var.get() or '').strip()
             model = self.deepseek_model_var.get() or 'deepseek-chat'
             url = self.deepseek_base_var.get() or 'https://api.deepseek.com/v1/chat/completions'
             payload = {
                 'model': model,
-                'messages': [
-                    {'role': 'user', 'content': prompt}
-                ],
+                'messages': messages,
                 'max_tokens': 120,
             }
-            req = urllib.request.Request(
-                url=url,
-                data=json.dumps(payload).encode('utf-8'),
-                headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
-                method='POST'
-            )
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                raw = resp.read().decode('utf-8', errors='replace')
+            headers = {'Authorization': f'Bearer {api_key}'}
+            if self.cfg.get('agent_stream', True):
+                # Streamed: the reply is final at its first complete sentence. The rest is read in the
+                # background for the usage event at its end (agent_stream_drain), or cancelled
+                reply, info = stream_chat(self.http, url, payload, headers=headers,
+                                          max_chars=int(self.cfg.get('agent_reply_max_chars', 60)),
+                                          drain=bool(self.cfg.get('agent_stream_drain', True)))
+                self._log(f"deepseek stream ttft={info['ttft_ms']}ms final={info['final_ms']}ms "
+                          f"finish={info['finish']} chunks={info['chunks']} http {format_timing(info['http'])}")
+
+                def on_usage(fn):
+                    def done():
+                        usage = cache_usage(info['usage'])
+                        self._log(f"deepseek usage {usage or 'not reported'} http {format_timing(info['http'])}")
+                        fn(usage)
+                    info['usage_done'].then(done)
+                return reply, {'ttft_ms': info['ttft_ms'], 'final_ms': info['final_ms'], 'finish': info['finish']}, on_usage
+            resp = self.http.post_json(url, payload, headers=headers)
+            raw = resp.text()
             obj = json.loads(raw)
+            usage = cache_usage(obj.get('usage'))
+            self._log(f"deepseek http {format_timing(resp.timing)} cached={usage.get('cached_tokens', '?')}")
             content = ''
             try:
                 content = obj['choices'][0]['message']['content']
             except Exception:
                 content = raw
-            return (content or '').strip()
+            return (content or '').strip(), {}, lambda fn: fn(usage)
         except Exception as e:
             self._log(f'deepseek error: {e}')
-            return ''
+            return '', {}, lambda fn: fn({})
 
     def _terminate_proc(self, proc: subprocess.Popen):
         try:
@@ -1497,6 +1838,27 @@ class App(tk.Tk):
             self.stop_asr_cmd()
         except Exception:
             pass
+        try:
+            # The daemon outlives stop/start toggles, not the app (unless asked to)
+            if self.asr_daemon_proc is not None and not self.cfg.get('asr_daemon_persist', False):
+                self.asr_client.shutdown()
+        except Exception:
+            pass
+        try:
+            self.http.close()
+        except Exception:
+            pass
+        try:
+            if self.ocr_cache is not None:
+                self.ocr_cache.close()
+        except Exception:
+            pass
+        try:
+            self._log(f'event bus stats: {self.bus.stats()}')
+            self.jsonl_sink.close()
+            self.bus.close()
+        except Exception:
+            pass
         try:
             self.destroy()
         except Exception:
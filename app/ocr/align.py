@@ -0,0 +1,138 @@
+import time
+
+from dedupe import MIN_SHINGLES, jaccard, normalize_text, shingles
+
+
+class Comment:
+    def __init__(self, cid: str, text: str, ts: str, seq: int, pos: int, reason: str):
+        self.id = cid
+        self.text = text
+        self.ts = ts
+        self.seq = seq
+        self.pos = pos
+        self.reason = reason
+
+    def as_dict(self) -> dict:
+        return {'id': self.id, 'ts': self.ts, 'seq': self.seq, 'pos': self.pos, 'text': self.text, 'reason': self.reason}
+
+
+class CommentAligner:
+    """Turn successive OCR line lists into a stream of comments, each emitted once.
+
+    The comment panel scrolls upwards, so a new full frame begins with the
+    tail of what was already committed and ends with what was appended.
+    `feed` finds the longest suffix of the committed history that matches
+    the frame's prefix line by line, allowing OCR noise (lines compare
+    equal after normalization or above `similarity` bigram Jaccard, short
+    lines such as "666" only exactly, and up to a quarter of the pairs may
+    disagree). Everything after the overlap is new. Because only position matters, a comment that legitimately
+    repeats ("666" twice in a row) is kept.
+
+    A delta-cropped strip (`crop` with `full` False, from `ScrollCropper`)
+    holds only the rows that scrolled in plus a few rows of margin above
+    them, so it is a pure append: the lines that fall in the margin (often
+    a partial line that matches nothing) are skipped and the rest are new.
+
+    When nothing overlaps (big jump, resync after a dropped frame) lines
+    that match anything in the recent history are dropped instead, so a
+    discontinuity degrades to set-style de-duplication rather than
+    re-emitting the whole panel. With `seen` (a `NearDuplicateIndex`, or a
+    `TTLDedupe` for exact matching, from `dedupe.make_dedupe`) that check
+    is an index lookup over every comment committed within its TTL, not a
+    scan of the last `history` lines; a seen-set shared across aligners
+    also keeps a restarted capture from re-emitting the panel.
+    """
+
+    def __init__(self, similarity: float = 0.7, history: int = 64, id_prefix: str = None, seen=None):
+        self.seen = seen
+        self.similarity = float(similarity)
+        self.history = max(8, int(history))
+        self.id_prefix = id_prefix or time.strftime('%Y%m%d%H%M%S', time.gmtime())
+        self.count = 0
+        self.hist = []  # (norm, shingles) of committed comments, oldest first
+        self.stats = {'frames': 0, 'lines': 0, 'emitted': 0, 'overlapped': 0, 'resync': 0}
+
+    def _key(self, text: str):
+        norm = normalize_text(text) or text.strip()
+        return norm, shingles(norm)
+
+    def _same(self, a, b) -> bool:
+        if a[0] == b[0]:
+            return True
+        if len(a[1]) < MIN_SHINGLES or len(b[1]) < MIN_SHINGLES:
+            return False
+        return jaccard(a[1], b[1]) >= self.similarity
+
+    def _overlap(self, keys) -> int:
+        hist = self.hist
+        for k in range(min(len(hist), len(keys)), 0, -1):
+            base = len(hist) - k
+            # Anchor on the last committed line; tolerate noise on the rest
+            if not self._same(hist[-1], keys[k - 1]):
+                continue
+            misses = 0
+            allowed = k // 4
+            for i in range(k - 1):
+                if not self._same(hist[base + i], keys[i]):
+                    misses += 1
+                    if misses > allowed:
+                        break
+            if misses <= allowed:
+                return k
+        return 0
+
+    @staticmethod
+    def _margin_lines(crop, n: int) -> int:
+        # Lines in the margin rows above the scrolled-in part, assuming evenly spaced lines
+        rows = (crop.get('y1') or 0) - (crop.get('y0') or 0)
+        margin = rows - (crop.get('offset') or 0)
+        if rows <= 0 or margin <= 0 or n <= 0:
+            return 0
+        return min(n, int(margin * n / rows + 0.5))
+
+    def _known(self, prior, key) -> bool:
+        if self.seen is not None:
+            return key[0] in self.seen
+        return any(self._same(h, key) for h in prior)
+
+    def feed(self, lines, ts: str = None, seq: int = 0, crop=None):
+        """Align one frame's lines (top to bottom) and return the new Comments.
+
+        `crop` is the frame's crop plan (`CropPlan.as_dict()`), if any.
+        """
+        lines = [s.strip() for s in (lines or []) if s and s.strip()]
+        self.stats['frames'] += 1
+        self.stats['lines'] += len(lines)
+        if not lines:
+            return []
+        keys = [self._key(s) for s in lines]
+        start, reason = 0, 'initial'
+        if crop and not crop.get('full', True):
+            start, reason = self._margin_lines(crop, len(lines)), 'strip'
+        elif self.hist:
+            start = self._overlap(keys)
+            reason = 'append' if start else 'resync'
+        out = []
+        # A first frame is filtered too when the seen-set outlives this aligner (OCR restarted)
+        check = reason == 'resync' or (reason == 'initial' and self.seen is not None and len(self.seen) > 0)
+        prior = self.hist[:] if check else None
+        for i in range(start, len(lines)):
+            if prior is not None and self._known(prior, keys[i]):
+                continue
+            self.count += 1
+            out.append(Comment(f'{self.id_prefix}-{self.count}', lines[i], ts, seq, i, reason))
+            self.hist.append(keys[i])
+        if self.seen is not None:
+            # Recorded after the loop, so a line repeated within this frame is still kept
+            for c in out:
+                self.seen.seen(self._key(c.text)[0])
+        if len(self.hist) > self.history:
+            del self.hist[:-self.history]
+        self.stats['overlapped'] += start
+        self.stats['emitted'] += len(out)
+        if reason == 'resync':
+            self.stats['resync'] += 1
+        return out
+
+    def reset(self):
+        self.hist = []
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class OcrCache:
+    """On-disk map from (image bytes, engine tag) to recognized lines.
+
+    Backed by a single SQLite file so it survives restarts and can be shared
+    with offline tools (re-running a saved session). The engine tag covers
+    engine, model and prompt version, so changing any of them misses
+    instead of returning stale text. Entries are evicted least recently
+    used first once `max_entries` is exceeded. One connection is shared
+    between the recognition workers behind a lock.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, log=None):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.log = log or (lambda msg: None)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evicted = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                        'key TEXT PRIMARY KEY, lines TEXT NOT NULL, raw TEXT, '
+                        'created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)')
+
+    @staticmethod
+    def key(data: bytes, tag: str) -> str:
+        h = hashlib.sha256(data)
+        h.update(b'\0' + tag.encode('utf-8'))
+        return h.hexdigest()
+
+    def get(self, key: str):
+        """Return (lines, raw) for a cached key, or None."""
+        with self.lock:
+            row = self.db.execute('SELECT lines, raw FROM entries WHERE key=?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute('UPDATE entries SET last_used=?, hits=hits+1 WHERE key=?', (time.time(), key))
+        try:
+            return json.loads(row[0]), row[1] or ''
+        except Exception:
+            return None
+
+    def put(self, key: str, lines, raw: str = ''):
+        now = time.time()
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO entries(key, lines, raw, created, last_used, hits) VALUES (?, ?, ?, ?, ?, 0)',
+                            (key, json.dumps(lines, ensure_ascii=False), raw, now, now))
+            self.puts += 1
+            if self.puts % 50 == 0:
+                self._evict()
+
+    def _evict(self):
+        # Called with the lock held
+        count = self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        extra = count - self.max_entries
+        if extra > 0:
+            self.db.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)', (extra,))
+            self.evicted += extra
+            self.log(f'ocr-cache evicted {extra} entries (kept {self.max_entries})')
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self.lock:
+            size = self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {
+            'size': size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self):
+        with self.lock:
+            try:
+                self._evict()
+                self.db.close()
+            except Exception:
+                pass
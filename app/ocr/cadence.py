@@ -0,0 +1,102 @@
+import collections
+import itertools
+import threading
+import time
+
+
+class AdaptiveCadence:
+    """Pick the next cloud OCR capture interval from observed chat velocity.
+
+    Two signals feed a sliding window: new comment lines per recognized
+    frame (from the writer) and scroll displacement per captured frame (from
+    the capture stage). Busy chat shortens the interval so that about
+    `target_lines` new lines arrive between frames; quiet chat backs off
+    towards `max_interval`. An hourly call budget sets a floor on the
+    interval. Thread-safe: results arrive on worker threads.
+    """
+
+    MIN_SAMPLES = 3
+
+    def __init__(self, base: float, min_interval: float, max_interval: float, hourly_budget: int = 0,
+                 window: float = 60.0, target_lines: float = 4.0, backoff: float = 1.5):
+        self.min_interval = max(0.5, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.interval = max(self.min_interval, min(self.max_interval, float(base)))
+        self.hourly_budget = max(0, int(hourly_budget))
+        self.window = max(5.0, float(window))
+        self.target_lines = max(0.5, float(target_lines))
+        self.backoff = max(1.0, float(backoff))
+        self.lines = collections.deque()   # (t, new_lines)
+        self.scrolls = collections.deque()  # (t, fraction of frame height scrolled)
+        self.calls = collections.deque()    # t of each request sent
+        self.lock = threading.Lock()
+
+    def _trim(self, now: float):
+        for dq, span in ((self.lines, self.window), (self.scrolls, self.window), (self.calls, 3600.0)):
+            while dq and now - dq[0][0] > span:
+                dq.popleft()
+
+    def observe_frame(self, scroll_fraction: float):
+        """Capture stage: fraction of the region that scrolled (0 for unchanged frames)."""
+        now = time.monotonic()
+        with self.lock:
+            self.scrolls.append((now, max(0.0, float(scroll_fraction))))
+
+    def observe_call(self):
+        """A request that actually went to the API (cache hits do not count against the budget)."""
+        with self.lock:
+            self.calls.append((time.monotonic(), 1))
+
+    def observe_result(self, new_lines: int):
+        """Writer stage: number of lines in a frame that were not in the previous one."""
+        now = time.monotonic()
+        with self.lock:
+            self.lines.append((now, max(0, int(new_lines))))
+
+    def next_interval(self):
+        """Return (interval_seconds, reason) for the next capture."""
+        now = time.monotonic()
+        with self.lock:
+            self._trim(now)
+            cur = self.interval
+            # The oldest sample's lines arrived before it, i.e. outside the measured span, so it only
+            # opens the span. Until there are a few samples (right after start the first frame is all
+            # "new" lines seen within milliseconds) the interval is held rather than read as a flood.
+            samples = len(self.lines)
+            span = now - self.lines[0][0] if self.lines else 0.0
+            total_lines = sum(n for _, n in itertools.islice(self.lines, 1, None))
+            scroll = max((f for _, f in self.scrolls), default=0.0)
+            last_scroll = self.scrolls[-1][1] if self.scrolls else 0.0
+            if 0 < samples < self.MIN_SAMPLES:
+                target = cur
+                reason = 'warmup'
+            elif total_lines and span > 0:
+                rate = total_lines / span  # lines per second
+                target = self.target_lines / rate
+                reason = 'busy' if target < cur else 'steady'
+            elif scroll > 0.0:
+                target = cur
+                reason = 'scrolling'
+            else:
+                target = cur * self.backoff
+                reason = 'idle-backoff'
+            if last_scroll > 0.5:
+                # More than half the region moved between two frames: we are close to missing lines
+                target = min(target, cur / 2)
+                reason = 'fast-scroll'
+            # Smooth to avoid oscillating between extremes
+            nxt = 0.5 * cur + 0.5 * target
+            if nxt <= self.min_interval:
+                nxt, reason = self.min_interval, reason + ':min'
+            elif nxt >= self.max_interval:
+                nxt, reason = self.max_interval, reason + ':max'
+            if self.hourly_budget:
+                floor = 3600.0 / self.hourly_budget
+                used = len(self.calls)
+                if used >= self.hourly_budget:
+                    # Budget spent for this hour: wait for the oldest call to age out
+                    floor = max(floor, 3600.0 - (now - self.calls[0][0]))
+                if nxt < floor:
+                    nxt, reason = floor, 'budget'
+            self.interval = nxt
+            return round(nxt, 2), reason
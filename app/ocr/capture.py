@@ -0,0 +1,97 @@
+import os
+import subprocess
+import tempfile
+
+from ocr.frame import Frame
+
+MIME = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+class CaptureError(Exception):
+    pass
+
+
+def capture_region(rect, helper: str = None) -> Frame:
+    """Capture (x, y, w, h) screen points into an in-memory Frame.
+
+    Uses the `wxcap` helper, which streams a BMP on stdout. Without it we
+    fall back to `screencapture` into a private temp file that is read back
+    and removed straight away.
+    """
+    rx, ry, rw, rh = (int(v) for v in rect)
+    if helper and os.path.exists(helper):
+        r = subprocess.run([helper, str(rx), str(ry), str(rw), str(rh)], capture_output=True)
+        if r.returncode != 0 or not r.stdout:
+            raise CaptureError(f'wxcap rc={r.returncode} err={r.stderr[:200]!r}')
+        return Frame.from_bmp(r.stdout)
+    fd, path = tempfile.mkstemp(prefix='wxcap-', suffix='.bmp')
+    os.close(fd)
+    try:
+        r = subprocess.run(['screencapture', '-x', '-t', 'bmp', '-R', f'{rx},{ry},{rw},{rh}', path], capture_output=True, text=True)
+        if r.returncode != 0:
+            raise CaptureError(f'screencapture rc={r.returncode} err={r.stderr!r}')
+        with open(path, 'rb') as f:
+            blob = f.read()
+        if not blob:
+            raise CaptureError('screencapture wrote no data')
+        return Frame.from_bmp(blob)
+    finally:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+def _encode_pillow(frame: Frame, fmt: str, quality: int):
+    try:
+        from PIL import Image  # optional
+    except Exception:
+        return None
+    import io
+    img = Image.frombytes('RGB', (frame.width, frame.height), frame.rgb_bytes())
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG' if fmt == 'jpeg' else 'WEBP', quality=int(quality))
+    return buf.getvalue()
+
+
+def _encode_helper(frame: Frame, fmt: str, quality: int, helper: str):
+    if fmt != 'jpeg' or not helper or not os.path.exists(helper):
+        return None
+    # Hand the helper an uncompressed PNG; it re-encodes via ImageIO
+    r = subprocess.run([helper, '--encode', 'jpeg', '--quality', f'{quality / 100.0:.2f}'], input=frame.to_png(level=1), capture_output=True)
+    if r.returncode != 0 or not r.stdout:
+        return None
+    return r.stdout
+
+
+def encode_frame(frame: Frame, fmt: str = 'png', quality: int = 80, max_bytes: int = 0, helper: str = None):
+    """Encode a frame for upload and return (mime, bytes, fmt_used).
+
+    PNG needs only the stdlib. JPEG uses Pillow when installed, else the
+    `wxcap --encode` helper; WebP needs Pillow. Unavailable formats fall back
+    to PNG. With `max_bytes` set, lossy formats step the quality down, then
+    the frame is halved until it fits (or gets too small to read).
+    """
+    fmt = (fmt or 'png').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    quality = max(10, min(95, int(quality)))
+    cur = frame
+    while True:
+        data = None
+        used = fmt
+        if fmt in ('jpeg', 'webp'):
+            q = quality
+            while True:
+                data = _encode_pillow(cur, fmt, q)
+                if data is None:
+                    data = _encode_helper(cur, fmt, q, helper)
+                if data is None or not max_bytes or len(data) <= max_bytes or q <= 40:
+                    break
+                q -= 15
+        if data is None:
+            used = 'png'
+            data = cur.to_png()
+        if not max_bytes or len(data) <= max_bytes or cur.width < 320:
+            return MIME[used], data, used
+        cur = cur.downscale(2)
@@ -0,0 +1,85 @@
+from ocr.frame import Frame
+
+
+def dhash(frame: Frame, size: int = 8) -> int:
+    """Difference hash: compare horizontally adjacent cells of a (size+1) x size thumbnail."""
+    grid = frame.thumbnail(size + 1, size)
+    bits = 0
+    for row in grid:
+        for a, b in zip(row, row[1:]):
+            bits = (bits << 1) | (1 if a > b else 0)
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class FrameSignature:
+    def __init__(self, width: int, height: int, phash: int, grid):
+        self.width = width
+        self.height = height
+        self.phash = phash
+        self.grid = grid
+
+
+class ChangeResult:
+    def __init__(self, changed: bool, signature: FrameSignature, hash_distance: int = -1, diff_ratio: float = 1.0, reason: str = ''):
+        self.changed = changed
+        self.signature = signature
+        self.hash_distance = hash_distance
+        self.diff_ratio = diff_ratio
+        self.reason = reason
+
+
+class FrameChangeDetector:
+    """Decide whether a comments frame differs enough from the last one sent.
+
+    The perceptual hash is a cheap first pass that catches large changes
+    (scrolling, theme switches). When hashes are close we fall back to a
+    downsampled per-cell diff, which is what notices a single new comment.
+    `threshold` is the fraction of grid cells whose mean level moved by more
+    than `pixel_delta` before a frame counts as changed.
+    """
+
+    def __init__(self, threshold: float = 0.005, hash_distance: int = 6, pixel_delta: int = 12, grid_cols: int = 64):
+        self.threshold = max(0.0, float(threshold))
+        self.hash_distance = max(0, int(hash_distance))
+        self.pixel_delta = max(1, int(pixel_delta))
+        self.grid_cols = max(8, int(grid_cols))
+        self.last = None  # FrameSignature of the last frame sent
+        self.skipped = 0
+
+    def signature(self, frame: Frame) -> FrameSignature:
+        rows = max(8, min(256, int(self.grid_cols * frame.height / max(1, frame.width))))
+        return FrameSignature(frame.width, frame.height, dhash(frame), frame.thumbnail(self.grid_cols, rows))
+
+    def compare(self, frame: Frame) -> ChangeResult:
+        sig = self.signature(frame)
+        ref = self.last
+        if ref is None:
+            return ChangeResult(True, sig, reason='first')
+        if (ref.width, ref.height) != (sig.width, sig.height) or len(ref.grid) != len(sig.grid):
+            return ChangeResult(True, sig, reason='resized')
+        dist = hamming(ref.phash, sig.phash)
+        if dist > self.hash_distance:
+            return ChangeResult(True, sig, hash_distance=dist, reason='hash')
+        total = 0
+        moved = 0
+        for ra, rb in zip(ref.grid, sig.grid):
+            for a, b in zip(ra, rb):
+                total += 1
+                if abs(a - b) > self.pixel_delta:
+                    moved += 1
+        ratio = moved / total if total else 0.0
+        if ratio > self.threshold:
+            return ChangeResult(True, sig, hash_distance=dist, diff_ratio=ratio, reason='diff')
+        return ChangeResult(False, sig, hash_distance=dist, diff_ratio=ratio, reason='unchanged')
+
+    def accept(self, result: ChangeResult):
+        """Make `result` the reference for later comparisons (call once the frame is sent)."""
+        self.last = result.signature
+
+    def reset(self):
+        self.last = None
+        self.skipped = 0
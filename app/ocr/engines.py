@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import re
+import shutil
+import subprocess
+
+OCR_PROMPT = (
+    '只做OCR逐行转写：按屏幕从上到下输出评论文本，尽量还原中文与表情。'
+    '只输出纯文本，每条评论占一行，不要任何解释或附加内容。'
+)
+
+OCR_BATCH_PROMPT = (
+    '下面按顺序给出{n}张评论区截图，每张前面有 FRAME k 标记。对每张只做OCR逐行转写：'
+    '按屏幕从上到下输出评论文本，尽量还原中文与表情。输出格式：每张先单独输出一行“=== FRAME k ===”，'
+    '接着每条评论占一行；某张没有文字时只输出标记行。不要任何解释或附加内容。'
+)
+
+_FRAME_MARK = re.compile(r'^\s*=+\s*FRAME\s*(\d+)\s*=+\s*$', re.IGNORECASE)
+
+_CJK_GAP = re.compile(r'(?<=[\u3000-\u9fff\uff00-\uffef])\s+(?=[\u3000-\u9fff\uff00-\uffef])')
+
+
+def split_lines(text: str):
+    lines = []
+    for ln in (text or '').splitlines():
+        s = ln.strip()
+        if s:
+            lines.append(s)
+    return lines
+
+
+def split_frames(text: str, n: int):
+    """Split a batched answer on `=== FRAME k ===` markers into n line lists (None where a marker is missing)."""
+    frames = [None] * n
+    cur = None
+    for ln in (text or '').splitlines():
+        m = _FRAME_MARK.match(ln)
+        if m:
+            k = int(m.group(1))
+            cur = k - 1 if 1 <= k <= n else None
+            if cur is not None and frames[cur] is None:
+                frames[cur] = []
+            continue
+        s = ln.strip()
+        if s and cur is not None:
+            frames[cur].append(s)
+    return frames
+
+
+class OcrResult:
+    def __init__(self, lines, raw: str = '', meta=None):
+        self.lines = lines
+        self.raw = raw
+        self.meta = meta or {}
+
+
+class OcrEngine:
+    """Turn one encoded image into comment lines.
+
+    `image` is a (mime, bytes) pair as produced by `encode_frame`. Engines
+    implement `recognize_detailed`; `recognize` is the plain lines-only view
+    used by callers that do not care about raw output or timing.
+    `recognize_batch` takes several images and returns one result per image;
+    engines that can share a request override it.
+    """
+
+    name = 'base'
+    model = ''
+
+    def recognize(self, image):
+        return self.recognize_detailed(image).lines
+
+    def recognize_detailed(self, image) -> OcrResult:
+        raise NotImplementedError
+
+    def recognize_batch(self, images):
+        return [self.recognize_detailed(im) for im in images]
+
+    def available(self) -> bool:
+        return True
+
+    def cache_tag(self, batch: bool = False) -> str:
+        """Everything besides the pixels that changes the output (used as part of the cache key).
+
+        `batch` is for frames recognized inside a multi-frame `recognize_batch`
+        request; engines whose batch request differs from a single one tag it.
+        """
+        return f'{self.name}:{self.model}'
+
+
+class OpenAIEngine(OcrEngine):
+    name = 'openai'
+
+    def __init__(self, http, api_key: str, model: str = 'gpt-4o', prompt: str = OCR_PROMPT,
+                 url: str = 'https://api.openai.com/v1/chat/completions', detail: str = 'high'):
+        self.http = http
+        self.api_key = api_key
+        self.model = model
+        self.prompt = prompt
+        self.url = url
+        self.detail = detail
+
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def cache_tag(self, batch: bool = False) -> str:
+        prompt = OCR_BATCH_PROMPT if batch else self.prompt
+        prompt_ver = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:10]
+        return f'{self.name}:{self.model}:{self.detail}:{"batch:" if batch else ""}{prompt_ver}'
+
+    def recognize_detailed(self, image) -> OcrResult:
+        mime, data = image
+        data_uri = f'data:{mime};base64,' + base64.b64encode(data).decode('ascii')
+        payload = {
+            'model': self.model,
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': [
+                        {'type': 'text', 'text': self.prompt},
+                        {'type': 'image_url', 'image_url': {'url': data_uri, 'detail': self.detail}},
+                    ],
+                }
+            ],
+            'max_tokens': 1200,
+        }
+        resp = self.http.post_json(self.url, payload, headers={'Authorization': f'Bearer {self.api_key}'})
+        raw = resp.text()
+        try:
+            content = resp.json()['choices'][0]['message']['content']
+        except Exception:
+            content = raw
+        return OcrResult(split_lines(content), content, {'http': resp.timing})
+
+    def recognize_batch(self, images):
+        """One request for all images (one image_url part each, preceded by a FRAME marker).
+
+        Frames whose marker is missing from the answer are re-sent on their
+        own, so a confused reply costs extra requests but never loses lines.
+        """
+        if len(images) == 1:
+            return [self.recognize_detailed(images[0])]
+        parts = [{'type': 'text', 'text': OCR_BATCH_PROMPT.format(n=len(images))}]
+        for i, (mime, data) in enumerate(images, 1):
+            data_uri = f'data:{mime};base64,' + base64.b64encode(data).decode('ascii')
+            parts.append({'type': 'text', 'text': f'FRAME {i}'})
+            parts.append({'type': 'image_url', 'image_url': {'url': data_uri, 'detail': self.detail}})
+        payload = {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': parts}],
+            'max_tokens': min(4000, 1200 * len(images)),
+        }
+        resp = self.http.post_json(self.url, payload, headers={'Authorization': f'Bearer {self.api_key}'})
+        try:
+            content = resp.json()['choices'][0]['message']['content']
+        except Exception:
+            content = resp.text()
+        results = []
+        for i, lines in enumerate(split_frames(content, len(images))):
+            if lines is None:
+                r = self.recognize_detailed(images[i])
+                r.meta['batch_fallback'] = True
+                results.append(r)
+            else:
+                results.append(OcrResult(lines, '\n'.join(lines), {'http': resp.timing}))
+        return results
+
+
+class TesseractEngine(OcrEngine):
+    """Offline CPU OCR through the `tesseract` CLI (brew install tesseract tesseract-lang).
+
+    The image is piped on stdin and text read from stdout, so nothing is
+    written to disk. Tesseract puts spaces between CJK glyphs; those are
+    removed so lines compare equal to the cloud transcription.
+    """
+
+    name = 'tesseract'
+
+    def __init__(self, langs: str = 'chi_sim+eng', psm: int = 6, binary: str = None, timeout: float = 30.0):
+        self.langs = langs
+        self.psm = int(psm)
+        self.binary = binary or shutil.which('tesseract') or '/opt/homebrew/bin/tesseract'
+        self.timeout = float(timeout)
+        self.model = f'tesseract:{langs}'
+
+    def available(self) -> bool:
+        return bool(self.binary) and shutil.which(self.binary) is not None
+
+    def cache_tag(self, batch: bool = False) -> str:
+        return f'{self.name}:{self.langs}:psm{self.psm}'
+
+    def recognize_detailed(self, image) -> OcrResult:
+        _, data = image
+        r = subprocess.run([self.binary, 'stdin', 'stdout', '-l', self.langs, '--psm', str(self.psm)],
+                           input=data, capture_output=True, timeout=self.timeout)
+        if r.returncode != 0:
+            raise RuntimeError(f'tesseract rc={r.returncode} err={r.stderr[:300]!r}')
+        text = _CJK_GAP.sub('', r.stdout.decode('utf-8', errors='replace'))
+        return OcrResult(split_lines(text), text)
+
+
+ENGINES = {
+    'openai': OpenAIEngine,
+    'tesseract': TesseractEngine,
+}
+
+
+def make_engine(name: str, **kw) -> OcrEngine:
+    cls = ENGINES.get((name or 'openai').lower())
+    if cls is None:
+        raise ValueError(f'unknown OCR engine: {name}')
+    if cls is OpenAIEngine:
+        return cls(kw['http'], kw.get('api_key', ''), kw.get('model') or 'gpt-4o')
+    return cls(**{k: v for k, v in kw.items() if k in ('langs', 'psm', 'binary', 'timeout')})
@@ -0,0 +1,147 @@
+import struct
+import zlib
+
+
+class Frame:
+    """A captured screen region held as raw, top-down pixel rows.
+
+    `screencapture -t bmp` writes an uncompressed bitmap, which we can decode
+    with the standard library alone; this keeps the cloud OCR path free of
+    Pillow/numpy while still letting us inspect pixels before uploading.
+    """
+
+    def __init__(self, width: int, height: int, data: bytes, bpp: int, channels=(2, 1, 0)):
+        self.width = width
+        self.height = height
+        self.data = data            # top-down rows, tightly packed (width * bpp bytes each)
+        self.bpp = bpp              # bytes per pixel (3 or 4)
+        self.channels = channels    # byte index of (R, G, B) within a pixel
+        self.stride = width * bpp
+
+    @classmethod
+    def from_bmp(cls, blob: bytes) -> 'Frame':
+        if len(blob) < 54 or blob[:2] != b'BM':
+            raise ValueError('not a BMP image')
+        pix_off = struct.unpack_from('<I', blob, 10)[0]
+        hdr_size = struct.unpack_from('<I', blob, 14)[0]
+        width, height = struct.unpack_from('<ii', blob, 18)
+        bits = struct.unpack_from('<H', blob, 28)[0]
+        compression = struct.unpack_from('<I', blob, 30)[0]
+        if bits not in (24, 32):
+            raise ValueError(f'unsupported BMP depth: {bits}')
+        bpp = bits // 8
+        channels = (2, 1, 0)
+        if compression == 3 and bpp == 4:
+            # BI_BITFIELDS: masks follow a 40-byte header, or live inside V4/V5 headers
+            if hdr_size >= 52 or pix_off >= 14 + 40 + 12:
+                rm, gm, bm = struct.unpack_from('<III', blob, 54)
+                channels = tuple(_mask_byte(m) for m in (rm, gm, bm))
+        elif compression not in (0, 3):
+            raise ValueError(f'unsupported BMP compression: {compression}')
+        top_down = height < 0
+        height = abs(height)
+        row_bytes = width * bpp
+        padded = (row_bytes + 3) & ~3
+        if pix_off + padded * height > len(blob):
+            raise ValueError('truncated BMP image')
+        if padded == row_bytes and top_down:
+            data = blob[pix_off:pix_off + row_bytes * height]
+        else:
+            rows = [blob[pix_off + y * padded: pix_off + y * padded + row_bytes] for y in range(height)]
+            if not top_down:
+                rows.reverse()
+            data = b''.join(rows)
+        return cls(width, height, data, bpp, channels)
+
+    def row(self, y: int) -> bytes:
+        o = y * self.stride
+        return self.data[o:o + self.stride]
+
+    def thumbnail(self, cols: int, rows: int, step: int = 4):
+        """Downsample to a `rows` x `cols` grid of mean green-channel values.
+
+        Green tracks luminance closely enough for change detection, and each
+        cell is averaged over every `step`-th pixel/row to keep this cheap.
+        """
+        cols = max(1, min(cols, self.width))
+        rows = max(1, min(rows, self.height))
+        g = self.channels[1]
+        bpp = self.bpp
+        xs = [(c * self.width) // cols for c in range(cols + 1)]
+        ys = [(r * self.height) // rows for r in range(rows + 1)]
+        grid = []
+        for r in range(rows):
+            sums = [0] * cols
+            counts = [0] * cols
+            y0, y1 = ys[r], max(ys[r] + 1, ys[r + 1])
+            for y in range(y0, y1, step):
+                line = self.row(y)
+                for c in range(cols):
+                    s = line[xs[c] * bpp + g: max(xs[c] + 1, xs[c + 1]) * bpp: bpp * step]
+                    sums[c] += sum(s)
+                    counts[c] += len(s)
+            grid.append([sums[c] // counts[c] if counts[c] else 0 for c in range(cols)])
+        return grid
+
+    def row_profile(self, step: int = 4):
+        """Mean green-channel level of every row, sampling each `step`-th pixel."""
+        g = self.channels[1]
+        bpp = self.bpp
+        prof = []
+        for y in range(self.height):
+            s = self.row(y)[g::bpp * step]
+            prof.append(sum(s) / len(s) if s else 0.0)
+        return prof
+
+    def crop_rows(self, y0: int, y1: int) -> 'Frame':
+        y0 = max(0, min(self.height, y0))
+        y1 = max(y0, min(self.height, y1))
+        return Frame(self.width, y1 - y0, self.data[y0 * self.stride:y1 * self.stride], self.bpp, self.channels)
+
+    def downscale(self, factor: int) -> 'Frame':
+        """Nearest-neighbour downscale by an integer factor."""
+        factor = max(1, int(factor))
+        if factor == 1:
+            return self
+        bpp = self.bpp
+        w = (self.width + factor - 1) // factor
+        out = bytearray()
+        px = bytearray(w * bpp)
+        for y in range(0, self.height, factor):
+            line = self.row(y)
+            for c in range(bpp):
+                px[c::bpp] = line[c::bpp * factor]
+            out += px
+        return Frame(w, (self.height + factor - 1) // factor, bytes(out), bpp, self.channels)
+
+    def rgb_bytes(self) -> bytes:
+        """Pixels as packed RGB rows (the layout PNG and Pillow expect)."""
+        ri, gi, bi = self.channels
+        bpp = self.bpp
+        out = bytearray(self.width * self.height * 3)
+        if self.data:
+            out[0::3] = self.data[ri::bpp]
+            out[1::3] = self.data[gi::bpp]
+            out[2::3] = self.data[bi::bpp]
+        return bytes(out)
+
+    def to_png(self, level: int = 6) -> bytes:
+        rgb = self.rgb_bytes()
+        line = self.width * 3
+        raw = bytearray()
+        for y in range(self.height):
+            raw.append(0)  # filter: none
+            raw += rgb[y * line:(y + 1) * line]
+        ihdr = struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0)
+        return b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', ihdr) + _png_chunk(b'IDAT', zlib.compress(bytes(raw), level)) + _png_chunk(b'IEND', b'')
+
+
+def _mask_byte(mask: int) -> int:
+    for i in range(4):
+        if mask == 0xFF << (8 * i):
+            return i
+    raise ValueError(f'unsupported BMP channel mask: {mask:#x}')
+
+
+def _png_chunk(tag: bytes, body: bytes) -> bytes:
+    return struct.pack('>I', len(body)) + tag + body + struct.pack('>I', zlib.crc32(tag + body) & 0xFFFFFFFF)
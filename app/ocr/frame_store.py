@@ -0,0 +1,179 @@
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+class FrameStore:
+    """Bounded, content-addressed archive for debug frames under logs/frames.
+
+    Files are stored as objects/<aa>/<sha1>.<ext>, so a frame identical to
+    one already stored costs no extra disk. `index.jsonl` maps each capture
+    timestamp to its hash. Total size and age are capped; eviction (least
+    recently stored first) and index compaction run on a background thread,
+    and `clear()` only renames the directory before deleting it off-thread,
+    so callers on the Tk thread never walk the tree.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 200 * 1024 * 1024, max_age: float = 24 * 3600.0, log=None):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_age = max(60.0, float(max_age))
+        self.log = log or (lambda msg: None)
+        self.lru = collections.OrderedDict()  # hash -> (path, size, last_used)
+        self.total = 0
+        self.lock = threading.Lock()
+        self.index_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.loaded = False
+        self.evicted = 0
+        self.thread = None
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._maintain, name='frame-store', daemon=True)
+            self.thread.start()
+
+    def _scan(self):
+        # Rebuild the LRU from disk once (background thread), oldest first
+        found = []
+        if os.path.isdir(self.objects):
+            for shard in os.scandir(self.objects):
+                if not shard.is_dir():
+                    continue
+                for ent in os.scandir(shard.path):
+                    try:
+                        st = ent.stat()
+                    except FileNotFoundError:
+                        continue
+                    found.append((st.st_mtime, ent.name.split('.')[0], ent.path, st.st_size))
+        found.sort()
+        with self.lock:
+            for mtime, h, path, size in reversed(found):
+                if h not in self.lru:
+                    self.lru[h] = (path, size, mtime)
+                    self.total += size
+                    self.lru.move_to_end(h, last=False)
+            # entries put before the scan finished are newer; keep them at the end
+            self.loaded = True
+
+    def put(self, data: bytes, ext: str, capture_ts: str) -> str:
+        h = hashlib.sha1(data).hexdigest()
+        path = os.path.join(self.objects, h[:2], f'{h}.{ext}')
+        now = time.time()
+        with self.lock:
+            hit = h in self.lru
+            if hit:
+                p, size, _ = self.lru.pop(h)
+                self.lru[h] = (p, size, now)
+                path = p
+        if hit and os.path.exists(path):
+            try:
+                os.utime(path, (now, now))
+            except Exception:
+                pass
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            with self.lock:
+                if h not in self.lru:
+                    self.total += len(data)
+                self.lru[h] = (path, len(data), now)
+        with self.index_lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'ts': capture_ts, 'hash': h, 'ext': ext, 'bytes': len(data), 'dup': hit}) + '\n')
+        self._ensure_thread()
+        if self.total > self.max_bytes:
+            self.wake.set()
+        return path
+
+    def _evict(self):
+        now = time.time()
+        victims = []
+        with self.lock:
+            while self.lru:
+                h, (path, size, used) = next(iter(self.lru.items()))
+                if self.total <= self.max_bytes and now - used <= self.max_age:
+                    break
+                self.lru.popitem(last=False)
+                self.total -= size
+                victims.append(path)
+        for p in victims:
+            try:
+                os.remove(p)
+            except Exception:
+                pass
+        if victims:
+            self.evicted += len(victims)
+            self._compact_index()
+            self.log(f'frame-store evicted {len(victims)} frames (total={self.total}B, kept={len(self.lru)})')
+
+    def _compact_index(self):
+        try:
+            with self.lock:
+                live = set(self.lru)
+            with self.index_lock:
+                keep = []
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    for ln in f:
+                        try:
+                            if json.loads(ln).get('hash') in live:
+                                keep.append(ln)
+                        except Exception:
+                            continue
+                tmp = self.index_path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.writelines(keep)
+                os.replace(tmp, self.index_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.log(f'frame-store index compaction failed: {e}')
+
+    def _maintain(self):
+        try:
+            if not self.loaded:
+                self._scan()
+            while True:
+                self._evict()
+                self.wake.wait(timeout=60.0)
+                self.wake.clear()
+        except Exception as e:
+            self.log(f'frame-store maintenance error: {e}')
+
+    def lookup(self, capture_ts: str):
+        """Return the stored path for a capture timestamp, or None."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for ln in f:
+                    rec = json.loads(ln)
+                    if rec.get('ts') == capture_ts:
+                        with self.lock:
+                            ent = self.lru.get(rec['hash'])
+                        return ent[0] if ent else None
+        except Exception:
+            pass
+        return None
+
+    def clear(self):
+        """Drop everything without blocking: rename now, delete in the background."""
+        with self.lock:
+            self.lru.clear()
+            self.total = 0
+        if not os.path.isdir(self.root):
+            return
+        trash = f'{self.root}.trash-{int(time.time() * 1000)}'
+        try:
+            os.rename(self.root, trash)
+        except Exception as e:
+            self.log(f'frame-store clear rename failed: {e}')
+            return
+        threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True}, daemon=True).start()
@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+
+
+class OcrJob:
+    """One captured frame travelling from the capture stage to the writer."""
+
+    def __init__(self, seq: int, image, capture_ts: str, meta=None):
+        self.seq = seq
+        self.image = image              # (mime, bytes)
+        self.capture_ts = capture_ts
+        self.capture_mono = time.monotonic()
+        self.meta = meta or {}          # extra fields copied into the record
+
+
+class OrderedWriter:
+    """Release results strictly in capture order.
+
+    Workers finish out of order; results wait here until every earlier
+    sequence number has completed (or failed, which releases nothing).
+    """
+
+    def __init__(self, write_fn, first_seq: int = 1):
+        self.write_fn = write_fn
+        self.next_seq = first_seq
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def complete(self, seq: int, rec):
+        with self.lock:
+            self.pending[seq] = rec
+            while self.next_seq in self.pending:
+                r = self.pending.pop(self.next_seq)
+                self.next_seq += 1
+                if r is not None:
+                    self.write_fn(r)
+
+    def backlog(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+
+class OcrPipeline:
+    """Capture -> bounded queue -> recognition workers -> ordered writer.
+
+    `recognize_fn(job)` returns a record dict (or raises). It receives a
+    semaphore-guarded slot so at most `max_inflight` requests are on the
+    wire regardless of the worker count. When the queue is full, `submit`
+    refuses the frame instead of blocking so capture cadence stays steady.
+
+    With `batch_size > 1` and a `recognize_batch_fn(jobs) -> [rec]`, a
+    worker collects up to `batch_size` consecutive jobs, waiting at most
+    `batch_wait` seconds after the first one was captured, and recognizes
+    them in one call. Only one worker gathers at a time so batches are not
+    split between workers. `stats` counts the requests saved and the extra
+    queueing time batching added. A record with `cached` set was answered
+    without a request and is counted under `cached` instead of `requests`.
+    """
+
+    def __init__(self, recognize_fn, write_fn, workers: int = 2, max_inflight: int = 2, queue_size: int = 4, log=None, on_error=None,
+                 recognize_batch_fn=None, batch_size: int = 1, batch_wait: float = 0.0):
+        self.recognize_fn = recognize_fn
+        self.recognize_batch_fn = recognize_batch_fn
+        self.batch_size = max(1, int(batch_size)) if recognize_batch_fn else 1
+        self.batch_wait = max(0.0, float(batch_wait))
+        self.gather_lock = threading.Lock()
+        self.writer = OrderedWriter(write_fn)
+        self.workers = max(1, int(workers))
+        self.inflight = threading.BoundedSemaphore(max(1, int(max_inflight)))
+        # A batch must fit in the queue or frames would be dropped while it fills
+        self.jobs = queue.Queue(maxsize=max(1, int(queue_size), self.batch_size * 2))
+        self.log = log or (lambda msg: None)
+        self.on_error = on_error
+        self.stop_evt = threading.Event()
+        self.threads = []
+        self.seq = 0
+        self.stats = {'submitted': 0, 'dropped': 0, 'done': 0, 'failed': 0,
+                      'requests': 0, 'requests_saved': 0, 'cached': 0, 'batch_wait_ms': 0}
+        self.stats_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f'ocr-worker-{i}', daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _bump(self, key: str, n: int = 1):
+        with self.stats_lock:
+            self.stats[key] += n
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def submit(self, job: OcrJob) -> bool:
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            self._bump('dropped')
+            # Keep the sequence contiguous so the writer does not stall on it
+            self.writer.complete(job.seq, None)
+            return False
+        self._bump('submitted')
+        return True
+
+    def slot(self):
+        """Context manager bounding concurrent network requests."""
+        return self.inflight
+
+    def _gather(self):
+        # Called with gather_lock held: first job, then fill up until size or deadline
+        try:
+            first = self.jobs.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.capture_mono + self.batch_wait
+        while len(batch) < self.batch_size and not self.stop_evt.is_set():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=min(0.2, left)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _worker(self):
+        while not self.stop_evt.is_set():
+            if self.batch_size > 1:
+                with self.gather_lock:
+                    batch = self._gather()
+                if batch:
+                    self._run_batch(batch)
+                continue
+            try:
+                job = self.jobs.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            rec = None
+            try:
+                rec = self.recognize_fn(job)
+                self._bump('cached' if rec is not None and rec.get('cached') else 'requests')
+                self._bump('done')
+            except Exception as e:
+                self._bump('requests')
+                self._fail(job, e)
+            finally:
+                self.writer.complete(job.seq, rec)
+                self.jobs.task_done()
+
+    def _fail(self, job: OcrJob, e: Exception):
+        self._bump('failed')
+        self.log(f'cloud-ocr request fail seq={job.seq}: {e}')
+        if self.on_error:
+            try:
+                self.on_error(job, e)
+            except Exception:
+                pass
+
+    def _run_batch(self, batch):
+        # Time the later frames spent waiting for the batch to fill
+        start = time.monotonic()
+        waits = [int((start - j.capture_mono) * 1000) for j in batch]
+        recs = [None] * len(batch)
+        try:
+            self._bump('batch_wait_ms', sum(waits))
+            out = self.recognize_batch_fn(batch)
+            # Cache hits made no request; the other frames shared one, except those the engine re-sent on their own
+            sent = extra = 0
+            for i, rec in enumerate(out[:len(batch)]):
+                if rec is not None:
+                    rec['batch'] = {'size': len(batch), 'index': i, 'wait_ms': waits[i]}
+                    extra += bool(rec.get('batch_fallback'))
+                sent += not (rec is not None and rec.get('cached'))
+                recs[i] = rec
+            if sent:
+                self._bump('requests', 1 + extra)
+                self._bump('requests_saved', sent - 1 - extra)
+            self._bump('cached', len(batch) - sent)
+            self._bump('done', len(batch))
+        except Exception as e:
+            self._bump('requests')
+            for job in batch:
+                self._fail(job, e)
+        finally:
+            for job, rec in zip(batch, recs):
+                self.writer.complete(job.seq, rec)
+                self.jobs.task_done()
+
+    def stop(self):
+        self.stop_evt.set()
@@ -0,0 +1,94 @@
+from ocr.frame import Frame
+
+
+def _err(prev, cur, shift: int, step: int = 1) -> float:
+    # Mean abs difference between cur[y] and prev[y + shift] over the overlap
+    n = len(cur) - shift
+    if n <= 0:
+        return float('inf')
+    total = 0.0
+    cnt = 0
+    for y in range(0, n, step):
+        total += abs(cur[y] - prev[y + shift])
+        cnt += 1
+    return total / cnt if cnt else float('inf')
+
+
+def _shrink(prof, k: int):
+    return [sum(prof[i:i + k]) / len(prof[i:i + k]) for i in range(0, len(prof), k)]
+
+
+def estimate_scroll(prev, cur, max_shift: int, coarse: int = 4):
+    """Estimate how many rows `cur` scrolled up relative to `prev`.
+
+    Matches row profiles (mean level per row) by minimising the mean
+    absolute difference over the overlap. A coarse pass on `coarse`-row
+    blocks narrows the search before refining at full resolution.
+    Returns (shift, error, error_at_zero).
+    """
+    if len(prev) != len(cur) or not cur:
+        return None, float('inf'), float('inf')
+    max_shift = max(0, min(max_shift, len(cur) - 1))
+    pc, cc = _shrink(prev, coarse), _shrink(cur, coarse)
+    best_c = min(range(0, max_shift // coarse + 1), key=lambda s: _err(pc, cc, s))
+    lo = max(0, best_c * coarse - coarse)
+    hi = min(max_shift, best_c * coarse + coarse)
+    best = min(range(lo, hi + 1), key=lambda s: _err(prev, cur, s))
+    return best, _err(prev, cur, best), _err(prev, cur, 0)
+
+
+class CropPlan:
+    def __init__(self, full: bool, y0: int, y1: int, offset=None, reason: str = ''):
+        self.full = full
+        self.y0 = y0
+        self.y1 = y1
+        self.offset = offset
+        self.reason = reason
+
+    def as_dict(self):
+        return {'full': self.full, 'y0': self.y0, 'y1': self.y1, 'offset': self.offset, 'reason': self.reason}
+
+
+class ScrollCropper:
+    """Crop a comments frame down to the rows that scrolled in since the last send.
+
+    Chat scrolls upward, so after a shift of `d` rows only the bottom `d`
+    rows are new. A `margin` of rows above the strip is kept so a comment cut
+    by the boundary is still legible. When alignment is poor (overlays,
+    in-place edits, flat frames) or the strip would be most of the frame,
+    the full frame is sent instead.
+    """
+
+    def __init__(self, margin: int = 24, min_strip: int = 48, max_fraction: float = 0.7, tolerance: float = 3.0):
+        self.margin = max(0, int(margin))
+        self.min_strip = max(1, int(min_strip))
+        self.max_fraction = max(0.1, min(1.0, float(max_fraction)))
+        self.tolerance = max(0.0, float(tolerance))
+        self.last_profile = None
+
+    def plan(self, frame: Frame, profile=None) -> CropPlan:
+        h = frame.height
+        prof = profile if profile is not None else frame.row_profile()
+        prev = self.last_profile
+        if prev is None or len(prev) != h:
+            return CropPlan(True, 0, h, reason='no-reference')
+        shift, err, err0 = estimate_scroll(prev, prof, max_shift=int(h * self.max_fraction))
+        if shift is None or err > self.tolerance:
+            return CropPlan(True, 0, h, offset=shift, reason='misaligned')
+        if shift == 0:
+            return CropPlan(True, 0, h, offset=0, reason='no-scroll')
+        if err0 <= err * 2:
+            # Zero shift fits about as well: the profile is too flat to trust
+            return CropPlan(True, 0, h, offset=shift, reason='ambiguous')
+        y0 = max(0, h - shift - self.margin)
+        if h - y0 < self.min_strip:
+            y0 = max(0, h - self.min_strip)
+        if h - y0 > h * self.max_fraction:
+            return CropPlan(True, 0, h, offset=shift, reason='large-scroll')
+        return CropPlan(False, y0, h, offset=shift, reason='scrolled')
+
+    def accept(self, profile):
+        self.last_profile = profile
+
+    def reset(self):
+        self.last_profile = None
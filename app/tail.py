@@ -0,0 +1,95 @@
+import json
+import os
+
+
+class JsonlTail:
+    """Incremental reader for an append-only JSONL file.
+
+    Remembers the byte offset and inode of the last read, so each `read()`
+    costs only the bytes appended since then, however long the file has
+    grown. A trailing line without its newline (writer mid-append) is kept
+    in a buffer until the rest arrives. A file that got shorter than the
+    offset (truncated) or was replaced by a new inode (deleted and
+    recreated, e.g. by clearing history) is read again from the start.
+    Filesystems reuse a freed inode number right away, so the first bytes
+    of the file are kept as well and compared on every read.
+    """
+
+    HEAD_BYTES = 128
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ino = None
+        self.offset = 0
+        self.partial = b''
+        self.head = b''
+        self.stats = {'reads': 0, 'bytes': 0, 'lines': 0, 'bad': 0, 'truncations': 0, 'rotations': 0}
+
+    def reset(self):
+        """Start over from the beginning of the file (process history)."""
+        self.ino = None
+        self.offset = 0
+        self.partial = b''
+        self.head = b''
+
+    def seek_end(self):
+        """Skip everything already in the file (ignore history)."""
+        self.reset()
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        self.ino = (st.st_dev, st.st_ino)
+        self.offset = st.st_size
+        try:
+            with open(self.path, 'rb') as f:
+                self.head = f.read(self.HEAD_BYTES)
+        except OSError:
+            pass
+
+    def read_lines(self):
+        """Return the complete lines appended since the last call, as bytes."""
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return []
+        with f:
+            st = os.fstat(f.fileno())
+            ino = (st.st_dev, st.st_ino)
+            if self.ino is not None and ino != self.ino:
+                self.stats['rotations'] += 1
+                self.offset, self.partial, self.head = 0, b'', b''
+            elif st.st_size < self.offset:
+                self.stats['truncations'] += 1
+                self.offset, self.partial, self.head = 0, b'', b''
+            elif self.offset and f.read(len(self.head)) != self.head:
+                # Same inode number, different file
+                self.stats['rotations'] += 1
+                self.offset, self.partial, self.head = 0, b'', b''
+            self.ino = ino
+            if len(self.head) < self.HEAD_BYTES and st.st_size > len(self.head):
+                f.seek(0)
+                self.head = f.read(self.HEAD_BYTES)
+            if st.st_size == self.offset:
+                return []
+            f.seek(self.offset)
+            data = f.read()
+        self.stats['reads'] += 1
+        self.stats['bytes'] += len(data)
+        self.offset += len(data)
+        data = self.partial + data
+        cut = data.rfind(b'\n') + 1
+        self.partial = data[cut:]
+        lines = [ln for ln in data[:cut].split(b'\n') if ln.strip()]
+        self.stats['lines'] += len(lines)
+        return lines
+
+    def read(self):
+        """Return the JSON records appended since the last call (unparsable lines are skipped)."""
+        out = []
+        for ln in self.read_lines():
+            try:
+                out.append(json.loads(ln))
+            except ValueError:
+                self.stats['bad'] += 1
+        return out
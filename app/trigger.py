@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+
+class AgentTrigger:
+    """Wake the agent when new input lands instead of on a fixed clock.
+
+    `notify()` marks new input (OCR comments are notified in-process; files
+    written by other processes, such as asr.jsonl, are watched by size,
+    or through a caller's probe, with `watch()` and checked every `poll`
+    seconds). `wait()` returns
+    once a burst has settled: no new input for `debounce` seconds, or
+    `max_wait` seconds after the first input of the burst, whichever
+    comes first, and never sooner than `min_gap` seconds after the
+    previous call. The returned `Fire` carries the detection time of the
+    first input of the burst, for latency accounting.
+    """
+
+    def __init__(self, debounce: float = 1.5, max_wait: float = 6.0, min_gap: float = 8.0, poll: float = 0.2,
+                 clock=time.time):
+        self.debounce = max(0.0, float(debounce))
+        self.max_wait = max(self.debounce, float(max_wait))
+        self.min_gap = max(0.0, float(min_gap))
+        self.poll = float(poll)
+        self.clock = clock
+        self.cond = threading.Condition()
+        self.first = None       # detection time of the oldest unconsumed input
+        self.last = None        # detection time of the newest
+        self.count = 0
+        self.sources = set()
+        self.last_fire = None
+        self.files = {}         # path -> (size, label)
+        self.probes = {}        # label -> callable returning the number of new items
+
+    def watch(self, path: str, label: str, probe=None):
+        """Notify `label` when `path` grows; with `probe`, when `probe()` returns a count > 0 instead."""
+        if probe is not None:
+            self.probes[label] = probe
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        self.files[path] = (size, label)
+
+    def _probe(self):
+        for label, probe in list(self.probes.items()):
+            n = probe()
+            if n:
+                self.notify(label, n)
+        for path, (size, label) in list(self.files.items()):
+            try:
+                now_size = os.path.getsize(path)
+            except OSError:
+                now_size = 0
+            if now_size != size:
+                self.files[path] = (now_size, label)
+                if now_size > size:
+                    self.notify(label)
+
+    def notify(self, source: str = '', n: int = 1):
+        with self.cond:
+            now = self.clock()
+            if self.first is None:
+                self.first = now
+            self.last = now
+            self.count += n
+            if source:
+                self.sources.add(source)
+            self.cond.notify_all()
+
+    def _due(self, now: float):
+        """Return (fire_reason, None) if a call is due now, else (None, seconds to wait)."""
+        if self.first is None:
+            return None, self.poll
+        settle = self.last + self.debounce
+        cap = self.first + self.max_wait
+        at, reason = (settle, 'debounce') if settle <= cap else (cap, 'max_wait')
+        if self.last_fire is not None and self.last_fire + self.min_gap > at:
+            at, reason = self.last_fire + self.min_gap, 'min_gap'
+        if now >= at:
+            return reason, None
+        return None, min(self.poll, at - now)
+
+    def wait(self, stop_evt=None):
+        """Block until a call is due; return a Fire, or None if `stop_evt` was set."""
+        while stop_evt is None or not stop_evt.is_set():
+            self._probe()
+            with self.cond:
+                reason, delay = self._due(self.clock())
+                if reason is not None:
+                    now = self.clock()
+                    fire = Fire(reason, self.first, self.last, now, self.count, sorted(self.sources))
+                    self.first = self.last = None
+                    self.count = 0
+                    self.sources = set()
+                    self.last_fire = now
+                    return fire
+                self.cond.wait(delay)
+        return None
+
+
+class Fire:
+    def __init__(self, reason: str, first: float, last: float, at: float, count: int, sources):
+        self.reason = reason
+        self.first = first
+        self.last = last
+        self.at = at
+        self.count = count
+        self.sources = sources
+
+    def as_dict(self, replied_at: float = None) -> dict:
+        d = {
+            'trigger': self.reason,
+            'events': self.count,
+            'sources': self.sources,
+            'wait_ms': int((self.at - self.first) * 1000),
+        }
+        if replied_at is not None:
+            d['detect_to_reply_ms'] = int((replied_at - self.first) * 1000)
+        return d
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SegmentCheckpoint:
+    """Durable record of transcribed segments (SQLite), so a restart resumes where it stopped.
+
+    A segment is done when a row matches its name, size and mtime; that
+    check needs only a stat, so resuming over a directory full of old
+    segments is instant. When the stat does not match (copied or touched
+    file), the content hash is looked up, so the same audio is never
+    transcribed twice and a new recording that reuses a name is not
+    skipped. Rows beyond `max_rows` are dropped oldest first, which keeps
+    the file and memory flat over long sessions. Marked after the
+    transcript line is written: a crash in between repeats one segment
+    rather than losing it.
+    """
+
+    def __init__(self, path: str, max_rows: int = 50000):
+        self.path = path
+        self.max_rows = max(1, int(max_rows))
+        self.lock = threading.Lock()
+        self.marks = 0
+        self.resumed = 0
+        self.closed = False
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS segments ('
+                        'name TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, '
+                        'hash TEXT PRIMARY KEY, done REAL NOT NULL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS segments_name ON segments(name)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS segments_done ON segments(done)')
+
+    def is_done(self, path: str) -> bool:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        name = os.path.basename(path)
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM segments WHERE name=? AND size=? AND mtime_ns=?',
+                                  (name, st.st_size, st.st_mtime_ns)).fetchone()
+        if row is None:
+            try:
+                digest = file_digest(path)
+            except OSError:
+                return False
+            with self.lock:
+                row = self.db.execute('SELECT 1 FROM segments WHERE hash=?', (digest,)).fetchone()
+        if row is not None:
+            self.resumed += 1
+        return row is not None
+
+    def mark(self, path: str, digest: str = None):
+        try:
+            st = os.stat(path)
+            digest = digest or file_digest(path)
+        except OSError:
+            return
+        with self.lock:
+            if self.closed:
+                # A worker finishing after shutdown: that segment is simply redone next time
+                return
+            self.db.execute('INSERT OR REPLACE INTO segments(name, size, mtime_ns, hash, done) VALUES (?, ?, ?, ?, ?)',
+                            (os.path.basename(path), st.st_size, st.st_mtime_ns, digest, time.time()))
+            self.marks += 1
+            if self.marks % 100 == 0:
+                self._trim()
+
+    def _trim(self):
+        # Called with the lock held
+        extra = self.db.execute('SELECT COUNT(*) FROM segments').fetchone()[0] - self.max_rows
+        if extra > 0:
+            self.db.execute('DELETE FROM segments WHERE hash IN (SELECT hash FROM segments ORDER BY done LIMIT ?)', (extra,))
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self._trim()
+                self.db.close()
+            except Exception:
+                pass
+
+
+class SegmentRetention:
+    """What to do with a segment once its transcript is committed: keep, delete, or flac.
+
+    `flac` re-encodes with ffmpeg in the background (about half the size of
+    PCM WAV) and removes the WAV only after ffmpeg succeeds; the watcher
+    only looks at .wav, so the .flac files are not picked up again.
+    """
+
+    def __init__(self, mode: str = 'keep'):
+        self.mode = mode
+        self.procs = []
+        self.removed = 0
+        self.compressed = 0
+
+    def _reap(self, block: bool = False):
+        left = []
+        for proc, wav in self.procs:
+            rc = proc.wait() if block else proc.poll()
+            if rc is None:
+                left.append((proc, wav))
+            elif rc == 0:
+                self._remove(wav)
+                self.compressed += 1
+            else:
+                print(f"[asr] flac encode failed for {wav} (rc={rc}); keeping wav", file=sys.stderr)
+        self.procs = left
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self.removed += 1
+        except OSError:
+            pass
+
+    def done(self, path: str):
+        if self.mode == 'delete':
+            self._remove(path)
+        elif self.mode == 'flac':
+            self._reap()
+            flac = os.path.splitext(path)[0] + '.flac'
+            try:
+                proc = subprocess.Popen(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', path,
+                                         '-c:a', 'flac', flac],
+                                        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                print(f"[asr] flac encode unavailable ({e}); keeping segments", file=sys.stderr)
+                self.mode = 'keep'
+                return
+            self.procs.append((proc, path))
+
+    def close(self):
+        self._reap(block=True)
@@ -0,0 +1,275 @@
+import argparse
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from stream import stream_and_transcribe
+from transcribe import ROOT_DIR, build_parser, load_model, transcribe_file, transcribe_window, watch_and_transcribe
+from vad import EnergyVad, VadStats, np
+
+DEFAULT_SOCKET = os.path.join(ROOT_DIR, 'logs', 'asr.sock')
+MAX_PCM_BYTES = 16000 * 2 * 600  # 10 minutes of 16 kHz mono
+
+
+class ModelHost:
+    """Loaded WhisperModels keyed by load options; each is loaded once and shared by all jobs.
+
+    Only the most recently requested `keep` models stay cached; a job that
+    still holds an evicted model keeps it alive until it finishes.
+    """
+
+    def __init__(self, keep: int = 1):
+        self.keep = max(1, keep)
+        self.models = {}
+        self.loads = []
+        self.lock = threading.Lock()
+
+    def get(self, name: str, device: str, compute: str, cpu_threads: int = 0, workers: int = 1):
+        key = (name, device, compute, int(cpu_threads), max(1, int(workers)))
+        with self.lock:
+            model = self.models.pop(key, None)
+            if model is None:
+                t0 = time.perf_counter()
+                model = load_model(name, device, compute, cpu_threads=key[3], num_workers=key[4])
+                load_s = time.perf_counter() - t0
+                self.loads.append({'model': name, 'device': device, 'compute': compute, 'cpu_threads': key[3],
+                                   'workers': key[4], 'load_s': round(load_s, 2), 'ts': time.time()})
+                print(f"[asr-daemon] model {name}/{compute} loaded in {load_s:.1f}s", file=sys.stderr)
+            self.models[key] = model  # most recent last
+            while len(self.models) > self.keep:
+                self.models.pop(next(iter(self.models)))
+            return model
+
+    def loaded(self):
+        with self.lock:
+            return [{'model': k[0], 'device': k[1], 'compute': k[2], 'cpu_threads': k[3], 'workers': k[4]}
+                    for k in self.models]
+
+
+class Job:
+    def __init__(self, jid: int, kind: str, args):
+        self.id = jid
+        self.kind = kind
+        self.args = args
+        self.stop = threading.Event()
+        self.thread = None
+        self.started = time.time()
+        self.error = None
+
+    def info(self) -> dict:
+        return {'id': self.id, 'kind': self.kind, 'out': self.args.out, 'watch': getattr(self.args, 'watch', None),
+                'running': bool(self.thread and self.thread.is_alive()), 'uptime_s': round(time.time() - self.started, 1),
+                'error': self.error}
+
+
+class AsrService:
+    """Request handling for the daemon; one instance shared by all connections.
+
+    Ops (one JSON object per request, one JSON reply):
+      status                         model loads with timing, running jobs
+      file   {path, lang?, vad?}     transcribe one audio file, reply with the result
+      pcm    {bytes, sr?, lang?}     transcribe raw s16le mono PCM sent after the header line
+      watch  {args: [...]}           start a background segment watcher (transcribe.py arguments)
+      stream {args: [...]}           start a background streaming transcriber
+      stop   {id}                    stop a background job
+      shutdown
+    """
+
+    def __init__(self, defaults):
+        self.defaults = defaults
+        self.host = ModelHost()
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.shutdown_evt = threading.Event()
+
+    def model_for(self, args):
+        return self.host.get(args.model, args.device, args.compute, args.cpu_threads, args.workers)
+
+    def _job_args(self, argv):
+        try:
+            return build_parser().parse_args(list(argv))
+        except SystemExit:
+            raise ValueError(f'bad job arguments: {argv}')
+
+    def op_status(self, req, payload):
+        with self.lock:
+            jobs = [j.info() for j in self.jobs.values()]
+        return {'ok': True, 'pid': os.getpid(), 'uptime_s': round(time.time() - self.started, 1),
+                'requests': self.requests, 'loads': self.host.loads, 'loaded': self.host.loaded(), 'jobs': jobs}
+
+    def op_file(self, req, payload):
+        a = self.defaults
+        vad = EnergyVad() if req.get('vad', a.vad == 'on') else None
+        t0 = time.perf_counter()
+        res = transcribe_file(self.model_for(a), req['path'], language=req.get('lang', a.lang), vad=vad, vstats=VadStats())
+        return {'ok': 'error' not in res, 'result': res, 'elapsed_ms': int((time.perf_counter() - t0) * 1000)}
+
+    def op_pcm(self, req, payload):
+        if np is None:
+            raise ValueError('pcm jobs need numpy')
+        a = self.defaults
+        vad = EnergyVad(sr=int(req.get('sr', 16000))) if req.get('vad', a.vad == 'on') else None
+        t0 = time.perf_counter()
+        res, words = transcribe_window(self.model_for(a), payload, int(req.get('sr', 16000)), language=req.get('lang', a.lang),
+                                       vad=vad, vstats=VadStats())
+        res['words'] = [[round(w.start, 2), round(w.end, 2), w.text] for w in words]
+        return {'ok': 'error' not in res, 'result': res, 'elapsed_ms': int((time.perf_counter() - t0) * 1000)}
+
+    def _start(self, kind: str, run, args) -> dict:
+        job = Job(next(self.ids), kind, args)
+        # Load (or reuse) the model before replying, so the caller sees load errors
+        model = self.model_for(args)
+
+        def target():
+            try:
+                run(args, model, job.stop)
+            except Exception as e:
+                job.error = str(e)
+                print(f"[asr-daemon] job {job.id} ({kind}) failed: {e}", file=sys.stderr)
+            finally:
+                with self.lock:
+                    self.jobs.pop(job.id, None)
+                print(f"[asr-daemon] job {job.id} ({kind}) finished", file=sys.stderr)
+
+        job.thread = threading.Thread(target=target, name=f'asr-{kind}-{job.id}', daemon=True)
+        with self.lock:
+            self.jobs[job.id] = job
+        job.thread.start()
+        print(f"[asr-daemon] job {job.id} ({kind}) started -> {args.out}", file=sys.stderr)
+        return {'ok': True, 'id': job.id}
+
+    def op_watch(self, req, payload):
+        args = self._job_args(req.get('args') or [])
+        if not args.watch:
+            raise ValueError('watch jobs need --watch')
+        with self.lock:
+            same = [j for j in self.jobs.values() if j.kind == 'watch' and j.args.watch == args.watch]
+        for j in same:
+            if j.stop.is_set():
+                # A quick stop/start: let the previous watcher finish first
+                j.thread.join(timeout=10.0)
+        busy = [j.id for j in same if j.thread.is_alive()]
+        if busy:
+            # Two watchers on one directory would transcribe every segment twice
+            raise ValueError(f'{args.watch} is already watched by job {busy[0]}')
+        return self._start('watch', watch_and_transcribe, args)
+
+    def op_stream(self, req, payload):
+        args = self._job_args(req.get('args') or [])
+        return self._start('stream', stream_and_transcribe, args)
+
+    def op_stop(self, req, payload):
+        with self.lock:
+            job = self.jobs.get(int(req.get('id', 0)))
+        if job is None:
+            return {'ok': True, 'stopped': False}
+        job.stop.set()
+        job.thread.join(timeout=float(req.get('timeout', 10.0)))
+        return {'ok': True, 'stopped': not job.thread.is_alive()}
+
+    def op_shutdown(self, req, payload):
+        self.shutdown_evt.set()
+        return {'ok': True}
+
+    def handle(self, req, payload) -> dict:
+        self.requests += 1
+        fn = getattr(self, 'op_' + str(req.get('op', '')), None)
+        if fn is None:
+            return {'ok': False, 'error': f"unknown op {req.get('op')!r}"}
+        try:
+            return fn(req, payload)
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+
+    def close(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            job.stop.set()
+        for job in jobs:
+            job.thread.join(timeout=10.0)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            try:
+                req = json.loads(line)
+                n = int(req.get('bytes', 0))
+                if n < 0 or n > MAX_PCM_BYTES:
+                    raise ValueError(f'payload of {n} bytes refused')
+                payload = self.rfile.read(n) if n else b''
+                resp = service.handle(req, payload)
+            except Exception as e:
+                resp = {'ok': False, 'error': f'bad request: {e}'}
+            self.wfile.write((json.dumps(resp, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.wfile.flush()
+            if service.shutdown_evt.is_set():
+                break
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(sock_path: str, service: AsrService):
+    try:
+        # A socket left by a crashed daemon; refuse to start if one is still answering
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        probe.connect(sock_path)
+        probe.close()
+        raise SystemExit(f'[asr-daemon] already running on {sock_path}')
+    except (FileNotFoundError, ConnectionRefusedError):
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+    os.makedirs(os.path.dirname(sock_path) or '.', exist_ok=True)
+    server = _Server(sock_path, _Handler)
+    os.chmod(sock_path, 0o600)
+    server.service = service
+    threading.Thread(target=server.serve_forever, name='asr-daemon-server', daemon=True).start()
+    print(f"[asr-daemon] listening on {sock_path} (pid {os.getpid()})", file=sys.stderr)
+    try:
+        while not service.shutdown_evt.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+        try:
+            os.unlink(sock_path)
+        except OSError:
+            pass
+        print("[asr-daemon] stopped", file=sys.stderr)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Long-lived ASR service: loads faster-whisper once, takes jobs over a Unix socket')
+    ap.add_argument('--socket', default=os.environ.get('ASR_SOCKET', DEFAULT_SOCKET))
+    ap.add_argument('--no-preload', action='store_true', help='Load the model on the first job instead of at start')
+    opts, rest = ap.parse_known_args()
+    # Defaults for file/pcm jobs and the preloaded model come from the transcribe.py options
+    defaults = build_parser().parse_args(['--out', os.devnull] + rest)
+    service = AsrService(defaults)
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.shutdown_evt.set())
+    if not opts.no_preload:
+        service.model_for(defaults)
+    serve(opts.socket, service)
+
+
+if __name__ == '__main__':
+    main()
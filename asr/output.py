@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TranscriptOutput:
+    """Destination for transcript records: the app's event bus when it is up, else the JSONL file.
+
+    With a bus the record is published on `asr.text` and the app's JSONL
+    sink writes `out`, so there is still exactly one writer per file. If
+    the bus is unreachable or does not acknowledge, records are appended
+    to `out` directly with `via: "file"` and a reconnect is tried every
+    `retry` seconds.
+    """
+
+    def __init__(self, out: str, bus_path: str = None, topic: str = 'asr.text', retry: float = 5.0):
+        self.out = out
+        self.bus_path = bus_path
+        self.topic = topic
+        self.retry = retry
+        self.client = None
+        self.next_try = 0.0
+        self.published = 0
+        self.appended = 0
+
+    def _client(self):
+        if not self.bus_path or time.time() < self.next_try:
+            return None
+        if self.client is None:
+            try:
+                app_dir = os.path.join(ROOT_DIR, 'app')
+                if app_dir not in sys.path:
+                    sys.path.insert(0, app_dir)
+                from bus import BusClient
+                self.client = BusClient(self.bus_path).connect()
+                print(f"[asr] publishing to event bus {self.bus_path}", file=sys.stderr)
+            except Exception as e:
+                print(f"[asr] event bus unavailable ({e}); writing {self.out}", file=sys.stderr)
+                self.client = None
+                self.next_try = time.time() + self.retry
+        return self.client
+
+    def write(self, rec: dict):
+        client = self._client()
+        if client is not None:
+            try:
+                # Acknowledged, so a bus that went away is noticed on this record rather than after it
+                client.publish(self.topic, rec, ack=True)
+                self.published += 1
+                return
+            except (OSError, ValueError) as e:
+                print(f"[asr] event bus publish failed ({e}); writing {self.out}", file=sys.stderr)
+                client.close()
+                self.client = None
+                self.next_try = time.time() + self.retry
+        # Marked, so an app that takes `asr.text` from the bus still picks these up from the file
+        with open(self.out, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(rec, via='file'), ensure_ascii=False) + '\n')
+        self.appended += 1
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
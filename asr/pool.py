@@ -0,0 +1,123 @@
+import queue
+import sys
+import threading
+import time
+
+
+class OrderedWriter:
+    """Release results strictly in submission order (workers finish out of order)."""
+
+    def __init__(self, write_fn, first_seq: int = 1):
+        self.write_fn = write_fn
+        self.next_seq = first_seq
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def complete(self, seq: int, rec):
+        with self.lock:
+            self.pending[seq] = rec
+            while self.next_seq in self.pending:
+                r = self.pending.pop(self.next_seq)
+                self.next_seq += 1
+                if r is not None:
+                    self.write_fn(r)
+
+    def waiting(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+
+class WorkerStats:
+    def __init__(self):
+        self.segments = 0
+        self.audio_s = 0.0
+        self.busy_s = 0.0
+
+    def rtf(self) -> float:
+        # Real-time factor: seconds of compute per second of audio (< 1 keeps up)
+        return self.busy_s / self.audio_s if self.audio_s else 0.0
+
+
+class TranscribePool:
+    """Segment queue -> N transcription threads -> ordered writer.
+
+    `process_fn(item, worker_id)` returns `(record, audio_seconds)`. All
+    threads share one WhisperModel loaded with `num_workers=N`, so
+    CTranslate2 runs N decodes in parallel (it releases the GIL) without
+    N copies of the weights. Records are written in submission order.
+    `backlog()` counts segments queued, being decoded, or finished but
+    waiting for an earlier one. If `process_fn` raises, the record written
+    in its place is `on_error(item, exc, worker_id)` (nothing if None).
+    """
+
+    def __init__(self, process_fn, write_fn, workers: int = 1, on_error=None):
+        self.process_fn = process_fn
+        self.on_error = on_error
+        self.writer = OrderedWriter(write_fn)
+        self.workers = max(1, int(workers))
+        self.jobs = queue.Queue()
+        self.seq = 0
+        self.active = 0
+        self.lock = threading.Lock()
+        self.stats = [WorkerStats() for _ in range(self.workers)]
+        self.threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, args=(i,), name=f'asr-worker-{i}', daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, item):
+        self.seq += 1
+        self.jobs.put((self.seq, item))
+
+    def backlog(self) -> int:
+        with self.lock:
+            active = self.active
+        return self.jobs.qsize() + active + self.writer.waiting()
+
+    def _worker(self, wid: int):
+        st = self.stats[wid]
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            seq, item = job
+            with self.lock:
+                self.active += 1
+            rec = None
+            t0 = time.perf_counter()
+            try:
+                rec, audio_s = self.process_fn(item, wid)
+                st.segments += 1
+                st.audio_s += audio_s or 0.0
+                st.busy_s += time.perf_counter() - t0
+            except Exception as e:
+                print(f"[asr] worker {wid} failed: {e}", file=sys.stderr)
+                if self.on_error is not None:
+                    try:
+                        rec = self.on_error(item, e, wid)
+                    except Exception as e2:
+                        print(f"[asr] worker {wid} error handler failed: {e2}", file=sys.stderr)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                self.writer.complete(seq, rec)
+
+    def summary(self) -> str:
+        parts = [f"w{i}: {s.segments} seg rtf={s.rtf():.2f}" for i, s in enumerate(self.stats)]
+        audio = sum(s.audio_s for s in self.stats)
+        busy = sum(s.busy_s for s in self.stats)
+        return f"backlog={self.backlog()} audio={audio:.0f}s pool_rtf={busy / audio / self.workers if audio else 0.0:.2f} [{', '.join(parts)}]"
+
+    def close(self, wait: bool = True, timeout: float = None) -> bool:
+        """Stop the workers once the queue is empty; with `wait`, join them (up to `timeout` seconds in total).
+
+        Returns True if no worker is still running.
+        """
+        for _ in self.threads:
+            self.jobs.put(None)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for t in self.threads:
+                t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(t.is_alive() for t in self.threads)
@@ -0,0 +1,101 @@
+import unicodedata
+
+from stream import Word
+
+
+def _key(text: str) -> str:
+    # Compare words without case, spaces or punctuation ("好，" == "好")
+    text = unicodedata.normalize('NFKC', text).lower()
+    return ''.join(c for c in text if unicodedata.category(c)[0] in 'LN')
+
+
+def _mid(w: Word) -> float:
+    return (w.start + w.end) / 2.0
+
+
+class OverlapStitcher:
+    """Join word lists from overlapping windows into one transcript without repeats.
+
+    Window k starts `overlap` seconds before window k-1 ends, so both
+    windows hear the words around the hard cut. Words whose midpoint falls
+    in the last `overlap` seconds of a window are held back until the next
+    window arrives. The two versions are then aligned: held words are
+    paired in order with new words of the same text whose midpoints lie
+    within `tol` seconds. The stitch happens at the pair closest to the
+    middle of the overlap, so words before it come from the earlier window
+    and words after it from the later one. When nothing pairs up, the
+    overlap is cut at its middle by word midpoints.
+
+    Times passed to `feed` are relative to the window; emitted words carry
+    absolute times.
+    """
+
+    def __init__(self, overlap: float = 1.0, tol: float = 0.4):
+        self.overlap = float(overlap)
+        self.tol = float(tol)
+        self.held = []
+        self.stats = {'windows': 0, 'anchored': 0, 'time_cut': 0, 'dropped': 0}
+
+    def _pair(self, held, words):
+        pairs = []
+        j0 = 0
+        for i, a in enumerate(held):
+            ka = _key(a.text)
+            if not ka:
+                continue
+            for j in range(j0, len(words)):
+                b = words[j]
+                if _mid(b) > _mid(a) + self.tol:
+                    break
+                if _key(b.text) == ka and abs(_mid(a) - _mid(b)) <= self.tol:
+                    pairs.append((i, j))
+                    j0 = j + 1
+                    break
+        return pairs
+
+    def _stitch(self, words, ov_start: float, ov_end: float):
+        held, self.held = self.held, []
+        head = sum(1 for w in words if _mid(w) < ov_end + self.tol)
+        cut = (ov_start + ov_end) / 2.0
+        pairs = self._pair(held, words[:head])
+        if pairs:
+            i, j = min(pairs, key=lambda p: abs(_mid(held[p[0]]) - cut))
+            kept, words = held[:i + 1], words[j + 1:]
+            self.stats['anchored'] += 1
+        else:
+            kept = [w for w in held if _mid(w) < cut]
+            words = [w for w in words if _mid(w) >= cut]
+            self.stats['time_cut'] += 1
+        new_head = sum(1 for w in words if _mid(w) < ov_end + self.tol)
+        dropped = (len(held) - len(kept)) + (head - new_head)
+        self.stats['dropped'] += dropped
+        return kept, words, dropped
+
+    def feed(self, words, offset: float, duration: float, overlap: float = None):
+        """Add one window; return (words to emit now, duplicates dropped).
+
+        `overlap` is how much of this window repeats the end of the
+        previous one (0 after a gap); defaults to the configured overlap.
+        """
+        overlap = self.overlap if overlap is None else float(overlap)
+        words = [Word(offset + w.start, offset + w.end, w.text) for w in words]
+        self.stats['windows'] += 1
+        dropped = 0
+        if self.held and words and overlap > 0:
+            out, words, dropped = self._stitch(words, offset, offset + overlap)
+        else:
+            # No overlap to compare against (gap, first window, or nothing decoded here)
+            out, self.held = self.held, []
+        hold_from = offset + duration - self.overlap
+        out.extend(w for w in words if _mid(w) < hold_from)
+        self.held = [w for w in words if _mid(w) >= hold_from]
+        return out, dropped
+
+    def flush(self):
+        held, self.held = self.held, []
+        return held
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"stitch windows={s['windows']} anchored={s['anchored']} time_cut={s['time_cut']} "
+                f"duplicates_dropped={s['dropped']}")
@@ -0,0 +1,377 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+from output import TranscriptOutput
+from vad import EnergyVad, VadStats
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+
+def mic_command(device_spec: str, sr: int = SAMPLE_RATE):
+    # Same capture/filter chain as scripts/asr_mic.sh, but raw s16le on stdout instead of WAV segments
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-f', 'avfoundation', '-i', device_spec,
+            '-ac', '1', '-ar', str(sr), '-af', 'highpass=f=150, dynaudnorm=f=150:g=15',
+            '-f', 's16le', '-']
+
+
+def file_command(path: str, sr: int = SAMPLE_RATE, realtime: bool = False):
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+    if realtime:
+        cmd.append('-re')
+    return cmd + ['-i', path, '-ac', '1', '-ar', str(sr), '-f', 's16le', '-']
+
+
+class PcmSource:
+    """Raw 16 kHz mono s16le from an ffmpeg pipe, a .pcm file or a .wav file.
+
+    `live` sources (mic, ffmpeg -re) are drained by a reader thread so a
+    slow decode never back-pressures ffmpeg; file sources are read in step
+    with decoding so tests process every sample.
+    """
+
+    def __init__(self, stream, proc=None, live: bool = False):
+        self.stream = stream
+        self.proc = proc
+        self.live = live
+
+    @classmethod
+    def ffmpeg(cls, cmd, live: bool = True):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+        return cls(proc.stdout, proc, live)
+
+    @classmethod
+    def pcm_file(cls, path: str):
+        return cls(open(path, 'rb'))
+
+    @classmethod
+    def wav_file(cls, path: str):
+        wf = wave.open(path, 'rb')
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+            wf.close()
+            raise ValueError(f'{path}: need 16 kHz mono s16 WAV (or use ffmpeg input)')
+        return cls(_WaveReader(wf))
+
+    def read(self, n: int) -> bytes:
+        return self.stream.read(n)
+
+    def close(self):
+        try:
+            self.stream.close()
+        except Exception:
+            pass
+        if self.proc is not None:
+            try:
+                self.proc.terminate()
+                self.proc.wait(timeout=2)
+            except Exception:
+                pass
+
+
+class _WaveReader:
+    def __init__(self, wf):
+        self.wf = wf
+
+    def read(self, n: int) -> bytes:
+        return self.wf.readframes(n // BYTES_PER_SAMPLE)
+
+    def close(self):
+        self.wf.close()
+
+
+class PcmRing:
+    """Append-only PCM buffer addressed by absolute sample index.
+
+    Only audio after the last committed word is kept; `trim` drops the
+    rest. If decoding falls far behind, the oldest audio beyond
+    `max_secs` is dropped and counted rather than growing without bound.
+    """
+
+    def __init__(self, sr: int = SAMPLE_RATE, max_secs: float = 60.0):
+        self.sr = sr
+        self.max_bytes = int(max_secs * sr) * BYTES_PER_SAMPLE
+        self.buf = bytearray()
+        self.base = 0           # absolute sample index of buf[0]
+        self.dropped = 0        # samples lost to overflow
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.eof = False
+
+    @property
+    def end(self) -> int:
+        return self.base + len(self.buf) // BYTES_PER_SAMPLE
+
+    def append(self, data: bytes):
+        with self.cond:
+            self.buf += data
+            extra = len(self.buf) - self.max_bytes
+            if extra > 0:
+                extra -= extra % BYTES_PER_SAMPLE
+                del self.buf[:extra]
+                self.base += extra // BYTES_PER_SAMPLE
+                self.dropped += extra // BYTES_PER_SAMPLE
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.eof = True
+            self.cond.notify_all()
+
+    def wait_until(self, sample: int, timeout: float) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: self.eof or self.end >= sample, timeout)
+
+    def window(self, start: int) -> (int, bytes):
+        with self.lock:
+            start = max(start, self.base)
+            off = (start - self.base) * BYTES_PER_SAMPLE
+            return start, bytes(self.buf[off:])
+
+    def trim(self, upto: int):
+        with self.lock:
+            n = max(0, min(upto, self.end) - self.base)
+            del self.buf[:n * BYTES_PER_SAMPLE]
+            self.base += n
+
+
+class Word:
+    def __init__(self, start: float, end: float, text: str):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def key(self) -> str:
+        return self.text.strip().lower()
+
+
+class LocalAgreement:
+    """Commit the words two consecutive hypotheses agree on (LocalAgreement-2).
+
+    Whisper rewrites the tail of a window as more audio arrives; a prefix
+    that survives one more decode is very unlikely to change again, so it
+    is committed and never revised.
+    """
+
+    def __init__(self):
+        self.prev = []
+
+    def update(self, words):
+        n = 0
+        for a, b in zip(self.prev, words):
+            if a.key() != b.key():
+                break
+            n += 1
+        committed = words[:n]
+        self.prev = words[n:]
+        return committed
+
+    def flush(self):
+        rest, self.prev = self.prev, []
+        return rest
+
+    def reset(self):
+        self.prev = []
+
+
+def _join(words) -> str:
+    return ''.join(w.text for w in words).strip()
+
+
+class StreamingTranscriber:
+    """Sliding-window decoding over a PcmRing with incremental commits to asr.jsonl.
+
+    Every `step` seconds the audio from the last committed word to now
+    (at least `min_window`, at most `max_window` seconds) is decoded with
+    word timestamps. Agreed words are appended to `out` as one record and
+    the ring is trimmed to the end of the last committed word, so each
+    window overlaps the previous one by the still-uncertain tail. A window
+    that reaches `max_window` without agreement is committed as-is.
+
+    With a `vad`, a window without speech is not decoded: the pending
+    hypothesis is dropped and the window skipped, and leading silence is
+    trimmed before decoding.
+    """
+
+    def __init__(self, model, out: str, language: str = 'zh', step: float = 1.0,
+                 min_window: float = 2.0, max_window: float = 15.0, beam_size: int = 1, sr: int = SAMPLE_RATE,
+                 vad: EnergyVad = None, bus: str = None):
+        self.model = model
+        self.out = out
+        self.output = TranscriptOutput(out, bus)
+        self.language = language
+        self.step = float(step)
+        self.min_window = float(min_window)
+        self.max_window = float(max_window)
+        self.beam_size = beam_size
+        self.sr = sr
+        self.ring = PcmRing(sr, max_secs=max(60.0, self.max_window * 4))
+        self.agree = LocalAgreement()
+        self.committed = 0          # absolute sample index after the last committed word
+        self.context = ''           # tail of committed text, passed as initial_prompt
+        self.vad = vad
+        self.vstats = VadStats()
+        self.stats = {'decodes': 0, 'decode_s': 0.0, 'audio_s': 0.0, 'commits': 0}
+
+    def _decode(self, start: int, pcm: bytes):
+        import numpy as np
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        t0 = time.perf_counter()
+        segments, _ = self.model.transcribe(audio, language=self.language, beam_size=self.beam_size,
+                                            word_timestamps=True, condition_on_previous_text=False,
+                                            initial_prompt=self.context or None)
+        base = start / self.sr
+        words = []
+        for seg in segments:
+            for w in (getattr(seg, 'words', None) or []):
+                words.append(Word(base + w.start, base + w.end, w.word))
+        self.stats['decodes'] += 1
+        self.stats['decode_s'] += time.perf_counter() - t0
+        self.vstats.decoded(len(pcm) / BYTES_PER_SAMPLE / self.sr, time.perf_counter() - t0)
+        return words
+
+    def _skip_to(self, sample: int):
+        if sample > self.committed:
+            self.vstats.skipped((sample - self.committed) / self.sr)
+            self.committed = sample
+            self.ring.trim(sample)
+
+    def _gate(self, start: int, pcm: bytes):
+        """Apply the VAD to a window; return the (start, pcm) left to decode, or None."""
+        spans = self.vad.speech_spans(pcm)
+        if not spans:
+            # Keep the newest pad's worth: speech may be starting right at the edge
+            self.agree.reset()
+            self._skip_to(start + max(0, len(pcm) // BYTES_PER_SAMPLE - self.vad.pad))
+            return None
+        lead = spans[0][0]
+        if lead > 0:
+            self._skip_to(start + lead)
+            return start + lead, pcm[lead * BYTES_PER_SAMPLE:]
+        return start, pcm
+
+    def _commit(self, words, audio_end: float, reason: str):
+        if not words:
+            return
+        text = _join(words)
+        self.committed = int(words[-1].end * self.sr)
+        self.ring.trim(self.committed)
+        self.context = (self.context + text)[-200:]
+        if not text:
+            return
+        rec = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'source': 'stream',
+            'start': round(words[0].start, 2),
+            'end': round(words[-1].end, 2),
+            'result': {'text': text},
+            'commit': reason,
+            # How far the committed text trails the newest audio we had
+            'latency': {'audio_lag_ms': int(max(0.0, audio_end - words[-1].end) * 1000)},
+        }
+        self.output.write(rec)
+        self.stats['commits'] += 1
+
+    def process(self, final: bool = False):
+        """Decode the current window once and commit what is stable."""
+        start, pcm = self.ring.window(self.committed)
+        if self.vad is not None and pcm:
+            gated = self._gate(start, pcm)
+            if gated is None:
+                return
+            start, pcm = gated
+        secs = len(pcm) / BYTES_PER_SAMPLE / self.sr
+        if secs < (0.3 if final else self.min_window):
+            if final:
+                self._commit(self.agree.flush(), start / self.sr + secs, 'final')
+            return
+        words = self._decode(start, pcm)
+        audio_end = start / self.sr + secs
+        if final:
+            self.agree.reset()
+            self._commit(words, audio_end, 'final')
+            return
+        self._commit(self.agree.update(words), audio_end, 'agreed')
+        if secs >= self.max_window:
+            # No agreement for a whole window: take all but the newest second and move on
+            cut = audio_end - 1.0
+            forced = [w for w in self.agree.prev if w.end <= cut]
+            self.agree.prev = self.agree.prev[len(forced):]
+            if forced:
+                self._commit(forced, audio_end, 'forced')
+            else:
+                self.committed = int(cut * self.sr)
+                self.ring.trim(self.committed)
+
+    def run(self, source: PcmSource, stop_evt=None):
+        step_bytes = int(self.step * self.sr) * BYTES_PER_SAMPLE
+        reader = None
+        if source.live:
+            def pump():
+                while True:
+                    data = source.read(step_bytes // 4 or 4096)
+                    if not data:
+                        break
+                    self.ring.append(data)
+                self.ring.close()
+            reader = threading.Thread(target=pump, name='pcm-reader', daemon=True)
+            reader.start()
+        next_at = self.step * self.sr
+        try:
+            while stop_evt is None or not stop_evt.is_set():
+                if source.live:
+                    self.ring.wait_until(int(next_at), timeout=0.5)
+                    if self.ring.end < next_at and not self.ring.eof:
+                        continue
+                else:
+                    data = source.read(step_bytes)
+                    if data:
+                        self.ring.append(data)
+                    else:
+                        self.ring.close()
+                if self.ring.eof and self.ring.end < next_at:
+                    break
+                self.stats['audio_s'] = self.ring.end / self.sr
+                self.vstats.audio_s = self.stats['audio_s']
+                self.process()
+                next_at = self.ring.end + self.step * self.sr
+        finally:
+            self.process(final=True)
+            source.close()
+            self.output.close()
+            st = self.stats
+            rtf = st['decode_s'] / st['audio_s'] if st['audio_s'] else 0.0
+            print(f"[asr] stream done: audio={st['audio_s']:.1f}s decodes={st['decodes']} commits={st['commits']} "
+                  f"decode={st['decode_s']:.1f}s (x{rtf:.2f} of audio) dropped={self.ring.dropped / self.sr:.1f}s", file=sys.stderr)
+            if self.vad is not None:
+                print(f"[asr] {self.vstats.summary()}", file=sys.stderr)
+
+
+def open_source(args) -> PcmSource:
+    if args.pcm_file:
+        return PcmSource.pcm_file(args.pcm_file)
+    if args.stream_file:
+        if args.stream_file.lower().endswith('.wav') and not args.realtime:
+            try:
+                return PcmSource.wav_file(args.stream_file)
+            except ValueError:
+                pass
+        return PcmSource.ffmpeg(file_command(args.stream_file, realtime=args.realtime), live=args.realtime)
+    return PcmSource.ffmpeg(mic_command(args.stream_device))
+
+
+def stream_and_transcribe(args, model, stop=None):
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    st = StreamingTranscriber(model, args.out, language=args.lang, step=args.stream_step,
+                              min_window=args.stream_min_window, max_window=args.stream_max_window,
+                              vad=EnergyVad() if args.vad == 'on' else None, bus=args.bus)
+    source = open_source(args)
+    print(f"[asr] streaming from {'pcm file' if args.pcm_file else args.stream_file or 'mic ' + args.stream_device} "
+          f"step={st.step}s window={st.min_window}-{st.max_window}s", file=sys.stderr)
+    try:
+        st.run(source, stop)
+    except KeyboardInterrupt:
+        pass
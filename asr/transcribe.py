@@ -1,17 +1,26 @@
 import argparse
-import json
 import os
+import signal
 import sys
 import time
 from datetime import datetime, timezone
-import wave
+
+from checkpoint import SegmentCheckpoint, SegmentRetention
+from output import TranscriptOutput
+from vad import EnergyVad, VadStats, np, pcm_to_float, read_wav_pcm
+from pool import TranscribePool
+from stitch import OverlapStitcher
+from stream import Word
+from watcher import open_watcher
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Longest a stopping watcher waits for segments already handed to the pool
+POOL_CLOSE_TIMEOUT = 60.0
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
 
-def load_model(name: str, device: str, compute_type: str):
+def load_model(name: str, device: str, compute_type: str, cpu_threads: int = 0, num_workers: int = 1):
     try:
         from faster_whisper import WhisperModel
     except Exception:
@@ -25,86 +34,363 @@ def load_model(name: str, device: str, compute_type: str):
             continue
         tried.append(ct)
         try:
-            print(f"[asr] loading model={name} device={device} compute={ct}", file=sys.stderr)
-            return WhisperModel(name, device=device, compute_type=ct)
+            print(f"[asr] loading model={name} device={device} compute={ct} cpu_threads={cpu_threads} workers={num_workers}", file=sys.stderr)
+            return WhisperModel(name, device=device, compute_type=ct, cpu_threads=cpu_threads, num_workers=num_workers)
         except Exception as e:
             print(f"[asr] load failed for compute={ct}: {e}", file=sys.stderr)
             last_err = e
             continue
     raise RuntimeError(f"failed to load faster-whisper with compute in {candidates}: {last_err}")
 
-def transcribe_file(model, path: str, language: str = 'zh', beam_size: int = 1):
+def transcribe_file(model, path: str, language: str = 'zh', beam_size: int = 1, vad=None, vstats=None):
     try:
-        segments, info = model.transcribe(path, language=language, beam_size=beam_size)
+        audio, vad_info, duration = path, None, None
+        if vad is not None:
+            pcm, sr = read_wav_pcm(path)
+            if pcm is not None and sr == vad.sr:
+                duration = len(pcm) / 2 / sr
+                spans = vad.speech_spans(pcm)
+                speech = sum(e - s for s, e in spans) / sr
+                vad_info = {'speech_s': round(speech, 2), 'spans': len(spans)}
+                vstats.seen(duration)
+                if not spans:
+                    # Silence/room tone only: no decode at all
+                    vstats.skipped(duration, segment=True)
+                    return {'text': '', 'duration': duration, 'language': language, 'vad': dict(vad_info, skipped=True)}
+                if np is not None and speech < 0.9 * duration:
+                    # Decode only the voiced spans
+                    audio = pcm_to_float(b''.join(pcm[s * 2:e * 2] for s, e in spans))
+                    vstats.skipped(duration - speech)
+        t0 = time.perf_counter()
+        segments, info = model.transcribe(audio, language=language, beam_size=beam_size)
         text = ''.join(seg.text for seg in segments)
-        return {
+        if vad is not None:
+            # segments is lazy; the join above is where decoding happens
+            decoded = duration if isinstance(audio, str) else len(audio) / vad.sr
+            vstats.decoded(decoded or getattr(info, 'duration', 0) or 0, time.perf_counter() - t0)
+        res = {
             'text': text.strip(),
-            'duration': getattr(info, 'duration', None),
+            'duration': duration or getattr(info, 'duration', None),
             'language': getattr(info, 'language', language),
         }
+        if vad_info is not None:
+            res['vad'] = vad_info
+        return res
     except Exception as e:
         return {'error': str(e)}
 
-def watch_and_transcribe(args):
+def _unsplice(t: float, spans, sr: int) -> float:
+    """Map a time in the concatenated voiced spans back to the original window."""
+    pos = t * sr
+    for s, e in spans:
+        if pos <= e - s:
+            return (s + pos) / sr
+        pos -= e - s
+    return spans[-1][1] / sr if spans else t
+
+def transcribe_window(model, pcm: bytes, sr: int, language: str = 'zh', beam_size: int = 1, vad=None, vstats=None):
+    """Decode 16-bit mono PCM with word timestamps.
+
+    Returns (result, words); word times are relative to the window start,
+    also when the VAD passed only the voiced spans to Whisper.
+    """
+    try:
+        duration = len(pcm) / 2 / sr
+        res = {'duration': duration, 'language': language}
+        spans = [(0, len(pcm) // 2)]
+        if vad is not None:
+            vstats.seen(duration)
+            voiced = vad.speech_spans(pcm)
+            speech = sum(e - s for s, e in voiced) / sr
+            res['vad'] = {'speech_s': round(speech, 2), 'spans': len(voiced)}
+            if not voiced:
+                vstats.skipped(duration, segment=True)
+                res['vad']['skipped'] = True
+                res['text'] = ''
+                return res, []
+            if speech < 0.9 * duration:
+                spans = voiced
+                vstats.skipped(duration - speech)
+        audio = pcm_to_float(b''.join(pcm[s * 2:e * 2] for s, e in spans))
+        t0 = time.perf_counter()
+        segments, info = model.transcribe(audio, language=language, beam_size=beam_size, word_timestamps=True)
+        words = []
+        for seg in segments:
+            for w in (getattr(seg, 'words', None) or []):
+                words.append(Word(_unsplice(w.start, spans, sr), _unsplice(w.end, spans, sr), w.word))
+        if vad is not None:
+            vstats.decoded(len(audio) / sr, time.perf_counter() - t0)
+        res['language'] = getattr(info, 'language', language)
+        res['text'] = ''.join(w.text for w in words).strip()
+        return res, words
+    except Exception as e:
+        return {'error': str(e)}, []
+
+class LatencyStats:
+    """Rolling close->transcribe-start latency, summarised on stderr every `every` segments."""
+
+    def __init__(self, every: int = 20, keep: int = 200):
+        self.every = every
+        self.keep = keep
+        self.samples = []
+        self.count = 0
+
+    def add(self, ms: int):
+        self.samples.append(ms)
+        if len(self.samples) > self.keep:
+            del self.samples[:-self.keep]
+        self.count += 1
+        if self.count % self.every == 0:
+            print(f"[asr] close->start latency over last {len(self.samples)}: {self.summary()}", file=sys.stderr)
+
+    def summary(self) -> dict:
+        s = sorted(self.samples)
+        if not s:
+            return {}
+        return {'p50_ms': s[len(s) // 2], 'p95_ms': s[min(len(s) - 1, int(len(s) * 0.95))], 'max_ms': s[-1]}
+
+def watch_and_transcribe(args, model=None, stop=None):
+    """Transcribe segments as they appear in `args.watch` until interrupted or `stop` is set."""
     os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    model = load_model(args.model, args.device, args.compute)
-    seen = set()
+    workers = max(1, args.workers)
+    if model is None:
+        model = load_model(args.model, args.device, args.compute, cpu_threads=args.cpu_threads, num_workers=workers)
+    # Segments are queued the moment ffmpeg closes them (inotify/kqueue, polling as fallback)
+    watcher = open_watcher(args.watch, mode=args.watcher)
+    print(f"[asr] watching {args.watch} via {watcher.kind} with {workers} worker(s)", file=sys.stderr)
+    stats = LatencyStats()
+    vad = EnergyVad() if args.vad == 'on' else None
+    vstats = VadStats()
+    overlap = max(0.0, args.overlap)
+    if overlap and np is None:
+        print("[asr] --overlap needs numpy; transcribing segments on their own", file=sys.stderr)
+        overlap = 0.0
+    # Overlapped windows: each segment is decoded with the last `overlap` seconds
+    # of the previous one in front, and the stitcher drops the repeated words
+    stitcher = OverlapStitcher(overlap) if overlap else None
+    prev = {'tail': b'', 'closed_at': None, 'end': 0.0}
+    # Transcribed segments survive restarts; `inflight` only holds what is queued right now
+    ckpt = SegmentCheckpoint(args.checkpoint or os.path.join(os.path.dirname(args.out), 'asr_checkpoint.sqlite3'))
+    retention = SegmentRetention(args.retain)
+    output = TranscriptOutput(args.out, args.bus)
+    inflight = set()
+    attempts = {}   # path -> failed decodes in this run
+    retry = []      # failed segments to submit again
+    pool = None
+
+    def window(segment):
+        """Return (pcm, sr, offset, prefix_s) for a segment, or None if it is not 16-bit mono WAV."""
+        try:
+            pcm, sr = read_wav_pcm(segment.path)
+        except Exception:
+            pcm, sr = None, None
+        if pcm is None:
+            return None
+        duration = len(pcm) / 2 / sr
+        tail = prev['tail']
+        # A recorder restart leaves a gap between segments: start afresh without a prefix
+        if prev['closed_at'] is None or segment.closed_at - prev['closed_at'] > duration * 1.5 + 1.0:
+            tail = b''
+        prefix_s = len(tail) / 2 / sr
+        offset = prev['end'] - prefix_s
+        prev['end'] += duration
+        prev['closed_at'] = segment.closed_at
+        prev['tail'] = pcm[-int(overlap * sr) * 2:] if len(pcm) > int(overlap * sr) * 2 else pcm
+        return tail + pcm, sr, offset, prefix_s
+
+    def process(item, wid):
+        segment, win = item
+        start = time.time()
+        words = None
+        if win is None:
+            res = transcribe_file(model, segment.path, language=args.lang, vad=vad, vstats=vstats)
+        else:
+            pcm, sr, offset, prefix_s = win
+            res, words = transcribe_window(model, pcm, sr, language=args.lang, vad=vad, vstats=vstats)
+        rec = {
+            'ts': now_iso(),
+            'file': segment.path,
+            'result': res,
+            'latency': {
+                'close_to_start_ms': max(0, int((start - segment.closed_at) * 1000)),
+                'detect_ms': max(0, int((segment.detected_at - segment.closed_at) * 1000)),
+                'transcribe_ms': int((time.time() - start) * 1000),
+            },
+            'worker': wid,
+            'backlog': pool.backlog(),
+        }
+        if win is not None:
+            rec['_words'] = (words, offset, res.get('duration') or 0.0, prefix_s)
+        if 'error' in res:
+            # The decode helpers report exceptions in the result instead of raising
+            rec['failed'] = True
+            rec['_segment'] = segment
+            return rec, 0.0
+        return rec, (res.get('duration') or 0.0) - (win[3] if win else 0.0)
+
+    def failed(item, exc, wid):
+        # Record in place of a segment whose decode raised; write() schedules the retry
+        segment, win = item
+        rec = {
+            'ts': now_iso(),
+            'file': segment.path,
+            'result': {'error': str(exc), 'text': ''},
+            'latency': {'close_to_start_ms': max(0, int((time.time() - segment.closed_at) * 1000))},
+            'worker': wid,
+            'failed': True,
+        }
+        if win is not None:
+            # Lets the stitcher release what it was holding back for this window
+            rec['_words'] = (None, win[2], 0.0, win[3])
+        rec['_segment'] = segment
+        return rec
+
+    def stitch(rec):
+        words, offset, duration, prefix_s = rec.pop('_words')
+        res = rec['result']
+        if 'error' in res:
+            out, dropped = stitcher.flush(), 0
+        else:
+            out, dropped = stitcher.feed(words, offset, duration, overlap=prefix_s)
+        res['window_text'] = res.get('text', '')
+        res['text'] = ''.join(w.text for w in out).strip()
+        rec['stitch'] = {
+            'offset': round(offset, 2),
+            'overlap_s': round(prefix_s, 2),
+            'dropped': dropped,
+            'held': len(stitcher.held),
+        }
+        if out:
+            rec['start'] = round(out[0].start, 2)
+            rec['end'] = round(out[-1].end, 2)
+
+    def write(rec):
+        # Called in segment order by the pool's writer
+        if '_words' in rec:
+            stitch(rec)
+        segment = rec.pop('_segment', None)
+        stats.add(rec['latency']['close_to_start_ms'])
+        output.write(rec)
+        if rec.get('failed'):
+            # Not checkpointed and the audio is kept: tried again now, or on the next run
+            inflight.discard(rec['file'])
+            attempts[rec['file']] = attempts.get(rec['file'], 0) + 1
+            if attempts[rec['file']] <= args.retries:
+                retry.append(segment)
+            else:
+                print(f"[asr] giving up on {rec['file']} after {attempts[rec['file']]} attempts; "
+                      f"left for the next run", file=sys.stderr)
+        elif 'file' in rec:
+            ckpt.mark(rec['file'])
+            inflight.discard(rec['file'])
+            retention.done(rec['file'])
+        if stats.count % 20 == 0:
+            print(f"[asr] pool {pool.summary()}", file=sys.stderr)
+            if vad is not None:
+                print(f"[asr] {vstats.summary()}", file=sys.stderr)
+            if stitcher is not None:
+                print(f"[asr] {stitcher.summary()}", file=sys.stderr)
+
+    def flush_held():
+        rest = stitcher.flush() if stitcher is not None else []
+        text = ''.join(w.text for w in rest).strip()
+        if text:
+            rec = {'ts': now_iso(), 'source': 'stitch', 'start': round(rest[0].start, 2), 'end': round(rest[-1].end, 2),
+                   'result': {'text': text}, 'commit': 'final'}
+            output.write(rec)
+
+    pool = TranscribePool(process, write, workers=workers, on_error=failed)
     try:
-        while True:
-            now = time.time()
-            names = sorted([n for n in os.listdir(args.watch) if n.lower().endswith('.wav')])
-            # Avoid reading the newest file (likely still being written)
-            newest = names[-1] if names else None
-            for name in names:
-                if name == newest:
+        while stop is None or not stop.is_set():
+            for segment in watcher.wait(0.5):
+                if segment.path in inflight or ckpt.is_done(segment.path):
                     continue
-                if not name.lower().endswith('.wav'):
+                inflight.add(segment.path)
+                pool.submit((segment, window(segment) if stitcher is not None else None))
+            while retry:
+                segment = retry.pop(0)
+                if segment.path in inflight or ckpt.is_done(segment.path):
                     continue
-                p = os.path.join(args.watch, name)
-                if p in seen:
-                    continue
-                # Skip files still being written: require age > 2.5s and stable size
-                try:
-                    age = now - os.path.getmtime(p)
-                    if age < 2.5:
-                        continue
-                    s1 = os.path.getsize(p)
-                    time.sleep(0.1)
-                    s2 = os.path.getsize(p)
-                    if s1 != s2:
-                        continue
-                except FileNotFoundError:
-                    continue
-                # Validate WAV header before sending to ASR (skip if invalid)
-                try:
-                    with wave.open(p, 'rb') as wf:
-                        _ = wf.getnframes()
-                except Exception:
-                    # Not a valid/complete WAV yet; try later
-                    continue
-                seen.add(p)
-                res = transcribe_file(model, p, language=args.lang)
-                rec = {
-                    'ts': now_iso(),
-                    'file': p,
-                    'result': res,
-                }
-                with open(args.out, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(rec, ensure_ascii=False) + '\n')
-            time.sleep(0.5)
+                inflight.add(segment.path)
+                # Its neighbours have been stitched already, so it is decoded on its own
+                pool.submit((segment, None))
     except KeyboardInterrupt:
         pass
+    finally:
+        watcher.close()
+        # Let queued segments finish before the checkpoint and output close underneath them; a
+        # stop/start of the same directory would otherwise see them unchecked and decode them again
+        if not pool.close(wait=True, timeout=POOL_CLOSE_TIMEOUT):
+            print(f"[asr] {pool.backlog()} segment(s) still decoding after {POOL_CLOSE_TIMEOUT:.0f}s; "
+                  f"left for the next run", file=sys.stderr)
+        if stitcher is not None:
+            # Queued windows are done, so their held-back words can be written
+            flush_held()
+        ckpt.close()
+        retention.close()
+        output.close()
+        print(f"[asr] close->start latency: {stats.summary()}", file=sys.stderr)
+        print(f"[asr] checkpoint: {ckpt.resumed} segment(s) skipped as already transcribed, {ckpt.marks} marked, "
+              f"{retention.removed} removed ({args.retain})", file=sys.stderr)
+        print(f"[asr] pool {pool.summary()}", file=sys.stderr)
+        if vad is not None:
+            print(f"[asr] {vstats.summary()}", file=sys.stderr)
+        if stitcher is not None:
+            print(f"[asr] {stitcher.summary()}", file=sys.stderr)
 
-def main():
+def _sigterm(signum, frame):
+    # Let the GUI's SIGTERM unwind through the normal shutdown path (final flush, stats)
+    raise KeyboardInterrupt
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
-    ap.add_argument('--watch', required=True, help='Directory of wav segments to watch')
+    ap.add_argument('--watch', help='Directory of wav segments to watch')
     ap.add_argument('--out', required=True, help='Output JSONL path')
     ap.add_argument('--model', default=os.environ.get('FWHISPER_MODEL', 'small'))
     ap.add_argument('--device', default=os.environ.get('FWHISPER_DEVICE', 'auto'))
     ap.add_argument('--compute', default=os.environ.get('FWHISPER_COMPUTE', 'int8'))
     ap.add_argument('--lang', default=os.environ.get('FWHISPER_LANG', 'zh'))
+    ap.add_argument('--watcher', choices=('auto', 'inotify', 'kqueue', 'poll'), default=os.environ.get('ASR_WATCHER', 'auto'),
+                    help='How to detect finished segments (auto: inotify on Linux, kqueue on macOS, else polling)')
+    ap.add_argument('--workers', type=int, default=int(os.environ.get('ASR_WORKERS', 1)),
+                    help='Parallel transcriptions (one shared model with this many CTranslate2 workers)')
+    ap.add_argument('--retries', type=int, default=int(os.environ.get('ASR_RETRIES', 1)),
+                    help='Times a segment whose decode failed is queued again in this run (it stays unchecked for the next run)')
+    ap.add_argument('--cpu-threads', type=int, default=int(os.environ.get('ASR_CPU_THREADS', 0)),
+                    help='Threads per worker (0 = library default)')
+    ap.add_argument('--overlap', type=float, default=float(os.environ.get('ASR_OVERLAP', 0)),
+                    help='Seconds of the previous segment decoded again in front of each segment; '
+                         'duplicated words are dropped by word timestamps (0 = off)')
+    ap.add_argument('--bus', default=os.environ.get('ASR_BUS'),
+                    help="Publish records on the app's event bus (Unix socket) instead of appending to --out; "
+                         'falls back to --out when the bus is down')
+    ap.add_argument('--checkpoint', help='SQLite file of transcribed segments (default: asr_checkpoint.sqlite3 next to --out)')
+    ap.add_argument('--retain', choices=('keep', 'delete', 'flac'), default=os.environ.get('ASR_RETAIN', 'keep'),
+                    help='What to do with a segment once its transcript is written')
+    ap.add_argument('--vad', choices=('on', 'off'), default=os.environ.get('ASR_VAD', 'on'),
+                    help='Skip silent audio before decoding (energy + zero-crossing gate)')
+    # Streaming mode: raw PCM from ffmpeg (or a file) instead of WAV segments
+    ap.add_argument('--stream', action='store_true', help='Stream from the microphone (ffmpeg avfoundation -> PCM pipe)')
+    ap.add_argument('--stream-device', default=os.environ.get('DEVICE_SPEC', ':0'))
+    ap.add_argument('--stream-file', help='Stream an audio file through ffmpeg (or directly if 16 kHz mono WAV)')
+    ap.add_argument('--pcm-file', help='Stream raw 16 kHz mono s16le PCM from a file')
+    ap.add_argument('--realtime', action='store_true', help='With --stream-file: feed at real-time speed (ffmpeg -re)')
+    ap.add_argument('--stream-step', type=float, default=float(os.environ.get('ASR_STREAM_STEP', 1.0)))
+    ap.add_argument('--stream-min-window', type=float, default=2.0)
+    ap.add_argument('--stream-max-window', type=float, default=15.0)
+    return ap
+
+def main():
+    ap = build_parser()
     args = ap.parse_args()
-    watch_and_transcribe(args)
+    signal.signal(signal.SIGTERM, _sigterm)
+    if args.stream or args.stream_file or args.pcm_file:
+        from stream import stream_and_transcribe
+        stream_and_transcribe(args, load_model(args.model, args.device, args.compute, cpu_threads=args.cpu_threads))
+    elif args.watch:
+        watch_and_transcribe(args)
+    else:
+        ap.error('one of --watch, --stream, --stream-file or --pcm-file is required')
 
 if __name__ == '__main__':
     main()
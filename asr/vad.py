@@ -0,0 +1,156 @@
+import array
+import math
+import threading
+import wave
+
+try:
+    import numpy as np
+except Exception:  # numpy comes with faster-whisper; the pure-Python path keeps tests dependency-free
+    np = None
+
+
+class EnergyVad:
+    """Frame-level speech detector from short-time energy and zero-crossing rate.
+
+    Each `frame_ms` frame gets a speech probability: a logistic on how far
+    its energy sits above the noise floor, zeroed when the zero-crossing
+    rate is outside the band of voiced speech (hiss and clicks cross far
+    more often, hum far less). The floor is the `floor_pct` percentile of
+    frame energies, smoothed across calls, so a quiet room and a noisy one
+    both work without tuning. Frames above `threshold` are joined into
+    spans with `hangover_ms` bridging short pauses; spans shorter than
+    `min_speech_ms` are dropped and the rest padded by `pad_ms`.
+
+    This is a cheap gate, not a classifier: steady music with strong
+    energy will pass as speech. It is meant to skip silence and room tone.
+    """
+
+    def __init__(self, sr: int = 16000, frame_ms: int = 30, margin_db: float = 10.0, threshold: float = 0.5,
+                 zcr_min: float = 0.01, zcr_max: float = 0.45, hangover_ms: int = 300, min_speech_ms: int = 200,
+                 pad_ms: int = 200, floor_pct: float = 0.15, min_floor_db: float = -65.0):
+        self.sr = sr
+        self.frame = int(sr * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.threshold = threshold
+        self.zcr_min = zcr_min
+        self.zcr_max = zcr_max
+        self.hangover = max(0, int(hangover_ms / frame_ms))
+        self.min_frames = max(1, int(min_speech_ms / frame_ms))
+        self.pad = int(sr * pad_ms / 1000)
+        self.floor_pct = floor_pct
+        self.min_floor_db = min_floor_db
+        self.floor_db = None
+
+    def _features(self, pcm: bytes):
+        n = self.frame
+        if np is not None:
+            x = np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype=np.int16).astype(np.float32) / 32768.0
+            k = len(x) // n
+            if k == 0:
+                return [], []
+            fr = x[:k * n].reshape(k, n)
+            energy = 10.0 * np.log10(np.mean(fr * fr, axis=1) + 1e-10)
+            zcr = np.mean(np.abs(np.diff(np.signbit(fr).astype(np.int8), axis=1)), axis=1)
+            return energy.tolist(), zcr.tolist()
+        x = array.array('h')
+        x.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+        energy, zcr = [], []
+        for i in range(0, len(x) - n + 1, n):
+            fr = x[i:i + n]
+            energy.append(10.0 * math.log10(sum(v * v for v in fr) / (n * 32768.0 * 32768.0) + 1e-10))
+            zcr.append(sum(1 for a, b in zip(fr, fr[1:]) if (a < 0) != (b < 0)) / (n - 1))
+        return energy, zcr
+
+    def frame_probs(self, pcm: bytes):
+        energy, zcr = self._features(pcm)
+        if not energy:
+            return []
+        floor = sorted(energy)[int(len(energy) * self.floor_pct)]
+        floor = max(floor, self.min_floor_db)
+        # Smooth across calls so one all-speech segment does not raise the floor to speech level
+        self.floor_db = floor if self.floor_db is None else min(floor, 0.8 * self.floor_db + 0.2 * floor)
+        probs = []
+        for e, z in zip(energy, zcr):
+            p = 1.0 / (1.0 + math.exp(-(e - self.floor_db - self.margin_db) / 2.0))
+            if z < self.zcr_min or z > self.zcr_max:
+                p *= 0.2
+            probs.append(p)
+        return probs
+
+    def speech_spans(self, pcm: bytes):
+        """Return [(start_sample, end_sample)] of voiced audio (padded, merged)."""
+        probs = self.frame_probs(pcm)
+        spans = []
+        start = None
+        quiet = 0
+        for i, p in enumerate(probs):
+            if p >= self.threshold:
+                if start is None:
+                    start = i
+                quiet = 0
+            elif start is not None:
+                quiet += 1
+                if quiet > self.hangover:
+                    end = i - quiet + 1
+                    if end - start >= self.min_frames:
+                        spans.append((start, end))
+                    start, quiet = None, 0
+        if start is not None and len(probs) - quiet - start >= self.min_frames:
+            spans.append((start, len(probs) - quiet))
+        total = len(pcm) // 2
+        out = []
+        for s, e in spans:
+            s = max(0, s * self.frame - self.pad)
+            e = min(total, e * self.frame + self.pad)
+            if out and s <= out[-1][1]:
+                out[-1] = (out[-1][0], e)
+            else:
+                out.append((s, e))
+        return out
+
+
+def read_wav_pcm(path: str):
+    """Return (pcm_bytes, sample_rate) for a 16-bit mono WAV, or (None, None) if it is not one."""
+    with wave.open(path, 'rb') as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            return None, None
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+
+def pcm_to_float(pcm: bytes):
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class VadStats:
+    """Skipped audio and the decode time that would have cost (at the measured real-time factor)."""
+
+    def __init__(self):
+        self.audio_s = 0.0
+        self.skipped_s = 0.0
+        self.decode_s = 0.0
+        self.decoded_audio_s = 0.0
+        self.skipped_segments = 0
+        self.lock = threading.Lock()  # updated from several transcription workers
+
+    def seen(self, audio_s: float):
+        with self.lock:
+            self.audio_s += audio_s
+
+    def skipped(self, audio_s: float, segment: bool = False):
+        with self.lock:
+            self.skipped_s += audio_s
+            self.skipped_segments += int(segment)
+
+    def decoded(self, audio_s: float, decode_s: float):
+        with self.lock:
+            self.decoded_audio_s += audio_s
+            self.decode_s += decode_s
+
+    def saved_cpu_s(self) -> float:
+        rtf = self.decode_s / self.decoded_audio_s if self.decoded_audio_s else 0.0
+        return self.skipped_s * rtf
+
+    def summary(self) -> str:
+        pct = 100.0 * self.skipped_s / self.audio_s if self.audio_s else 0.0
+        return (f"vad skipped {self.skipped_s:.1f}s of {self.audio_s:.1f}s audio ({pct:.0f}%, "
+                f"{self.skipped_segments} silent segments), est. decode time saved {self.saved_cpu_s():.1f}s")
@@ -0,0 +1,220 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+_IN_EVENT = struct.Struct('iIII')
+
+
+def wav_complete(path: str):
+    """Return the WAV data size if `path` is a finished PCM WAV, else None.
+
+    ffmpeg writes placeholder sizes in the RIFF/data headers and patches
+    them when it closes the file, so a header whose sizes agree with the
+    file length means the writer is done. No sleeping or size polling.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4096)
+            size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
+    if len(head) < 12 or head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        return None
+    riff_size = struct.unpack_from('<I', head, 4)[0]
+    if riff_size + 8 != size:
+        return None
+    pos = 12
+    while pos + 8 <= len(head):
+        cid = head[pos:pos + 4]
+        clen = struct.unpack_from('<I', head, pos + 4)[0]
+        if cid == b'data':
+            return clen if pos + 8 + clen <= size else None
+        pos += 8 + clen + (clen & 1)
+    return None
+
+
+class Segment:
+    def __init__(self, path: str, closed_at: float, detected_at: float):
+        self.path = path
+        self.closed_at = closed_at      # wall clock; mtime of the final header write
+        self.detected_at = detected_at  # wall clock
+
+
+class SegmentWatcher:
+    """Report finished WAV segments in a directory (polling implementation).
+
+    `wait(timeout)` returns the segments that completed since the last
+    call, oldest name first. Subclasses replace the directory scan with
+    kernel notifications; the completeness check (`wav_complete`) and the
+    pending list for files that were announced before they were valid are
+    shared.
+    """
+
+    kind = 'poll'
+    track_reported = True
+
+    def __init__(self, directory: str, suffix: str = '.wav', interval: float = 0.5):
+        self.directory = directory
+        self.suffix = suffix.lower()
+        self.interval = float(interval)
+        self.pending = set()
+        self.reported = {}  # name -> mtime when reported (scan-based watchers)
+        self._initial = True
+
+    def _match(self, name: str) -> bool:
+        return name.lower().endswith(self.suffix) and not name.startswith('.')
+
+    def _scan(self):
+        found = {}
+        try:
+            for e in os.scandir(self.directory):
+                if self._match(e.name):
+                    try:
+                        found[e.name] = e.stat().st_mtime
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            return set()
+        # Forget deleted files so `reported` stays as small as the directory;
+        # a reused name (segment counter wrap) has a new mtime and is picked up again
+        self.reported = {n: m for n, m in self.reported.items() if found.get(n) == m}
+        return {n for n in found if n not in self.reported}
+
+    def _candidates(self, timeout: float):
+        time.sleep(timeout)
+        return self._scan()
+
+    def wait(self, timeout: float = None):
+        timeout = self.interval if timeout is None else timeout
+        if self._initial:
+            # Segments left from before the watcher started
+            names = self._scan()
+            self._initial = False
+        else:
+            names = self._candidates(timeout)
+        names |= self.pending
+        out = []
+        now = time.time()
+        for name in sorted(names):
+            p = os.path.join(self.directory, name)
+            if wav_complete(p) is None:
+                if os.path.exists(p):
+                    self.pending.add(name)
+                else:
+                    self.pending.discard(name)
+                continue
+            self.pending.discard(name)
+            try:
+                closed = os.path.getmtime(p)
+            except OSError:
+                closed = now
+            if self.track_reported:
+                self.reported[name] = closed
+            out.append(Segment(p, closed, now))
+        return out
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(SegmentWatcher):
+    """Linux: wake on IN_CLOSE_WRITE / IN_MOVED_TO through inotify (ctypes, no extra deps)."""
+
+    kind = 'inotify'
+    # Each IN_CLOSE_WRITE is a new segment, so nothing needs remembering after the first scan
+    track_reported = False
+
+    def __init__(self, directory: str, suffix: str = '.wav', interval: float = 0.5):
+        super().__init__(directory, suffix, interval)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f'inotify_add_watch failed for {directory}')
+
+    def _candidates(self, timeout: float):
+        names = set()
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return names
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return names
+        pos = 0
+        while pos + _IN_EVENT.size <= len(buf):
+            _, mask, _, nlen = _IN_EVENT.unpack_from(buf, pos)
+            raw = buf[pos + _IN_EVENT.size:pos + _IN_EVENT.size + nlen]
+            pos += _IN_EVENT.size + nlen
+            if mask & IN_Q_OVERFLOW:
+                # Missed events: fall back to one directory scan
+                names |= self._scan()
+                continue
+            name = os.fsdecode(raw.rstrip(b'\0'))
+            if name and self._match(name):
+                names.add(name)
+        return names
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class KqueueWatcher(SegmentWatcher):
+    """macOS/BSD: wake when the directory changes (ffmpeg opening the next segment).
+
+    kqueue cannot report a file close, but the segment muxer creates
+    segment N+1 right after finishing N, which modifies the directory. On
+    wake-up (or timeout, for the last segment) the directory is rescanned
+    and candidates are checked with `wav_complete`.
+    """
+
+    kind = 'kqueue'
+
+    def __init__(self, directory: str, suffix: str = '.wav', interval: float = 0.5):
+        super().__init__(directory, suffix, interval)
+        self.dir_fd = os.open(directory, os.O_RDONLY)
+        self.kq = select.kqueue()
+        self.kev = select.kevent(self.dir_fd, filter=select.KQ_FILTER_VNODE,
+                                 flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                                 fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND)
+
+    def _candidates(self, timeout: float):
+        # Returns on a directory change or after `timeout` (covers the final segment)
+        self.kq.control([self.kev], 1, timeout)
+        return self._scan()
+
+    def close(self):
+        try:
+            self.kq.close()
+            os.close(self.dir_fd)
+        except OSError:
+            pass
+
+
+def open_watcher(directory: str, mode: str = 'auto', suffix: str = '.wav', interval: float = 0.5) -> SegmentWatcher:
+    """Best available watcher: inotify on Linux, kqueue on macOS/BSD, else polling."""
+    if mode in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory, suffix, interval)
+        except Exception as e:
+            print(f'[asr] inotify unavailable ({e}); polling', file=sys.stderr)
+    if mode in ('auto', 'kqueue') and hasattr(select, 'kqueue'):
+        try:
+            return KqueueWatcher(directory, suffix, interval)
+        except Exception as e:
+            print(f'[asr] kqueue unavailable ({e}); polling', file=sys.stderr)
+    return SegmentWatcher(directory, suffix, interval)
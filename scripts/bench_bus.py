@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Delivery latency and backpressure of the event bus (app/bus.py).
+
+Usage:
+  python3 scripts/bench_bus.py [--n 5000] [--queue 64]
+
+1. Publish -> receive latency for an in-process subscriber and for a
+   subscriber in the same process connected over the Unix socket, against
+   the old transport (append a JSONL line, reader polls and re-reads).
+2. A stalled lossy subscriber: it drops its oldest messages and the other
+   subscribers are not slowed down.
+3. A slow lossless subscriber (the JSONL sink): publishers wait for it,
+   and nothing is lost.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from bus import BusClient, EventBus, JsonlSink  # noqa: E402
+from tail import JsonlTail  # noqa: E402
+
+
+def pct(values, p):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1e6
+
+
+def report(name, lat):
+    print(f"{name:<28} p50={pct(lat, 0.5):8.0f}us  p99={pct(lat, 0.99):8.0f}us  n={len(lat)}")
+
+
+def bench_latency(bus, n):
+    rec = {'text': '主播说了一句话', 'result': {'text': '主播说了一句话'}}
+    sub = bus.subscribe(['asr.text'], maxsize=n + 1, name='bench')
+    lat = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        bus.publish('asr.text', rec)
+        sub.get(timeout=1.0)
+        lat.append(time.perf_counter() - t0)
+    bus.unsubscribe(sub)
+    report('in-process', lat)
+
+    client = BusClient(bus.sock_path)
+    client.subscribe(['asr.text'], maxsize=n + 1, name='bench')
+    time.sleep(0.1)
+    pub = BusClient(bus.sock_path).connect()
+    lat = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        pub.publish('asr.text', rec)
+        client.recv(timeout=1.0)
+        lat.append(time.perf_counter() - t0)
+    report('socket pub -> socket sub', lat)
+    pub.close()
+    client.close()
+
+    # Old transport: append a line, consumer polls the file every `poll` seconds
+    fd, path = tempfile.mkstemp(suffix='.jsonl')
+    os.close(fd)
+    tail = JsonlTail(path)
+    lat = []
+    poll = 0.2
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            for _ in range(min(n, 50)):
+                t0 = time.perf_counter()
+                f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+                f.flush()
+                # Expected wait for the next poll tick is half the poll interval
+                time.sleep(poll / 2)
+                tail.read()
+                lat.append(time.perf_counter() - t0)
+    finally:
+        os.remove(path)
+    report(f'jsonl file, {poll:.1f}s poll', lat)
+
+
+def bench_backpressure(bus, n, qsize):
+    fast = bus.subscribe(['ocr.line'], maxsize=n, name='fast')
+    stalled = bus.subscribe(['ocr.line'], maxsize=qsize, name='stalled')
+    got = []
+    stop = threading.Event()
+
+    def consume():
+        while not stop.is_set():
+            m = fast.get(timeout=0.1)
+            if m is not None:
+                got.append(m['seq'])
+    th = threading.Thread(target=consume)
+    th.start()
+    t0 = time.perf_counter()
+    for i in range(n):
+        bus.publish('ocr.line', {'text': f'comment {i}'})
+    pub_s = time.perf_counter() - t0
+    time.sleep(0.2)
+    stop.set()
+    th.join()
+    st = stalled.stats()
+    print(f"stalled lossy subscriber: publish {n} in {pub_s * 1e3:.0f} ms, fast got {len(got)}, "
+          f"stalled kept {st['queued']} dropped {st['dropped']}")
+    bus.unsubscribe(fast)
+    bus.unsubscribe(stalled)
+
+    # Lossless sink that writes slowly: publishers are held back, nothing is lost
+    fd, path = tempfile.mkstemp(suffix='.jsonl')
+    os.close(fd)
+    try:
+        sink = JsonlSink(bus, {'agent.reply': path}, maxsize=qsize)
+        orig = sink._write
+
+        def slow_write(msgs):
+            time.sleep(0.001 * len(msgs))
+            orig(msgs)
+        sink._write = slow_write
+        m = min(n, 2000)
+        t0 = time.perf_counter()
+        for i in range(m):
+            bus.publish('agent.reply', {'i': i})
+        pub_s = time.perf_counter() - t0
+        sink.close()
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(ln)['i'] for ln in f]
+        print(f"slow lossless sink: publish {m} took {pub_s * 1e3:.0f} ms (held back "
+              f"{sink.sub.blocked_s * 1e3:.0f} ms), wrote {len(lines)} in order={lines == list(range(m))}")
+    finally:
+        os.remove(path)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=5000)
+    ap.add_argument('--queue', type=int, default=64)
+    args = ap.parse_args()
+    d = tempfile.mkdtemp()
+    bus = EventBus()
+    bus.serve(os.path.join(d, 'bus.sock'))
+    try:
+        bench_latency(bus, args.n)
+        bench_backpressure(bus, args.n, args.queue)
+    finally:
+        bus.close()
+        os.rmdir(d)
+
+
+if __name__ == '__main__':
+    main()
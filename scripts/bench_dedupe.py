@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Microbenchmark for comment de-duplication.
+
+Usage:
+  python3 scripts/bench_dedupe.py [--n 100000] [--vocab 5000] [--legacy]
+  python3 scripts/bench_dedupe.py --fuzzy [--session logs/ocr.openai.jsonl] [--similarity 0.7]
+
+Pushes N synthetic comments (drawn from a vocabulary, so repeats occur)
+through TTLDedupe with the app's settings. --legacy also times the old
+list-rebuild/linear-scan approach for comparison.
+
+--fuzzy compares exact and near-duplicate (NearDuplicateIndex) filtering.
+With --session the lines of a recorded OCR log are replayed in order;
+otherwise synthetic comments with OCR-style noise (dropped punctuation,
+emoji, look-alike characters) are used.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from dedupe import NearDuplicateIndex, TTLDedupe  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def legacy_seen(state, text, now, window_size=200, ttl_sec=60.0):
+    # The pre-TTLDedupe App._dedupe_seen, kept here only as a baseline
+    state[:] = [(t, s) for (t, s) in state if now - t < ttl_sec]
+    for _, s in state:
+        if s == text:
+            return True
+    state.append((now, text))
+    if len(state) > window_size:
+        state[:] = state[-window_size:]
+    return False
+
+
+_NOISE = [('的', '得'), ('！', ''), ('，', ' '), ('~', ''), ('0', 'O'), ('了', '子')]
+
+
+def noisy(text, rnd):
+    # Imitate OCR wobble between two reads of the same comment
+    for a, b in _NOISE:
+        if a in text and rnd.random() < 0.3:
+            text = text.replace(a, b, 1)
+    if rnd.random() < 0.2:
+        text += rnd.choice(['😀', ' ', '。', '～'])
+    return text
+
+
+def session_lines(path):
+    lines = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for ln in f:
+            try:
+                rec = json.loads(ln)
+            except Exception:
+                continue
+            lines.extend(t for t in rec.get('lines') or [] if isinstance(t, str) and t.strip())
+    return lines
+
+
+def bench_fuzzy(stream, similarity, step):
+    for name, make in (('exact', lambda c: TTLDedupe(capacity=500, clock=c)),
+                       (f'fuzzy>={similarity}', lambda c: NearDuplicateIndex(threshold=similarity, capacity=500, clock=c))):
+        clock = FakeClock()
+        d = make(clock)
+        passed = 0
+        t0 = time.perf_counter()
+        for text in stream:
+            clock.t += step
+            passed += not d.seen(text)
+        dt = time.perf_counter() - t0
+        n = len(stream)
+        print(f'{name:<12} {n} lines in {dt * 1000:.1f} ms ({n / dt:,.0f} lines/s, {dt / n * 1e6:.2f} us/line) passed={passed} {d.stats()}')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=100000)
+    ap.add_argument('--vocab', type=int, default=5000)
+    ap.add_argument('--rate', type=float, default=20.0, help='synthetic comments per second (drives TTL expiry)')
+    ap.add_argument('--legacy', action='store_true')
+    ap.add_argument('--fuzzy', action='store_true', help='compare exact vs near-duplicate filtering')
+    ap.add_argument('--session', help='replay lines from a recorded ocr.*.jsonl (with --fuzzy)')
+    ap.add_argument('--similarity', type=float, default=0.7)
+    args = ap.parse_args()
+
+    rnd = random.Random(42)
+    if args.fuzzy:
+        if args.session:
+            stream = session_lines(args.session)
+            if not stream:
+                print('no OCR lines in session', file=sys.stderr)
+                return 2
+        else:
+            common = '的了是我你主播好听来关注唱歌真棒哈'
+            base = [''.join(rnd.choice(common) if rnd.random() < 0.3 else chr(0x4e00 + rnd.randrange(3000))
+                            for _ in range(rnd.randint(4, 16))) + rnd.choice(['', '！', '，', '~', '666'])
+                    for _ in range(args.vocab)]
+            stream = [noisy(base[min(args.vocab - 1, int(rnd.expovariate(4.0 / args.vocab)))], rnd) for _ in range(args.n)]
+        bench_fuzzy(stream, args.similarity, 1.0 / args.rate)
+        return 0
+
+    vocab = [f'观众{i}: 主播好 {"6" * (i % 5 + 1)}' for i in range(args.vocab)]
+    stream = [vocab[min(args.vocab - 1, int(rnd.expovariate(4.0 / args.vocab)))] for _ in range(args.n)]
+    step = 1.0 / args.rate
+
+    for name, ttl, cap in (('ocr ttl=60s cap=200', 60.0, 200), ('agent cap=500', None, 500)):
+        clock = FakeClock()
+        d = TTLDedupe(ttl=ttl, capacity=cap, clock=clock)
+        t0 = time.perf_counter()
+        for text in stream:
+            clock.t += step
+            d.seen(text)
+        dt = time.perf_counter() - t0
+        print(f'TTLDedupe [{name}]: {args.n} ops in {dt * 1000:.1f} ms ({args.n / dt:,.0f} ops/s, {dt / args.n * 1e6:.2f} us/op) {d.stats()}')
+
+    if args.legacy:
+        state = []
+        now = 0.0
+        hits = 0
+        t0 = time.perf_counter()
+        for text in stream:
+            now += step
+            hits += legacy_seen(state, text, now)
+        dt = time.perf_counter() - t0
+        print(f'legacy list scan: {args.n} ops in {dt * 1000:.1f} ms ({args.n / dt:,.0f} ops/s, {dt / args.n * 1e6:.2f} us/op) hits={hits}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
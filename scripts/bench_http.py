@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Check the shared keep-alive HTTP client (app/httpclient.py) against a local stand-in server.
+
+Usage:
+  python3 scripts/bench_http.py [--calls 20] [--delay 0.02]
+
+Starts an HTTP/1.1 server on 127.0.0.1 and checks, printing timing:
+1. Connection reuse: repeated calls go over one pooled connection, and
+   later calls skip the connect step.
+2. gzip: a gzip-encoded body is decoded transparently.
+3. Stale connection: the server drops an idle keep-alive connection;
+   the next call retries once on a fresh connection and succeeds.
+4. Read timeout: a response slower than `read_timeout` fails after about
+   `read_timeout`, and the client still works afterwards.
+Exits non-zero if any check fails.
+"""
+import argparse
+import gzip
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from httpclient import HttpClient, format_timing  # noqa: E402
+
+IDLE_CLOSE = 0.3
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = IDLE_CLOSE  # server drops keep-alive connections idle for this long
+    delay = 0.02
+    conns = set()
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle + delayed ACK adds ~40 ms per call
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *a):
+        pass
+
+    def do_POST(self):
+        StandIn.conns.add(self.client_address)
+        req = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path == '/slow':
+            time.sleep(float(req.get('sleep', 2.0)))
+        else:
+            time.sleep(self.delay)
+        body = json.dumps({'echo': req, 'pad': 'comment ' * 200}).encode()
+        gz = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if gz:
+            body = gzip.compress(body)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            if gz:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            self.close_connection = True
+
+
+def check(name, ok, detail=''):
+    print(f"{'PASS' if ok else 'FAIL'}  {name:<22} {detail}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--calls', type=int, default=20)
+    ap.add_argument('--delay', type=float, default=0.02)
+    args = ap.parse_args()
+    StandIn.delay = args.delay
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{srv.server_address[1]}'
+    http = HttpClient(connect_timeout=2.0, read_timeout=5.0)
+    ok = True
+    try:
+        # 1. reuse
+        StandIn.conns.clear()
+        timings = []
+        for i in range(args.calls):
+            resp = http.post_json(base + '/echo', {'i': i})
+            timings.append(resp.timing)
+        reused = sum(1 for t in timings if t.get('reused'))
+        later = [t['total_ms'] for t in timings[1:]]
+        ok &= check('connection reuse', len(StandIn.conns) == 1 and reused == args.calls - 1,
+                    f"{len(StandIn.conns)} server connection(s), {reused}/{args.calls} reused; "
+                    f"first: {format_timing(timings[0])}; later p50 total={statistics.median(later):.1f}ms")
+
+        # 2. gzip
+        resp = http.post_json(base + '/echo', {'text': '主播好'})
+        obj = resp.json()
+        enc = resp.headers.get('Content-Encoding')
+        ok &= check('gzip body', enc == 'gzip' and obj['echo'] == {'text': '主播好'},
+                    f"Content-Encoding={enc}, decoded {len(resp.body)} bytes")
+
+        # 3. stale keep-alive connection: server closes it while it sits in the pool
+        time.sleep(IDLE_CLOSE * 2)
+        StandIn.conns.clear()
+        try:
+            resp = http.post_json(base + '/echo', {'after': 'idle'})
+            ok &= check('retry on stale conn', resp.json()['echo'] == {'after': 'idle'} and not resp.timing.get('reused'),
+                        f"{format_timing(resp.timing)}")
+        except Exception as e:
+            ok &= check('retry on stale conn', False, repr(e))
+
+        # 4. read timeout
+        t0 = time.monotonic()
+        try:
+            http.post_json(base + '/slow', {'sleep': 2.0}, read_timeout=0.5)
+            ok &= check('read timeout', False, 'slow response did not time out')
+        except (socket.timeout, TimeoutError) as e:
+            waited = time.monotonic() - t0
+            ok &= check('read timeout', 0.4 <= waited < 1.5, f"gave up after {waited * 1000:.0f} ms ({type(e).__name__})")
+        resp = http.post_json(base + '/echo', {'after': 'timeout'})
+        ok &= check('usable after timeout', resp.json()['echo'] == {'after': 'timeout'}, format_timing(resp.timing))
+    finally:
+        http.close()
+        srv.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
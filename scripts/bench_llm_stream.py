@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Blocking vs streamed agent replies against a local stand-in for the chat API.
+
+Usage:
+  python3 scripts/bench_llm_stream.py [--calls 5] [--first-token 0.4] [--per-token 0.05]
+
+Starts an HTTP server on 127.0.0.1 that answers chat completions like
+DeepSeek: after `--first-token` seconds it emits a multi-sentence reply
+one token per `--per-token` seconds, as server-sent events when the
+request has `"stream": true` and as one JSON body otherwise. Reports
+time-to-first-token and time-to-final for both modes, how many tokens
+the server got to send before the streamed call hung up, and whether
+connections were reused. The stand-in also reports prompt cache hits for
+a repeated system message, as DeepSeek does.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from agent_prompt import cache_usage  # noqa: E402
+from httpclient import HttpClient, format_timing  # noqa: E402
+from llmstream import stream_chat  # noqa: E402
+
+REPLY = ['主播', '今天', '状态', '真好', '！', '😄', '这首', '歌', '我', '也', '很', '喜欢', '，',
+         '能', '再', '唱', '一遍', '吗', '？', '大家', '一起', '点', '个', '赞', '吧', '。']
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    first_token = 0.4
+    per_token = 0.05
+    sent = []
+    prefixes = set()
+
+    def log_message(self, *a):
+        pass
+
+    def _usage(self, req):
+        # Prefix cache like DeepSeek's: a system message seen before counts as cached (one token per char here)
+        system = ''.join(m['content'] for m in req.get('messages', []) if m.get('role') == 'system')
+        prompt = sum(len(m['content']) for m in req.get('messages', []))
+        hit = len(system) if system and system in self.prefixes else 0
+        self.prefixes.add(system)
+        return {'prompt_tokens': prompt, 'completion_tokens': len(REPLY),
+                'prompt_cache_hit_tokens': hit, 'prompt_cache_miss_tokens': prompt - hit}
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        time.sleep(self.first_token)
+        if not req.get('stream'):
+            time.sleep(self.per_token * len(REPLY))
+            body = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': ''.join(REPLY)}}],
+                               'usage': self._usage(req)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            StandIn.sent.append(len(REPLY))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        n = 0
+        try:
+            for i, tok in enumerate(REPLY):
+                last = i == len(REPLY) - 1
+                ev = {'choices': [{'delta': {'content': tok}, 'finish_reason': 'stop' if last else None}]}
+                self._chunk(f'data: {json.dumps(ev, ensure_ascii=False)}\n\n'.encode())
+                n += 1
+                time.sleep(self.per_token)
+            if (req.get('stream_options') or {}).get('include_usage'):
+                ev = {'choices': [], 'usage': self._usage(req)}
+                self._chunk(f'data: {json.dumps(ev)}\n\n'.encode())
+            self._chunk(b'data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except OSError:
+            self.close_connection = True
+        StandIn.sent.append(n)
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--calls', type=int, default=5)
+    ap.add_argument('--first-token', type=float, default=0.4)
+    ap.add_argument('--per-token', type=float, default=0.05)
+    ap.add_argument('--max-chars', type=int, default=60)
+    args = ap.parse_args()
+    StandIn.first_token = args.first_token
+    StandIn.per_token = args.per_token
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{srv.server_address[1]}/v1/chat/completions'
+    payload = {'model': 'stand-in', 'messages': [{'role': 'user', 'content': 'hi'}], 'max_tokens': 120}
+    http = HttpClient()
+    try:
+        final = []
+        StandIn.sent.clear()
+        for _ in range(args.calls):
+            t0 = time.monotonic()
+            resp = http.post_json(url, payload)
+            text = resp.json()['choices'][0]['message']['content']
+            final.append((time.monotonic() - t0) * 1000)
+        time.sleep(0.1)
+        print(f"blocking   final p50={statistics.median(final):6.0f}ms  tokens sent={statistics.mean(StandIn.sent):.0f}  "
+              f"reply={text!r}")
+
+        ttft, final = [], []
+        StandIn.sent.clear()
+        for _ in range(args.calls):
+            text, info = stream_chat(http, url, payload, max_chars=args.max_chars)
+            ttft.append(info['ttft_ms'])
+            final.append(info['final_ms'])
+        time.sleep(args.per_token * 2 + 0.1)
+        print(f"streamed   ttft p50={statistics.median(ttft):6.0f}ms  final p50={statistics.median(final):6.0f}ms  "
+              f"tokens sent={statistics.mean(StandIn.sent):.0f}  finish={info['finish']}  reply={text!r}")
+        print(f"last streamed call: {format_timing(info['http'])}")
+
+        # Short replies run to the end of the stream: the connection stays in the pool and usage arrives
+        saved = REPLY[:]
+        REPLY[:] = ['好的', '👍']
+        _, info1 = stream_chat(http, url, payload, max_chars=args.max_chars)
+        _, info2 = stream_chat(http, url, payload, max_chars=args.max_chars)
+        print(f"complete stream: finish={info1['finish']}, next call {format_timing(info2['http'])}")
+
+        # Stable system prefix + changing suffix: from the second call on the prefix is served from cache.
+        # The reply is still final at its first sentence; the rest is drained in the background for usage
+        REPLY[:] = saved
+        persona = '你是直播间的友好观众，用中文自然口吻简短回应。' * 8
+        for i in range(3):
+            msgs = [{'role': 'system', 'content': persona}, {'role': 'user', 'content': f'新评论 {i}'}]
+            t0 = time.monotonic()
+            _, info = stream_chat(http, url, dict(payload, messages=msgs), max_chars=args.max_chars, drain=True)
+            info['usage_done'].wait(10)
+            print(f"stable prefix, call {i}: final={info['final_ms']:.0f}ms usage after "
+                  f"{(time.monotonic() - t0) * 1000:.0f}ms {cache_usage(info['usage'])}")
+        print(f"drained stream: {format_timing(info['http'])}")
+    finally:
+        http.close()
+        srv.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Compare OCR engines on a folder of saved comment frames.
+
+Usage:
+  python3 scripts/bench_ocr.py --frames logs/frames [--engines openai,tesseract] [--limit 50] [--cache logs/ocr_cache.sqlite3]
+
+Frames are the images written by the debug sampler (ocr_debug_frame_every).
+If `<frame>.txt` exists next to an image it is used as ground truth (one
+comment per line) and the character error rate (CER) is reported.
+With --cache, results are looked up in (and added to) the app's OCR cache,
+so re-running a session only pays for frames not seen before; frames
+answered from the cache get their own `<engine>:cached` row, so the
+engine row's latency covers real engine calls only.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from httpclient import HttpClient  # noqa: E402
+from ocr.cache import OcrCache  # noqa: E402
+from ocr.engines import make_engine  # noqa: E402
+
+MIME = {'.png': 'image/png', '.jpeg': 'image/jpeg', '.jpg': 'image/jpeg', '.webp': 'image/webp', '.bmp': 'image/bmp'}
+
+
+def edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def print_row(label: str, lat, errs: int, chars: int, failures: int):
+    if not lat:
+        print(f'{label:<16}{0:>8}{"-":>10}{"-":>10}{"-":>10}{"-":>8}{failures:>8}')
+        return
+    lat = sorted(lat)
+    p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+    cer = f'{errs / chars:.3f}' if chars else '-'
+    print(f'{label:<16}{len(lat):>8}{statistics.mean(lat):>10.0f}{statistics.median(lat):>10.0f}{p95:>10.0f}{cer:>8}{failures:>8}')
+
+
+def load_cfg():
+    p = os.path.join(ROOT_DIR, 'config.json')
+    if os.path.exists(p):
+        with open(p, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--frames', required=True, help='Directory of saved frames')
+    ap.add_argument('--engines', default='openai,tesseract')
+    ap.add_argument('--limit', type=int, default=0)
+    ap.add_argument('--cache', help='OCR cache file to read/write (e.g. logs/ocr_cache.sqlite3)')
+    args = ap.parse_args()
+
+    cfg = load_cfg()
+    files = sorted(n for n in os.listdir(args.frames) if os.path.splitext(n)[1].lower() in MIME)
+    if args.limit:
+        files = files[:args.limit]
+    if not files:
+        print('no frames found', file=sys.stderr)
+        return 2
+    http = HttpClient()
+    cache = OcrCache(args.cache) if args.cache else None
+    api_key = cfg.get('openai_api_key') or os.environ.get('OPENAI_API_KEY', '')
+    print(f'{"engine":<16}{"frames":>8}{"mean_ms":>10}{"p50_ms":>10}{"p95_ms":>10}{"CER":>8}{"errors":>8}')
+    for name in [e.strip() for e in args.engines.split(',') if e.strip()]:
+        engine = make_engine(name, http=http, api_key=api_key, model=cfg.get('openai_model', 'gpt-4o'),
+                             langs=cfg.get('ocr_tesseract_langs', 'chi_sim+eng'))
+        if not engine.available():
+            print(f'{name:<16} unavailable (missing API key or binary)')
+            continue
+        # Engine calls and cache hits are timed apart: a hit takes a lookup, not a recognition
+        groups = {'engine': [[], 0, 0], 'cached': [[], 0, 0]}  # latencies, edit errors, reference chars
+        failures = 0
+        for n in files:
+            p = os.path.join(args.frames, n)
+            with open(p, 'rb') as f:
+                image = (MIME[os.path.splitext(n)[1].lower()], f.read())
+            t0 = time.perf_counter()
+            try:
+                key = cache.key(image[1], engine.cache_tag()) if cache else None
+                hit = cache.get(key) if cache else None
+                if hit is not None:
+                    lines, group = hit[0], groups['cached']
+                else:
+                    group = groups['engine']
+                    result = engine.recognize_detailed(image)
+                    lines = result.lines
+                    if cache:
+                        cache.put(key, result.lines, result.raw)
+            except Exception as e:
+                failures += 1
+                print(f'  {name} {n}: {e}', file=sys.stderr)
+                continue
+            group[0].append((time.perf_counter() - t0) * 1000)
+            truth = os.path.splitext(p)[0] + '.txt'
+            if os.path.exists(truth):
+                with open(truth, 'r', encoding='utf-8') as f:
+                    ref = ''.join(ln.strip() for ln in f if ln.strip())
+                group[1] += edit_distance(''.join(lines), ref)
+                group[2] += len(ref)
+        print_row(name, *groups['engine'], failures)
+        if cache:
+            print_row(f'{name}:cached', *groups['cached'], 0)
+    if cache:
+        print(f'cache: {cache.stats()}')
+        cache.close()
+    http.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
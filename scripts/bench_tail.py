@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Per-tick cost of reading new agent input as the JSONL log grows.
+
+Usage:
+  python3 scripts/bench_tail.py [--lines 200000] [--per-tick 5] [--checkpoints 6]
+
+Appends ASR-style records to a temporary file, a few per agent tick, and
+times one tick of reading the new records at several file sizes: the
+byte-offset JsonlTail against the old approach (readlines() on the whole
+file, then slicing by a line index). Also checks that a truncated or
+replaced file is picked up from the start and that a half-written line is
+held back until it is complete.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'app'))
+
+from tail import JsonlTail  # noqa: E402
+
+
+def record(i: int) -> str:
+    return json.dumps({'ts': '2025-01-01T00:00:00Z', 'file': f'logs/audio/seg-{i:05d}.wav',
+                       'result': {'text': f'第{i}句 主播说了一些话，欢迎大家来到直播间', 'duration': 6.0, 'language': 'zh'},
+                       'latency': {'close_to_start_ms': 12, 'detect_ms': 1, 'transcribe_ms': 850}},
+                      ensure_ascii=False) + '\n'
+
+
+def legacy_read(path: str, state: dict):
+    # The pre-JsonlTail App._read_new_asr_lines, kept here only as a baseline
+    with open(path, 'r', encoding='utf-8') as f:
+        all_lines = f.readlines()
+    out = [json.loads(ln) for ln in all_lines[state['idx']:]]
+    state['idx'] = len(all_lines)
+    return out
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lines', type=int, default=200000)
+    ap.add_argument('--per-tick', type=int, default=5, help='records appended between agent ticks')
+    ap.add_argument('--checkpoints', type=int, default=6)
+    args = ap.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.jsonl')
+    os.close(fd)
+    try:
+        tail = JsonlTail(path)
+        legacy = {'idx': 0}
+        written = 0
+        step = max(1, args.lines // args.checkpoints)
+        print(f"{'lines':>8} {'MB':>7} {'tail us/tick':>13} {'legacy us/tick':>15}")
+        with open(path, 'a', encoding='utf-8') as f:
+            for cp in range(1, args.checkpoints + 1):
+                f.write(''.join(record(written + i) for i in range(step)))
+                written += step
+                f.flush()
+                tail.read()
+                legacy_read(path, legacy)
+                tick = [written]
+
+                def append():
+                    f.write(''.join(record(tick[0] + i) for i in range(args.per_tick)))
+                    f.flush()
+                    tick[0] += args.per_tick
+
+                def tail_tick():
+                    append()
+                    assert len(tail.read()) == args.per_tick
+
+                def legacy_tick():
+                    append()
+                    assert len(legacy_read(path, legacy)) == args.per_tick
+
+                t_tail = timed(tail_tick)
+                # Keep the legacy reader in step with the records the tail just consumed
+                legacy_read(path, legacy)
+                t_legacy = timed(legacy_tick, repeat=3)
+                tail.read()
+                written = tick[0]
+                size = os.path.getsize(path) / 1e6
+                print(f"{written:>8} {size:>7.1f} {t_tail * 1e6:>13.0f} {t_legacy * 1e6:>15.0f}")
+
+        # Partial line, truncation and replacement
+        chk = JsonlTail(path)
+        chk.seek_end()
+        line = record(0)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line[:20])
+            f.flush()
+            half = chk.read()
+            f.write(line[20:])
+        whole = chk.read()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(record(1))
+        truncated = chk.read()
+        os.remove(path)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(record(2) + record(3))
+        replaced = chk.read()
+        ok = (not half and len(whole) == 1 and len(truncated) == 1 and len(replaced) == 2
+              and chk.stats['truncations'] == 1 and chk.stats['rotations'] == 1)
+        print(f"partial/truncate/rotate: {'ok' if ok else 'FAILED'} {chk.stats}")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")"/.. && pwd)"
+SRC="${ROOT_DIR}/tools/wxcap.swift"
+OUT="${ROOT_DIR}/scripts/wxcap"
+
+if ! command -v xcrun >/dev/null 2>&1; then
+  echo "xcrun not found. Please install Xcode command line tools: xcode-select --install" >&2
+  exit 2
+fi
+
+echo "Compiling wxcap (in-memory screen capture)..."
+SDK="$(xcrun --sdk macosx --show-sdk-path)"
+xcrun --sdk macosx swiftc \
+  -sdk "$SDK" -O \
+  -framework AppKit -framework CoreGraphics \
+  -o "$OUT" "$SRC"
+chmod +x "$OUT"
+echo "Built: $OUT"
@@ -17,6 +17,7 @@ pkill -f "screencapture -x -R" 2>/dev/null || true
 pkill -f "scripts/asr_mic.sh" 2>/dev/null || true
 pkill -f "ffmpeg -f avfoundation" 2>/dev/null || true
 pkill -f "asr/transcribe.py" 2>/dev/null || true
+pkill -f "asr/daemon.py" 2>/dev/null || true
 
 # Aggressive kill: ffmpeg writing to logs/audio/seg-*
 ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")"/.. && pwd)"
@@ -0,0 +1,62 @@
+import Foundation
+import AppKit
+import CoreGraphics
+
+// wxcap: Capture a screen rect and write the image to stdout (no temp files).
+// Usage:
+//   wxcap <x> <y> <w> <h>                          -> BMP on stdout
+//   wxcap --encode jpeg|png [--quality 0.0-1.0]    -> re-encode an image read from stdin
+// - Rect is in global screen points, top-left origin (same as `screencapture -R`).
+// - BMP is uncompressed so the app can inspect pixels with the Python stdlib.
+
+func err(_ msg: String) -> Never {
+    FileHandle.standardError.write((msg + "\n").data(using: .utf8)!)
+    exit(2)
+}
+
+func write(_ data: Data) {
+    FileHandle.standardOutput.write(data)
+}
+
+func encode(_ rep: NSBitmapImageRep, format: String, quality: Double) -> Data? {
+    switch format {
+    case "bmp":
+        return rep.representation(using: .bmp, properties: [:])
+    case "png":
+        return rep.representation(using: .png, properties: [:])
+    case "jpeg", "jpg":
+        return rep.representation(using: .jpeg, properties: [.compressionFactor: NSNumber(value: quality)])
+    default:
+        return nil
+    }
+}
+
+let args = Array(CommandLine.arguments.dropFirst())
+
+if args.first == "--encode" {
+    guard args.count >= 2 else { err("usage: wxcap --encode jpeg|png [--quality q]") }
+    let format = args[1]
+    var quality = 0.8
+    if args.count >= 4 && args[2] == "--quality", let q = Double(args[3]) {
+        quality = max(0.05, min(1.0, q))
+    }
+    let input = FileHandle.standardInput.readDataToEndOfFile()
+    guard let rep = NSBitmapImageRep(data: input) else { err("ERR: cannot decode input image") }
+    guard let out = encode(rep, format: format, quality: quality) else { err("ERR: encode failed for \(format)") }
+    write(out)
+    exit(0)
+}
+
+guard args.count == 4,
+      let x = Double(args[0]), let y = Double(args[1]),
+      let w = Double(args[2]), let h = Double(args[3]), w > 0, h > 0 else {
+    err("usage: wxcap <x> <y> <w> <h> | wxcap --encode jpeg|png [--quality q]")
+}
+
+let rect = CGRect(x: x, y: y, width: w, height: h)
+guard let img = CGWindowListCreateImage(rect, [.optionOnScreenOnly], kCGNullWindowID, [.bestResolution]) else {
+    err("ERR: capture failed")
+}
+let rep = NSBitmapImageRep(cgImage: img)
+guard let out = encode(rep, format: "bmp", quality: 1.0) else { err("ERR: bmp encode failed") }
+write(out)